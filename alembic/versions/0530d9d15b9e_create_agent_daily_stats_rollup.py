@@ -0,0 +1,49 @@
+"""create agent_daily_stats rollup
+
+Revision ID: 0530d9d15b9e
+Revises: 1e2d8f005e79
+Create Date: 2026-10-18 14:05:17.302846
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0530d9d15b9e'
+down_revision: Union[str, Sequence[str], None] = '1e2d8f005e79'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'agent_daily_stats',
+        sa.Column('agent_id', sa.String(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('call_count', sa.Integer(), nullable=False),
+        sa.Column('sentiment_sum', sa.Float(), nullable=False),
+        sa.Column('talk_ratio_sum', sa.Float(), nullable=False),
+        sa.Column('duration_sum', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('agent_id', 'day'),
+    )
+    # Windowed queries across all agents filter on day alone
+    op.create_index('ix_agent_daily_stats_day', 'agent_daily_stats', ['day'])
+    # Seed from existing insights; afterwards writers keep it current
+    op.execute(
+        "INSERT INTO agent_daily_stats "
+        "(agent_id, day, call_count, sentiment_sum, talk_ratio_sum, duration_sum) "
+        "SELECT c.agent_id, c.start_time::date, count(*), sum(i.customer_sentiment), "
+        "sum(i.agent_talk_ratio), coalesce(sum(c.duration_seconds), 0) "
+        "FROM calls_db c JOIN call_insights i ON c.call_id = i.call_id "
+        "GROUP BY c.agent_id, c.start_time::date"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_agent_daily_stats_day', table_name='agent_daily_stats')
+    op.drop_table('agent_daily_stats')
@@ -0,0 +1,34 @@
+"""add call_insights.created_at cursor column
+
+Revision ID: 1a86a512250b
+Revises: 92b630b7eabd
+Create Date: 2026-10-18 09:12:31.204417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1a86a512250b'
+down_revision: Union[str, Sequence[str], None] = '92b630b7eabd'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Used by the in-process embedding store as an incremental refresh cursor
+    op.add_column(
+        'call_insights',
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+    )
+    op.create_index('ix_call_insights_created_at', 'call_insights', ['created_at'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_call_insights_created_at', table_name='call_insights')
+    op.drop_column('call_insights', 'created_at')
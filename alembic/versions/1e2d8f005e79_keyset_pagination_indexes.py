@@ -0,0 +1,52 @@
+"""composite indexes for keyset pagination of calls
+
+Revision ID: 1e2d8f005e79
+Revises: 9dd5cda95b06
+Create Date: 2026-10-18 13:31:52.660714
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1e2d8f005e79'
+down_revision: Union[str, Sequence[str], None] = '9dd5cda95b06'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+table = 'calls_db'
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # list_calls orders by (start_time, call_id) DESC and seeks with a row
+    # comparison on the same pair, optionally after an agent_id equality.
+    # These supersede the single-column agent_id/start_time indexes.
+    op.create_index(
+        'ix_calls_start_time_call_id', table,
+        [sa.text('start_time DESC'), sa.text('call_id DESC')],
+    )
+    op.create_index(
+        'ix_calls_agent_start_time_call_id', table,
+        ['agent_id', sa.text('start_time DESC'), sa.text('call_id DESC')],
+    )
+    op.drop_index('ix_calls_agent_id', table_name=table)
+    op.drop_index('ix_calls_start_time', table_name=table)
+
+    # Lets the per-row join probe for sentiment filters and list columns be an
+    # index-only scan
+    op.create_index(
+        'ix_call_insights_call_id_summary', 'call_insights', ['call_id'],
+        postgresql_include=['customer_sentiment', 'agent_talk_ratio'],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_call_insights_call_id_summary', table_name='call_insights')
+    op.create_index('ix_calls_start_time', table, ['start_time'])
+    op.create_index('ix_calls_agent_id', table, ['agent_id'])
+    op.drop_index('ix_calls_agent_start_time_call_id', table_name=table)
+    op.drop_index('ix_calls_start_time_call_id', table_name=table)
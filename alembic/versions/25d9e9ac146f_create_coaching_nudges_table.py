@@ -0,0 +1,36 @@
+"""create coaching_nudges table
+
+Revision ID: 25d9e9ac146f
+Revises: c8502ce70b23
+Create Date: 2026-10-18 11:26:05.918342
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '25d9e9ac146f'
+down_revision: Union[str, Sequence[str], None] = 'c8502ce70b23'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Cached LLM coaching nudges, valid while transcript_hash matches the call
+    op.create_table(
+        'coaching_nudges',
+        sa.Column('call_id', sa.String(), sa.ForeignKey('calls_db.call_id'), primary_key=True),
+        sa.Column('transcript_hash', sa.String(length=40), nullable=False),
+        sa.Column('nudges', postgresql.ARRAY(sa.String()), nullable=False),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('coaching_nudges')
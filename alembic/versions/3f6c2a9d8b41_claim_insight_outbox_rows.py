@@ -0,0 +1,38 @@
+"""claim insight_outbox rows
+
+Revision ID: 3f6c2a9d8b41
+Revises: e7d509d1e3a0
+Create Date: 2026-10-18 21:40:12.507316
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f6c2a9d8b41'
+down_revision: Union[str, Sequence[str], None] = 'e7d509d1e3a0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Each API process claims the outbox rows it works on, so a booting
+    # worker only re-queues rows nobody holds instead of the whole outbox
+    op.add_column('insight_outbox', sa.Column('claimed_by', sa.String(), nullable=True))
+    op.add_column('insight_outbox', sa.Column('claimed_at', sa.DateTime(), nullable=True))
+    # enqueued_at was now() in the session's time zone; store naive UTC so
+    # lag arithmetic doesn't depend on the server's TimeZone setting
+    op.execute("UPDATE insight_outbox SET enqueued_at = timezone('UTC', enqueued_at::timestamptz)")
+    op.alter_column('insight_outbox', 'enqueued_at', server_default=sa.text("timezone('UTC', now())"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.alter_column('insight_outbox', 'enqueued_at', server_default=sa.func.now())
+    op.execute("UPDATE insight_outbox SET enqueued_at = timezone('UTC', enqueued_at)::timestamp")
+    op.drop_column('insight_outbox', 'claimed_at')
+    op.drop_column('insight_outbox', 'claimed_by')
@@ -0,0 +1,39 @@
+"""add call_insights.created_xid refresh cursor
+
+Revision ID: 6b0e4d7f2c19
+Revises: 3f6c2a9d8b41
+Create Date: 2026-10-18 22:05:31.284119
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6b0e4d7f2c19'
+down_revision: Union[str, Sequence[str], None] = '3f6c2a9d8b41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The in-process embedding store pulls rows written by transactions that
+    # were still open at its last refresh, which a created_at cursor misses
+    # once they commit later than its overlap. Existing rows stay NULL (only
+    # a full load reads them), so the table isn't rewritten. Needs
+    # PostgreSQL 13+ for pg_current_xact_id().
+    op.add_column('call_insights', sa.Column('created_xid', sa.BigInteger(), nullable=True))
+    op.alter_column(
+        'call_insights', 'created_xid',
+        server_default=sa.text('pg_current_xact_id()::text::bigint'),
+    )
+    op.create_index('ix_call_insights_created_xid', 'call_insights', ['created_xid'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_call_insights_created_xid', table_name='call_insights')
+    op.drop_column('call_insights', 'created_xid')
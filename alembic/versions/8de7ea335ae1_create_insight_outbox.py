@@ -0,0 +1,36 @@
+"""create insight_outbox
+
+Revision ID: 8de7ea335ae1
+Revises: 0530d9d15b9e
+Create Date: 2026-10-18 15:12:40.118264
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8de7ea335ae1'
+down_revision: Union[str, Sequence[str], None] = '0530d9d15b9e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Durable queue of calls from POST /calls awaiting insight computation;
+    # a row is deleted in the same transaction that writes the insight
+    op.create_table(
+        'insight_outbox',
+        sa.Column('call_id', sa.String(), sa.ForeignKey('calls_db.call_id'), primary_key=True),
+        sa.Column('enqueued_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('last_error', sa.String(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('insight_outbox')
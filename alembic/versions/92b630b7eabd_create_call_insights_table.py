@@ -12,7 +12,7 @@ import sqlalchemy as sa
 from sqlalchemy.dialects import postgresql
 
 revision: str = '92b630b7eabd'
-down_revision: Union[str, Sequence[str], None] = 'feb1f63d1ca3'
+down_revision: Union[str, Sequence[str], None] = 'bcc4ec678733'
 branch_labels: Union[str, Sequence[str], None] = None
 depends_on: Union[str, Sequence[str], None] = None
 
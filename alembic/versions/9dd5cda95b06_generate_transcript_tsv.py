@@ -0,0 +1,45 @@
+"""make calls_db.transcript_tsv a generated column
+
+Revision ID: 9dd5cda95b06
+Revises: 25d9e9ac146f
+Create Date: 2026-10-18 12:40:19.377104
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import TSVECTOR
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9dd5cda95b06'
+down_revision: Union[str, Sequence[str], None] = '25d9e9ac146f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+table = 'calls_db'
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The column was filled once by bcc4ec678733 and never maintained; a stored
+    # generated column keeps it current for every insert and update.
+    op.drop_index('ix_calls_transcript_tsv', table_name=table)
+    op.drop_column(table, 'transcript_tsv')
+    op.add_column(
+        table,
+        sa.Column(
+            'transcript_tsv', TSVECTOR(),
+            sa.Computed("to_tsvector('english', transcript)", persisted=True),
+        ),
+    )
+    op.create_index('ix_calls_transcript_tsv', table, ['transcript_tsv'], postgresql_using='gin')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_calls_transcript_tsv', table_name=table)
+    op.drop_column(table, 'transcript_tsv')
+    op.add_column(table, sa.Column('transcript_tsv', TSVECTOR(), nullable=True))
+    op.execute("UPDATE calls_db SET transcript_tsv = to_tsvector('english', transcript);")
+    op.create_index('ix_calls_transcript_tsv', table, ['transcript_tsv'], postgresql_using='gin')
@@ -0,0 +1,56 @@
+"""store call_insights.embedding as packed float32 bytea
+
+Revision ID: c8502ce70b23
+Revises: 1a86a512250b
+Create Date: 2026-10-18 10:03:47.551920
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import numpy as np
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c8502ce70b23'
+down_revision: Union[str, Sequence[str], None] = '1a86a512250b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_ROWS = 5000
+table = 'call_insights'
+
+
+def _convert(src: str, dst: str, encode):
+    """Copy src -> dst in keyset-ordered batches so large tables never load at once."""
+    conn = op.get_bind()
+    select = sa.text(
+        f"SELECT call_id, {src} FROM {table} "
+        "WHERE call_id > :last ORDER BY call_id LIMIT :n"
+    )
+    update = sa.text(f"UPDATE {table} SET {dst} = :value WHERE call_id = :call_id")
+    last = ""
+    while True:
+        rows = conn.execute(select, {"last": last, "n": BATCH_ROWS}).all()
+        if not rows:
+            break
+        conn.execute(update, [{"call_id": cid, "value": encode(value)} for cid, value in rows])
+        last = rows[-1][0]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(table, sa.Column('embedding_packed', sa.LargeBinary(), nullable=True))
+    _convert('embedding', 'embedding_packed', lambda v: np.asarray(v, dtype='<f4').tobytes())
+    op.drop_column(table, 'embedding')
+    op.alter_column(table, 'embedding_packed', new_column_name='embedding', nullable=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.add_column(table, sa.Column('embedding_array', postgresql.ARRAY(sa.Float), nullable=True))
+    _convert('embedding', 'embedding_array', lambda v: np.frombuffer(v, dtype='<f4').tolist())
+    op.drop_column(table, 'embedding')
+    op.alter_column(table, 'embedding_array', new_column_name='embedding', nullable=False)
@@ -0,0 +1,166 @@
+"""partition calls_db and call_insights by month
+
+Revision ID: e7d509d1e3a0
+Revises: f014d6d48b17
+Create Date: 2026-10-18 19:02:51.377410
+
+"""
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import TSVECTOR
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7d509d1e3a0'
+down_revision: Union[str, Sequence[str], None] = 'f014d6d48b17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONTHS_AHEAD = 3
+CALL_COLUMNS = "call_id, agent_id, customer_id, language, start_time, duration_seconds, transcript"
+INSIGHT_COLUMNS = (
+    "embedding, customer_sentiment, agent_talk_ratio, created_at, agent_words, customer_words, "
+    "agent_turns, customer_turns, agent_filler_rate, customer_filler_rate, "
+    "first_response_seconds, avg_response_gap_seconds"
+)
+FEATURE_COLUMNS = (
+    ('agent_words', sa.Integer()),
+    ('customer_words', sa.Integer()),
+    ('agent_turns', sa.Integer()),
+    ('customer_turns', sa.Integer()),
+    ('agent_filler_rate', sa.Float()),
+    ('customer_filler_rate', sa.Float()),
+    ('first_response_seconds', sa.Float()),
+    ('avg_response_gap_seconds', sa.Float()),
+)
+
+
+def _add_months(month: date, n: int) -> date:
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _call_columns() -> list:
+    return [
+        sa.Column('call_id', sa.String(), nullable=False),
+        sa.Column('agent_id', sa.String(), nullable=False),
+        sa.Column('customer_id', sa.String(), nullable=False),
+        sa.Column('language', sa.String(), nullable=True),
+        sa.Column('start_time', sa.DateTime(), nullable=False),
+        sa.Column('duration_seconds', sa.Integer(), nullable=True),
+        sa.Column('transcript', sa.String(), nullable=False),
+        sa.Column(
+            'transcript_tsv', TSVECTOR(),
+            sa.Computed("to_tsvector('english', transcript)", persisted=True),
+        ),
+    ]
+
+
+def _insight_columns(partitioned: bool) -> list:
+    columns = [sa.Column('call_id', sa.String(), nullable=False)]
+    if partitioned:
+        columns.append(sa.Column('start_time', sa.DateTime(), nullable=False))
+    return columns + [
+        sa.Column('embedding', sa.LargeBinary(), nullable=False),
+        sa.Column('customer_sentiment', sa.Float(), nullable=False),
+        sa.Column('agent_talk_ratio', sa.Float(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        *(sa.Column(name, type_, nullable=True) for name, type_ in FEATURE_COLUMNS),
+    ]
+
+
+def _create_indexes(partitioned: bool):
+    op.create_index(
+        'ix_calls_start_time_call_id', 'calls_db',
+        [sa.text('start_time DESC'), sa.text('call_id DESC')],
+    )
+    op.create_index(
+        'ix_calls_agent_start_time_call_id', 'calls_db',
+        ['agent_id', sa.text('start_time DESC'), sa.text('call_id DESC')],
+    )
+    op.create_index('ix_calls_transcript_tsv', 'calls_db', ['transcript_tsv'], postgresql_using='gin')
+    op.create_index('ix_call_insights_created_at', 'call_insights', ['created_at'])
+    op.create_index('ix_call_insights_customer_sentiment', 'call_insights', ['customer_sentiment'])
+    op.create_index('ix_call_insights_talk_ratio', 'call_insights', ['agent_talk_ratio'])
+    op.create_index(
+        'ix_call_insights_call_id_summary', 'call_insights',
+        ['call_id', 'start_time'] if partitioned else ['call_id'],
+        postgresql_include=['customer_sentiment', 'agent_talk_ratio'],
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Rebuilds both tables as RANGE (start_time) partitioned tables with one
+    # partition per month. Partition keys must be part of every primary and
+    # foreign key, so call_insights gets its call's start_time and both keys
+    # become (call_id, start_time). coaching_nudges and insight_outbox lose
+    # their foreign keys instead: they're small, keyed by call_id alone, and
+    # cleaned up by the retention command. Rows are copied, so this takes as
+    # long as rewriting the two tables.
+    for table in ('call_insights', 'coaching_nudges', 'insight_outbox'):
+        op.drop_constraint(f'{table}_call_id_fkey', table, type_='foreignkey')
+    op.rename_table('calls_db', 'calls_db_unpartitioned')
+    op.rename_table('call_insights', 'call_insights_unpartitioned')
+
+    op.create_table('calls_db', *_call_columns(), postgresql_partition_by='RANGE (start_time)')
+    op.create_table('call_insights', *_insight_columns(True), postgresql_partition_by='RANGE (start_time)')
+
+    bind = op.get_bind()
+    months = set(bind.execute(sa.text(
+        "SELECT DISTINCT CAST(date_trunc('month', start_time) AS date) FROM calls_db_unpartitioned"
+    )).scalars())
+    first = date.today().replace(day=1)
+    months |= {_add_months(first, i) for i in range(MONTHS_AHEAD + 1)}
+    for month in sorted(months):
+        for table in ('calls_db', 'call_insights'):
+            op.execute(
+                f"CREATE TABLE {table}_p{month:%Y%m} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_add_months(month, 1).isoformat()}')"
+            )
+
+    op.execute(f"INSERT INTO calls_db ({CALL_COLUMNS}) SELECT {CALL_COLUMNS} FROM calls_db_unpartitioned")
+    op.execute(
+        f"INSERT INTO call_insights (call_id, start_time, {INSIGHT_COLUMNS}) "
+        f"SELECT i.call_id, c.start_time, {', '.join('i.' + n for n in INSIGHT_COLUMNS.split(', '))} "
+        "FROM call_insights_unpartitioned i JOIN calls_db_unpartitioned c ON c.call_id = i.call_id"
+    )
+    op.drop_table('call_insights_unpartitioned')
+    op.drop_table('calls_db_unpartitioned')
+
+    # Keys and indexes are built after the copy, once per partition
+    op.create_primary_key('calls_db_pkey', 'calls_db', ['call_id', 'start_time'])
+    op.create_primary_key('call_insights_pkey', 'call_insights', ['call_id', 'start_time'])
+    op.create_foreign_key(
+        'fk_call_insights_call', 'call_insights', 'calls_db',
+        ['call_id', 'start_time'], ['call_id', 'start_time'],
+    )
+    _create_indexes(partitioned=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Back to plain tables keyed by call_id; fails if a call_id now exists in
+    # more than one month. Detached partitions are left alone.
+    op.rename_table('calls_db', 'calls_db_partitioned')
+    op.rename_table('call_insights', 'call_insights_partitioned')
+    op.create_table('calls_db', *_call_columns())
+    op.create_table('call_insights', *_insight_columns(False))
+
+    op.execute(f"INSERT INTO calls_db ({CALL_COLUMNS}) SELECT {CALL_COLUMNS} FROM calls_db_partitioned")
+    op.execute(
+        f"INSERT INTO call_insights (call_id, {INSIGHT_COLUMNS}) "
+        f"SELECT call_id, {INSIGHT_COLUMNS} FROM call_insights_partitioned"
+    )
+    op.drop_table('call_insights_partitioned')
+    op.drop_table('calls_db_partitioned')
+
+    op.create_primary_key('calls_db_pkey', 'calls_db', ['call_id'])
+    op.create_primary_key('call_insights_pkey', 'call_insights', ['call_id'])
+    op.create_index('ix_calls_db_call_id', 'calls_db', ['call_id'])
+    _create_indexes(partitioned=False)
+    for table in ('call_insights', 'coaching_nudges', 'insight_outbox'):
+        op.create_foreign_key(f'{table}_call_id_fkey', table, 'calls_db', ['call_id'], ['call_id'])
@@ -0,0 +1,43 @@
+"""add call_insights conversation features
+
+Revision ID: f014d6d48b17
+Revises: 8de7ea335ae1
+Create Date: 2026-10-18 17:41:06.532917
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f014d6d48b17'
+down_revision: Union[str, Sequence[str], None] = '8de7ea335ae1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = (
+    ('agent_words', sa.Integer()),
+    ('customer_words', sa.Integer()),
+    ('agent_turns', sa.Integer()),
+    ('customer_turns', sa.Integer()),
+    ('agent_filler_rate', sa.Float()),
+    ('customer_filler_rate', sa.Float()),
+    ('first_response_seconds', sa.Float()),
+    ('avg_response_gap_seconds', sa.Float()),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Nullable, so adding them is a catalog-only change; existing rows are
+    # filled by `python -m utils.backfill_insights --features`
+    for name, type_ in COLUMNS:
+        op.add_column('call_insights', sa.Column(name, type_, nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, _ in reversed(COLUMNS):
+        op.drop_column('call_insights', name)
@@ -0,0 +1,84 @@
+from dataclasses import dataclass, field
+from typing import Optional, Sequence
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.types import TypeDecorator
+
+
+@dataclass
+class BulkResult:
+    inserted: int = 0
+    skipped: int = 0
+    # values of the `returning` column for the rows actually inserted
+    keys: list = field(default_factory=list)
+
+    def __iadd__(self, other: "BulkResult") -> "BulkResult":
+        self.inserted += other.inserted
+        self.skipped += other.skipped
+        self.keys.extend(other.keys)
+        return self
+
+
+async def copy_insert(
+    session: AsyncSession,
+    model,
+    rows: Sequence[dict],
+    conflict: Optional[Sequence[str]] = None,
+    returning: Optional[str] = None,
+) -> BulkResult:
+    """
+    Insert `rows` into `model`'s table, skipping rows whose `conflict` key
+    (the primary key by default) already exists.
+
+    Rows are streamed with asyncpg's binary COPY into a per-connection temp
+    staging table and moved across with a single
+    INSERT ... SELECT ... ON CONFLICT DO NOTHING, so a batch costs three round
+    trips regardless of size. Runs inside the session's current transaction;
+    the caller commits. With `returning`, that column's values for the rows
+    that were actually inserted come back in `BulkResult.keys`.
+    """
+    if not rows:
+        return BulkResult()
+
+    table = model.__table__
+    if conflict is None:
+        conflict = [c.name for c in table.primary_key]
+    columns = [c for c in table.columns if c.name in rows[0]]
+    names = [c.name for c in columns]
+    conn = await session.connection()
+    dialect = conn.dialect
+    binders = [
+        (lambda v, t=c.type: t.process_bind_param(v, dialect))
+        if isinstance(c.type, TypeDecorator) else None
+        for c in columns
+    ]
+    records = [
+        tuple(row[n] if b is None else b(row[n]) for n, b in zip(names, binders))
+        for row in rows
+    ]
+
+    raw = (await conn.get_raw_connection()).driver_connection
+    if not raw.is_in_transaction():
+        # SQLAlchemy's asyncpg adapter only sends BEGIN with its first statement.
+        # Without one every raw call below would autocommit, and committing the
+        # COPY empties the ON COMMIT DELETE ROWS stage before the INSERT reads it
+        await conn.exec_driver_sql("SELECT 1")
+    stage = f"_stage_{table.name}"
+    col_list = ", ".join(f'"{n}"' for n in names)
+    await raw.execute(
+        f'CREATE TEMP TABLE IF NOT EXISTS "{stage}" '
+        f'(LIKE "{table.name}" INCLUDING DEFAULTS) ON COMMIT DELETE ROWS'
+    )
+    await raw.execute(f'TRUNCATE "{stage}"')
+    await raw.copy_records_to_table(stage, records=records, columns=names)
+    insert = (
+        f'INSERT INTO "{table.name}" ({col_list}) '
+        f'SELECT {col_list} FROM "{stage}" '
+        f'ON CONFLICT ({", ".join(conflict)}) DO NOTHING'
+    )
+    if returning is not None:
+        keys = [r[0] for r in await raw.fetch(f'{insert} RETURNING "{returning}"')]
+        return BulkResult(inserted=len(keys), skipped=len(records) - len(keys), keys=keys)
+    status = await raw.execute(insert)
+    inserted = int(status.split()[-1])
+    return BulkResult(inserted=inserted, skipped=len(records) - inserted)
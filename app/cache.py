@@ -0,0 +1,228 @@
+import asyncio
+import hashlib
+import os
+import time
+from collections import Counter, OrderedDict
+from typing import Awaitable, Callable, Iterable, Optional, Protocol
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+
+from app.metrics import span
+
+RESPONSE_CACHE_URL = os.getenv("RESPONSE_CACHE_URL", "")
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "30"))
+RESPONSE_CACHE_MAX_ITEMS = int(os.getenv("RESPONSE_CACHE_MAX_ITEMS", "10000"))
+
+
+class CacheBackend(Protocol):
+    async def get_many(self, keys: list[str]) -> list[Optional[bytes]]: ...
+
+    async def set(self, key: str, value: bytes, ttl: float): ...
+
+    async def incr(self, key: str) -> int: ...
+
+
+class MemoryBackend:
+    """
+    In-process TTL + LRU store. Tag versions are kept apart from the LRU so
+    they are never evicted (an evicted version would resurrect stale entries).
+    """
+
+    def __init__(self, max_items: int = RESPONSE_CACHE_MAX_ITEMS):
+        self.max_items = max_items
+        self._entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self._counters: dict[str, int] = {}
+
+    async def get_many(self, keys: list[str]) -> list[Optional[bytes]]:
+        now = time.monotonic()
+        found = []
+        for key in keys:
+            if key in self._counters:
+                found.append(str(self._counters[key]).encode())
+                continue
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < now:
+                self._entries.pop(key, None)
+                found.append(None)
+            else:
+                self._entries.move_to_end(key)
+                found.append(entry[1])
+        return found
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_items:
+            self._entries.popitem(last=False)
+
+    async def incr(self, key: str) -> int:
+        self._counters[key] = self._counters.get(key, 0) + 1
+        return self._counters[key]
+
+
+class RedisBackend:
+    """Shared store so every worker, and the ingest/backfill CLIs, see the same entries and invalidations."""
+
+    def __init__(self, url: str, prefix: str = "salescalls:"):
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(url)
+        self.prefix = prefix
+
+    async def get_many(self, keys: list[str]) -> list[Optional[bytes]]:
+        return await self._redis.mget([self.prefix + k for k in keys])
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        await self._redis.set(self.prefix + key, value, px=int(ttl * 1000))
+
+    async def incr(self, key: str) -> int:
+        return await self._redis.incr(self.prefix + key)
+
+
+class ResponseCache:
+    """
+    Serialised-response cache for read endpoints.
+
+    Entries are keyed by route, request path/query and the current version of
+    each tag the response depends on; `invalidate(tag)` bumps the version, so
+    older entries are simply never read again and age out. Concurrent misses
+    on the same key share one computation, responses carry an ETag, and a
+    matching If-None-Match gets a 304 without a body. Backend failures
+    degrade to computing the response.
+    """
+
+    def __init__(self, backend: Optional[CacheBackend] = None, ttl: float = RESPONSE_CACHE_TTL_SECONDS):
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.ttl = ttl
+        self._inflight: dict[str, asyncio.Future] = {}
+        self.hits: Counter[str] = Counter()
+        self.misses: Counter[str] = Counter()
+        self.coalesced: Counter[str] = Counter()
+        self.not_modified: Counter[str] = Counter()
+
+    async def _key(self, request: Request, route: str, tags: Iterable[str]) -> str:
+        tags = sorted(tags)
+        versions = await self.backend.get_many([f"tag:{t}" for t in tags]) if tags else []
+        query = "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+        raw = f"{request.url.path}?{query}|" + ",".join(
+            f"{t}={(v or b'0').decode()}" for t, v in zip(tags, versions)
+        )
+        return f"{route}:{hashlib.sha1(raw.encode()).hexdigest()}"
+
+    async def _compute(
+        self, key: Optional[str], compute, adapter: TypeAdapter, exclude_unset: bool, ttl: float
+    ) -> bytes:
+        # stored as "<sha1 of body>\n<body>"; the digest doubles as the ETag
+        result = await compute()
+        with span("serialize"):
+            body = adapter.dump_json(adapter.validate_python(result), exclude_unset=exclude_unset)
+        entry = hashlib.sha1(body).hexdigest().encode() + b"\n" + body
+        if key is not None:
+            try:
+                await self.backend.set(key, entry, ttl)
+            except Exception as e:
+                print(f"[WARN] Response cache write failed: {e!r}")
+        return entry
+
+    async def _fill(self, route: str, key: str, *args) -> bytes:
+        fut = self._inflight.get(key)
+        if fut is not None:
+            self.coalesced[route] += 1
+            try:
+                return await asyncio.shield(fut)
+            except asyncio.CancelledError:
+                # the request computing it went away; compute our own
+                if not fut.cancelled():
+                    raise
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            entry = await self._compute(key, *args)
+            fut.set_result(entry)
+            return entry
+        except Exception as e:
+            fut.set_exception(e)
+            # retrieved by waiters if there are any; don't warn if not
+            fut.exception()
+            raise
+        finally:
+            if not fut.done():
+                fut.cancel()
+            self._inflight.pop(key, None)
+
+    async def respond(
+        self,
+        request: Request,
+        route: str,
+        tags: Iterable[str],
+        compute: Callable[[], Awaitable],
+        adapter: TypeAdapter,
+        exclude_unset: bool = False,
+        ttl: Optional[float] = None,
+    ) -> Response:
+        """
+        Serve `route` from cache, or await `compute()` (coalesced with other
+        requests for the same key), serialise it through `adapter` and store
+        it for `ttl` seconds.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        try:
+            key = await self._key(request, route, tags)
+            entry = (await self.backend.get_many([key]))[0]
+        except Exception as e:
+            print(f"[WARN] Response cache read failed: {e!r}")
+            key, entry = None, None
+
+        if entry is not None:
+            self.hits[route] += 1
+            status = "hit"
+        else:
+            self.misses[route] += 1
+            status = "miss"
+            args = (compute, adapter, exclude_unset, ttl)
+            entry = await (self._compute(None, *args) if key is None else self._fill(route, key, *args))
+
+        digest, body = entry.split(b"\n", 1)
+        etag = f'"{digest.decode()}"'
+        headers = {"ETag": etag, "Cache-Control": f"max-age={int(ttl)}", "X-Cache": status}
+        if etag in [t.strip() for t in request.headers.get("if-none-match", "").split(",")]:
+            self.not_modified[route] += 1
+            return Response(status_code=304, headers=headers)
+        return Response(body, media_type="application/json", headers=headers)
+
+    async def invalidate(self, *tags: str):
+        """Make every cached response depending on any of `tags` stale."""
+        for tag in set(tags):
+            try:
+                await self.backend.incr(f"tag:{tag}")
+            except Exception as e:
+                print(f"[WARN] Response cache invalidation of {tag} failed: {e!r}")
+
+    def stats(self) -> dict:
+        routes = set(self.hits) | set(self.misses)
+        return {
+            route: {
+                "hits": self.hits[route],
+                "misses": self.misses[route],
+                "coalesced": self.coalesced[route],
+                "not_modified": self.not_modified[route],
+                "hit_rate": self.hits[route] / (self.hits[route] + self.misses[route]),
+            }
+            for route in sorted(routes)
+        }
+
+
+_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> ResponseCache:
+    global _cache
+    if _cache is None:
+        _cache = ResponseCache(RedisBackend(RESPONSE_CACHE_URL) if RESPONSE_CACHE_URL else None)
+    return _cache
+
+
+async def invalidate(*tags: str):
+    """Writer hook: drop cached responses that depend on `tags`."""
+    await get_response_cache().invalidate(*tags)
@@ -0,0 +1,103 @@
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from app.raw_archive import get_raw_archive
+
+# one JSON file per call, as written before the raw archive; still read
+# until `python -m utils.pack_raw` has moved them into the archive
+RAW_DIR = Path("data/raw")
+
+
+def parse_datetime(ts: str) -> datetime:
+    try:
+        dt = datetime.strptime(ts, "%a %b %d %H:%M:%S %z %Y")
+        dt = dt.replace(tzinfo=None)
+    except ValueError:
+        dt = datetime.strptime(ts, "%a %b %d %H:%M:%S %Y")
+    return dt
+
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def transcript_times(convo: list[dict]) -> list[float]:
+    """Epoch seconds for each line of the transcript build_call makes from `convo`."""
+    times = []
+    for m in convo:
+        at = (parse_datetime(m["created_at"]) - _EPOCH).total_seconds()
+        times.extend([at] * (m["text"].count("\n") + 1))
+    return times
+
+
+def build_call(convo: list[dict]):
+    start = parse_datetime(convo[0]["created_at"])
+    end   = parse_datetime(convo[-1]["created_at"])
+    duration = int((end - start).total_seconds())
+
+    # Identifing agent or customer
+    agent = next((m for m in convo if not m["inbound"]), None)
+    cust  = next((m for m in convo if     m["inbound"]), None)
+    if agent is None or cust is None:
+        return None
+
+    # Full transcript
+    lines = []
+    for m in convo:
+        speaker = "Agent" if not m["inbound"] else "Customer"
+        lines.append(f"{speaker} ({m['author_id']}): {m['text']}")
+    transcript = "\n".join(lines)
+
+    return {
+        "call_id":           str(agent["tweet_id"]),
+        "agent_id":          agent["author_id"],
+        "customer_id":       cust["author_id"],
+        "language":          "en",
+        "start_time":        start,
+        "duration_seconds":  duration,
+        "transcript":        transcript,
+    }
+
+
+def _raw_record(convo: list[dict]) -> list[dict]:
+    return [{
+        "tweet_id": m["tweet_id"],
+        "author_id": m["author_id"],
+        "inbound": m["inbound"],
+        "created_at": m["created_at"],
+        "text": m["text"]
+    } for m in convo]
+
+
+def write_raw(call_id: str, convo: list[dict]):
+    get_raw_archive().append(call_id, _raw_record(convo))
+
+
+def write_raw_many(items: list[tuple[str, list[dict]]]):
+    """Archive many conversations with one append and one index commit."""
+    get_raw_archive().append_many((call_id, _raw_record(convo)) for call_id, convo in items)
+
+
+def _read_legacy(call_id: str) -> Optional[list[dict]]:
+    try:
+        with open(RAW_DIR / f"{call_id}.json", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def read_raw(call_id: str) -> Optional[list[dict]]:
+    """The conversation stored for `call_id`, or None if there is none."""
+    convo = get_raw_archive().get(call_id)
+    return convo if convo is not None else _read_legacy(call_id)
+
+
+def read_raw_many(call_ids: list[str]) -> dict[str, list[dict]]:
+    found = get_raw_archive().get_many(call_ids)
+    for call_id in call_ids:
+        if call_id not in found:
+            convo = _read_legacy(call_id)
+            if convo is not None:
+                found[call_id] = convo
+    return found
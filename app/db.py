@@ -1,7 +1,15 @@
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
-from sqlalchemy.orm import declarative_base
 import os
+import time
+from typing import AsyncGenerator
+
 from dotenv import load_dotenv
+from sqlalchemy import exc, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.metrics import instrument_engine
+
 load_dotenv()
 
 def get_database_url(sync: bool = False):
@@ -16,13 +24,121 @@ def get_database_url(sync: bool = False):
     return f"postgresql+asyncpg://{user}:{password}@{host}:{port}/{db}"
 
 
-DATABASE_URL = os.getenv("DB_URL")
-print("▶️ Connecting to:", DATABASE_URL)
-engine = create_async_engine(DATABASE_URL, echo=True)
+DATABASE_URL = os.getenv("DB_URL") or os.getenv("DATABASE_URL") or get_database_url()
+# Read-only routes go here; defaults to the primary
+READ_DATABASE_URL = os.getenv("DB_READ_URL") or DATABASE_URL
+
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() == "true"
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+# Prepared statements cached per connection; set 0 behind pgbouncer in transaction mode
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+
+
+class PoolMetrics:
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Queue pool that records how long each checkout waited for a connection
+    (including connecting, when the pool grows). `make_engine` gives every
+    engine its own subclass so the metrics survive pool re-creation.
+    """
+
+    metrics: PoolMetrics
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            self.metrics.checkouts += 1
+            self.metrics.wait_seconds_total += waited
+            self.metrics.wait_seconds_max = max(self.metrics.wait_seconds_max, waited)
+
+
+def make_engine(url: str, **overrides) -> AsyncEngine:
+    options = dict(
+        echo=DB_ECHO,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        poolclass=type("TimedQueuePool", (TimedQueuePool,), {"metrics": PoolMetrics()}),
+    )
+    if url.startswith("postgresql+asyncpg"):
+        options["connect_args"] = {
+            "statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+            "prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+        }
+    options.update(overrides)
+    return create_async_engine(url, **options)
+
+
+engine = make_engine(DATABASE_URL)
+read_engine = engine if READ_DATABASE_URL == DATABASE_URL else make_engine(READ_DATABASE_URL)
+instrument_engine(engine, "primary")
+if read_engine is not engine:
+    instrument_engine(read_engine, "replica")
 SessionLocal = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
-from typing import AsyncGenerator
+ReadSessionLocal = async_sessionmaker(read_engine, expire_on_commit=False, class_=AsyncSession)
+
 
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
     async with SessionLocal() as session:
         yield session
+
+
+async def get_read_session() -> AsyncGenerator[AsyncSession, None]:
+    """Session on the read replica (if configured); may lag the primary slightly."""
+    async with ReadSessionLocal() as session:
+        yield session
+
+
+async def init_db():
+    """Open one connection per engine at startup so a bad URL fails fast."""
+    for eng in {engine, read_engine}:
+        async with eng.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+
+async def dispose_engines():
+    for eng in {engine, read_engine}:
+        await eng.dispose()
+
+
+def pool_stats() -> dict:
+    stats = {}
+    for name, eng in (("primary", engine), ("replica", read_engine)):
+        if name == "replica" and eng is engine:
+            continue
+        pool = eng.pool
+        metrics = pool.metrics
+        stats[name] = {
+            "size": pool.size(),
+            "in_use": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": DB_MAX_OVERFLOW,
+            "checkouts": metrics.checkouts,
+            "timeouts": metrics.timeouts,
+            "wait_seconds_avg": metrics.wait_seconds_total / metrics.checkouts if metrics.checkouts else 0.0,
+            "wait_seconds_max": metrics.wait_seconds_max,
+        }
+    return stats
+
+
 Base = declarative_base()
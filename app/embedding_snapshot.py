@@ -0,0 +1,173 @@
+import fcntl
+import json
+import os
+import shutil
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+EMBEDDING_SNAPSHOT_DIR = os.getenv("EMBEDDING_SNAPSHOT_DIR", "data/embeddings")
+# generations kept on disk; workers still mapping a pruned one keep reading it
+EMBEDDING_SNAPSHOT_KEEP = int(os.getenv("EMBEDDING_SNAPSHOT_KEEP", "3"))
+WRITE_BLOCK_ROWS = 65536
+
+ARRAYS = ("ids", "vectors", "agent_codes", "start_times")
+CURRENT = "CURRENT"
+
+
+@dataclass
+class Snapshot:
+    """
+    One generation of the embedding snapshot, memory-mapped read-only.
+
+    Rows are sorted by call_id, so `ids` doubles as the lookup index (a binary
+    search, no per-process dict). Every process mapping the same generation
+    shares one copy of it in the page cache.
+    """
+
+    generation: int
+    path: Path
+    ids: np.ndarray  # utf-8 call_ids, fixed width, sorted
+    vectors: np.ndarray  # (rows, dim) float32, L2-normalised
+    agent_codes: np.ndarray  # int32 positions in `agents`
+    start_times: np.ndarray  # int64 epoch seconds
+    agents: list
+    dim: Optional[int]
+    cursor: Optional[int]  # EmbeddingStore.refresh's transaction id horizon
+    created_at: float
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def row(self, call_id: str) -> Optional[int]:
+        key = call_id.encode("utf-8")
+        i = int(np.searchsorted(self.ids, key))
+        return i if i < len(self.ids) and self.ids[i] == key else None
+
+    def call_id(self, row: int) -> str:
+        return self.ids[row].decode("utf-8")
+
+
+def _generation_dir(root: Path, generation: int) -> Path:
+    return root / f"gen-{generation:06d}"
+
+
+def _generations(root: Path) -> list[int]:
+    return sorted(int(p.name.split("-")[1]) for p in root.glob("gen-*") if p.is_dir())
+
+
+def current_generation(root: str | Path = EMBEDDING_SNAPSHOT_DIR) -> Optional[int]:
+    try:
+        return int((Path(root) / CURRENT).read_text())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _fsync(path: Path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _save(path: Path, array: np.ndarray):
+    with open(path, "wb") as f:
+        np.save(f, array)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def write_snapshot(
+    root: str | Path,
+    ids: np.ndarray,
+    vectors: np.ndarray,
+    agent_codes: np.ndarray,
+    start_times: np.ndarray,
+    agents: list,
+    cursor: Optional[int],
+    keep: int = EMBEDDING_SNAPSHOT_KEEP,
+) -> int:
+    """
+    Write the rows as a new generation and make it current; returns its
+    number. Files are written and fsynced in a temporary directory that is
+    renamed into place, then CURRENT is replaced, so readers only ever see
+    complete generations. Generations beyond the newest `keep` are removed.
+    """
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    with open(root / ".lock", "a+b") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        generation = max(_generations(root), default=0) + 1
+        tmp = root / f".gen-{generation:06d}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir()
+
+        order = np.argsort(ids, kind="stable")
+        _save(tmp / "ids.npy", ids[order])
+        _save(tmp / "agent_codes.npy", np.asarray(agent_codes, dtype=np.int32)[order])
+        _save(tmp / "start_times.npy", np.asarray(start_times, dtype=np.int64)[order])
+        dim = vectors.shape[1] if vectors.ndim == 2 and len(ids) else None
+        out = np.lib.format.open_memmap(tmp / "vectors.npy", mode="w+", dtype=np.float32, shape=(len(ids), dim or 0))
+        for start in range(0, len(ids), WRITE_BLOCK_ROWS):
+            out[start:start + WRITE_BLOCK_ROWS] = vectors[order[start:start + WRITE_BLOCK_ROWS]]
+        out.flush()
+        del out
+        _fsync(tmp / "vectors.npy")
+        (tmp / "meta.json").write_text(json.dumps({
+            "rows": len(ids),
+            "dim": dim,
+            "agents": agents,
+            "cursor": cursor,
+            "created_at": time.time(),
+        }))
+        _fsync(tmp / "meta.json")
+
+        tmp.rename(_generation_dir(root, generation))
+        pointer = root / f".{CURRENT}.tmp"
+        pointer.write_text(str(generation))
+        _fsync(pointer)
+        pointer.replace(root / CURRENT)
+        _fsync(root)
+
+        for old in _generations(root)[:-keep] if keep > 0 else []:
+            shutil.rmtree(_generation_dir(root, old), ignore_errors=True)
+    return generation
+
+
+def _load(path: Path, rows: int) -> np.ndarray:
+    # an empty array can't be mapped
+    return np.load(path, mmap_mode="r") if rows else np.load(path)
+
+
+def open_snapshot(root: str | Path = EMBEDDING_SNAPSHOT_DIR, generation: Optional[int] = None) -> Optional[Snapshot]:
+    """Map a generation (the current one by default); None if none has been written."""
+    root = Path(root)
+    for _ in range(3):
+        gen = generation if generation is not None else current_generation(root)
+        if gen is None:
+            return None
+        path = _generation_dir(root, gen)
+        try:
+            meta = json.loads((path / "meta.json").read_text())
+            arrays = {name: _load(path / f"{name}.npy", meta["rows"]) for name in ARRAYS}
+        except FileNotFoundError:
+            if generation is not None:
+                raise
+            continue  # pruned between reading CURRENT and opening it; read CURRENT again
+        # generations from before the transaction id cursor stored a timestamp;
+        # without a usable cursor the first refresh re-reads every insight
+        cursor = meta["cursor"]
+        return Snapshot(
+            generation=gen,
+            path=path,
+            agents=meta["agents"],
+            dim=meta["dim"],
+            cursor=cursor if isinstance(cursor, int) else None,
+            created_at=meta["created_at"],
+            **arrays,
+        )
+    raise RuntimeError(f"Embedding snapshot generations in {root} keep changing; try again")
@@ -0,0 +1,273 @@
+import time
+from datetime import date, datetime
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.embedding_snapshot import ARRAYS, Snapshot
+from app.models import INSIGHT_JOIN, Call, CallInsight
+from app.partitions import list_partitions
+
+# Every transaction with a lower id has finished (committed or rolled back)
+XMIN_HORIZON = text("SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint")
+LOAD_BATCH_ROWS = 5000
+
+_NO_TIME = np.iinfo(np.int64).min
+
+Row = Tuple[str, Iterable[float], Optional[str], Optional[datetime]]
+
+
+class EmbeddingStore:
+    """
+    Memory-resident copy of call_insights.embedding.
+
+    Embeddings live in one contiguous, L2-normalised float32 matrix with a
+    call_id -> row map, alongside per-row agent codes and start times used for
+    pre-filtering. The matrix grows geometrically, so appending new rows is
+    amortised O(1) and never reloads existing ones.
+
+    Built on a `snapshot`, the store's first rows are the snapshot's,
+    memory-mapped read-only rather than copied, and only rows added after it
+    are held in process memory (`ids`/`row_of` cover just those).
+    """
+
+    def __init__(self, dim: Optional[int] = None, snapshot: Optional[Snapshot] = None):
+        self.snapshot = snapshot
+        self._base = len(snapshot) if snapshot is not None else 0
+        self.dim = snapshot.dim if snapshot is not None and snapshot.dim else dim
+        self.ids: List[str] = []
+        self.row_of: dict[str, int] = {}
+        self._agents: dict[str, int] = {a: i for i, a in enumerate(snapshot.agents)} if snapshot else {}
+        self._vectors = np.empty((0, self.dim or 0), dtype=np.float32)
+        self._agent_codes = np.empty(0, dtype=np.int32)
+        self._start_times = np.empty(0, dtype=np.int64)
+        self.cursor: Optional[int] = snapshot.cursor if snapshot is not None else None
+        # epoch seconds of the oldest calls_db partition: rows before it were
+        # removed by partition retention and are treated as gone
+        self.min_start: Optional[int] = None
+        self.loaded_at: Optional[float] = None
+        self.refreshed_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return self._base + len(self.ids)
+
+    def __contains__(self, call_id: str) -> bool:
+        return self.row(call_id) is not None
+
+    @property
+    def generation(self) -> Optional[int]:
+        return self.snapshot.generation if self.snapshot is not None else None
+
+    def row(self, call_id: str) -> Optional[int]:
+        row = self.row_of.get(call_id)
+        if row is None and self._base:
+            row = self.snapshot.row(call_id)
+        if row is not None and self.min_start is not None:
+            start = self.snapshot.start_times[row] if row < self._base else self._start_times[row - self._base]
+            if start != _NO_TIME and start < self.min_start:
+                return None
+        return row
+
+    def call_id(self, row: int) -> str:
+        return self.snapshot.call_id(row) if row < self._base else self.ids[row - self._base]
+
+    def parts(self) -> List[Tuple[int, np.ndarray]]:
+        """(first row, matrix) for the mapped snapshot rows and the in-memory rows."""
+        parts = [(0, self.snapshot.vectors)] if self._base else []
+        if self.ids:
+            parts.append((self._base, self._vectors[: len(self.ids)]))
+        return parts
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """Every row as one matrix; copies when the store has both snapshot and in-memory rows."""
+        parts = self.parts()
+        if len(parts) == 1:
+            return parts[0][1]
+        if not parts:
+            return self._vectors[:0]
+        return np.concatenate([m for _, m in parts])
+
+    def take(self, rows: np.ndarray) -> np.ndarray:
+        """The vectors of `rows` (row numbers), copied out of the store."""
+        if not self._base:
+            return self._vectors[rows]
+        if not self.ids:
+            return self.snapshot.vectors[rows]
+        rows = np.asarray(rows)
+        mapped = rows < self._base
+        out = np.empty((len(rows), self.dim), dtype=np.float32)
+        out[mapped] = self.snapshot.vectors[rows[mapped]]
+        out[~mapped] = self._vectors[rows[~mapped] - self._base]
+        return out
+
+    def matmul(self, x: np.ndarray) -> np.ndarray:
+        """`vectors @ x`, without first joining the snapshot and in-memory rows."""
+        return np.concatenate([m @ x for _, m in self.parts()])
+
+    def set_min_start(self, day: Optional[date]):
+        self.min_start = None if day is None else _epoch(datetime(day.year, day.month, day.day))
+
+    def get_vector(self, call_id: str) -> Optional[np.ndarray]:
+        row = self.row(call_id)
+        if row is None:
+            return None
+        return self.snapshot.vectors[row] if row < self._base else self._vectors[row - self._base]
+
+    def _reserve(self, extra: int):
+        needed = len(self.ids) + extra
+        capacity = self._vectors.shape[0]
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2, 1024)
+        vectors = np.empty((capacity, self.dim), dtype=np.float32)
+        vectors[: len(self.ids)] = self._vectors[: len(self.ids)]
+        self._vectors = vectors
+        self._agent_codes = np.resize(self._agent_codes, capacity)
+        self._start_times = np.resize(self._start_times, capacity)
+
+    def add(self, items: Iterable[Row]) -> Tuple[int, np.ndarray]:
+        """
+        Append (call_id, embedding, agent_id, start_time) rows. Rows already
+        present, empty or of the wrong width are skipped. Returns the first new
+        row number and the normalised block that was appended.
+        """
+        ids, vecs, agents, times = [], [], [], []
+        for call_id, emb, agent_id, start_time in items:
+            if self.row(call_id) is not None:
+                continue
+            vec = np.asarray(emb, dtype=np.float32)
+            if vec.ndim != 1 or vec.size == 0:
+                continue
+            if self.dim is None:
+                self.dim = vec.size
+                self._vectors = np.empty((0, self.dim), dtype=np.float32)
+            if vec.size != self.dim:
+                continue
+            ids.append(call_id)
+            vecs.append(vec)
+            agents.append(self._agents.setdefault(agent_id, len(self._agents)))
+            times.append(_NO_TIME if start_time is None else _epoch(start_time))
+
+        start = len(self)
+        if not ids:
+            return start, np.empty((0, self.dim or 0), dtype=np.float32)
+
+        block = normalise(np.vstack(vecs))
+        first, end = len(self.ids), len(self.ids) + len(ids)
+        self._reserve(len(ids))
+        self._vectors[first:end] = block
+        self._agent_codes[first:end] = agents
+        self._start_times[first:end] = times
+        for offset, call_id in enumerate(ids):
+            self.row_of[call_id] = start + offset
+        self.ids.extend(ids)
+        return start, block
+
+    def filter_mask(
+        self,
+        agent_id: Optional[str] = None,
+        from_date: Optional[datetime] = None,
+        to_date: Optional[datetime] = None,
+    ) -> Optional[np.ndarray]:
+        if agent_id is None and from_date is None and to_date is None and self.min_start is None:
+            return None
+        n = len(self.ids)
+        columns = [(self._agent_codes[:n], self._start_times[:n])]
+        if self._base:
+            columns.insert(0, (self.snapshot.agent_codes, self.snapshot.start_times))
+        masks = []
+        for codes, times in columns:
+            mask = np.ones(len(codes), dtype=bool)
+            if agent_id is not None:
+                mask &= codes == self._agents.get(agent_id, -1)
+            if from_date is not None:
+                mask &= times >= _epoch(from_date)
+            if to_date is not None:
+                mask &= (times <= _epoch(to_date)) & (times != _NO_TIME)
+            if self.min_start is not None:
+                mask &= (times >= self.min_start) | (times == _NO_TIME)
+            masks.append(mask)
+        return np.concatenate(masks)
+
+    def arrays(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, list]:
+        """
+        (call_ids as utf-8 bytes, vectors, agent codes, start times, agents)
+        for every live row, in row order, e.g. to write a snapshot.
+        """
+        n = len(self.ids)
+        ids = np.array([c.encode("utf-8") for c in self.ids], dtype=bytes)
+        codes, times = self._agent_codes[:n], self._start_times[:n]
+        if self._base:
+            ids = np.concatenate([self.snapshot.ids, ids]) if n else np.asarray(self.snapshot.ids)
+            codes = np.concatenate([self.snapshot.agent_codes, codes])
+            times = np.concatenate([self.snapshot.start_times, times])
+        vectors = self.vectors
+        live = self.filter_mask()
+        if live is not None and not live.all():
+            ids, vectors, codes, times = ids[live], vectors[live], codes[live], times[live]
+        return ids, vectors, codes, times, sorted(self._agents, key=self._agents.get)
+
+    async def refresh(self, session: AsyncSession) -> Tuple[int, np.ndarray]:
+        """
+        Pull rows inserted since the last refresh. The first call loads the
+        whole table.
+
+        The cursor is a transaction id horizon, not a timestamp: rows written
+        by transactions still open at the last refresh are read again however
+        long those transactions ran (a backfill chunk can hold one open for
+        minutes). Rows already in the store are skipped by `add`.
+        """
+        # taken before the read, so everything below it is visible to the read
+        horizon = (await session.execute(XMIN_HORIZON)).scalar_one()
+        stmt = (
+            select(CallInsight.call_id, CallInsight.embedding, Call.agent_id, Call.start_time)
+            .join(Call, INSIGHT_JOIN)
+            .order_by(CallInsight.created_xid)
+            .execution_options(yield_per=LOAD_BATCH_ROWS)
+        )
+        if self.cursor is not None:
+            stmt = stmt.where(CallInsight.created_xid >= self.cursor)
+
+        start, blocks = len(self), []
+        result = await session.stream(stmt)
+        async for rows in result.partitions():
+            _, block = self.add(rows)
+            if len(block):
+                blocks.append(block)
+
+        self.cursor = horizon
+        partitions = await list_partitions(await session.connection(), "calls_db")
+        self.set_min_start(partitions[0].start if partitions else None)
+        self.refreshed_at = time.time()
+        if self.loaded_at is None:
+            self.loaded_at = self.refreshed_at
+        new = np.vstack(blocks) if blocks else np.empty((0, self.dim or 0), dtype=np.float32)
+        return start, new
+
+    def stats(self) -> dict:
+        now = time.time()
+        mapped = self.snapshot
+        return {
+            "rows": len(self),
+            "dim": self.dim,
+            "bytes": len(self) * (self.dim or 0) * 4,
+            "allocated_bytes": int(self._vectors.nbytes + self._agent_codes.nbytes + self._start_times.nbytes),
+            "snapshot_generation": self.generation,
+            "snapshot_rows": self._base,
+            "mapped_bytes": int(sum(getattr(mapped, name).nbytes for name in ARRAYS)) if mapped else 0,
+            "cursor": self.cursor,
+            "staleness_seconds": None if self.refreshed_at is None else now - self.refreshed_at,
+        }
+
+
+def normalise(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32, copy=False)
+
+
+def _epoch(ts: datetime) -> int:
+    return int(np.datetime64(ts, "s").astype(np.int64))
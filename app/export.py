@@ -0,0 +1,240 @@
+import json
+import os
+from datetime import datetime
+from typing import AsyncIterator, Callable, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import LargeBinary, select, type_coerce
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import INSIGHT_JOIN, Call, CallInsight
+from utils.features import FEATURE_COLUMNS
+
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "5000"))
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+EXPORT_COLUMNS = {
+    "call_id": Call.call_id,
+    "agent_id": Call.agent_id,
+    "customer_id": Call.customer_id,
+    "language": Call.language,
+    "start_time": Call.start_time,
+    "duration_seconds": Call.duration_seconds,
+    "customer_sentiment": CallInsight.customer_sentiment,
+    "agent_talk_ratio": CallInsight.agent_talk_ratio,
+    **{name: getattr(CallInsight, name) for name in FEATURE_COLUMNS},
+    "transcript": Call.transcript,
+    # raw little-endian float32 bytes; decoded per batch, never per row
+    "embedding": type_coerce(CallInsight.embedding, LargeBinary),
+}
+OPTIONAL_COLUMNS = ("transcript", "embedding")
+
+
+def export_statement(filters: list, extras: Iterable[str] = ()):
+    # Unordered: sorting the partitioned join would have to finish before the
+    # first row could be streamed
+    names = [n for n in EXPORT_COLUMNS if n not in OPTIONAL_COLUMNS or n in extras]
+    return (
+        select(*(EXPORT_COLUMNS[n].label(n) for n in names))
+        .join(CallInsight, INSIGHT_JOIN)
+        .where(*filters)
+    )
+
+
+async def stream_batches(session: AsyncSession, stmt, batch_rows: int = EXPORT_BATCH_ROWS) -> AsyncIterator[List[tuple]]:
+    """
+    Rows of `stmt` in lists of up to `batch_rows`, read through a server-side
+    cursor so only one batch is ever held in memory.
+    """
+    result = await session.stream(stmt.execution_options(yield_per=batch_rows))
+    async for part in result.partitions(batch_rows):
+        yield part
+
+
+def _embedding_width(raw: List[bytes]) -> Optional[int]:
+    """Width of the batch's non-empty embeddings; None if they're all empty."""
+    sizes = {len(r) for r in raw if r}
+    if len(sizes) > 1:
+        raise ValueError(f"Embeddings of mixed widths in one export: {sorted(s // 4 for s in sizes)}")
+    return sizes.pop() // 4 if sizes else None
+
+
+def _embeddings(raw: List[bytes], dim: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (rows, dim) float32 matrix over one batch of packed embeddings, and which
+    rows have one. Transcripts without sentences store an empty embedding;
+    their rows are zeros here and exported as null.
+    """
+    width = _embedding_width(raw)
+    if dim is None:
+        dim = width or 0
+    elif width not in (None, dim):
+        raise ValueError(f"Embeddings of mixed widths in one export: {sorted({dim, width})}")
+    present = np.fromiter((len(r) > 0 for r in raw), dtype=bool, count=len(raw))
+    matrix = np.zeros((len(raw), dim), dtype="<f4")
+    if present.any():
+        matrix[present] = np.frombuffer(b"".join(r for r in raw if r), dtype="<f4").reshape(-1, dim)
+    return matrix, present
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serialisable")
+
+
+def ndjson_chunk(names: List[str], rows: List[tuple]) -> bytes:
+    columns = list(zip(*rows))
+    if "embedding" in names:
+        i = names.index("embedding")
+        matrix, present = _embeddings(columns[i])
+        columns[i] = [v if ok else None for v, ok in zip(matrix.tolist(), present)]
+    return "".join(
+        json.dumps(dict(zip(names, values)), default=_json_default) + "\n"
+        for values in zip(*columns)
+    ).encode()
+
+
+class _Drain:
+    """Write-only file object the Arrow writers flush into; `take` empties it."""
+
+    closed = False
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+        self._pos = 0
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self) -> bytes:
+        data, self._parts = b"".join(self._parts), []
+        return data
+
+
+def _arrow_types():
+    import pyarrow as pa
+
+    return {
+        "call_id": pa.string(),
+        "agent_id": pa.string(),
+        "customer_id": pa.string(),
+        "language": pa.string(),
+        "start_time": pa.timestamp("us"),
+        "duration_seconds": pa.int32(),
+        "customer_sentiment": pa.float64(),
+        "agent_talk_ratio": pa.float64(),
+        "agent_words": pa.int32(),
+        "customer_words": pa.int32(),
+        "agent_turns": pa.int32(),
+        "customer_turns": pa.int32(),
+        "agent_filler_rate": pa.float64(),
+        "customer_filler_rate": pa.float64(),
+        "first_response_seconds": pa.float64(),
+        "avg_response_gap_seconds": pa.float64(),
+        "transcript": pa.string(),
+        # fixed_size_list<float32>[dim] once the width is known
+        "embedding": pa.list_(pa.float32()),
+    }
+
+
+def record_batch(names: List[str], rows: List[tuple], dim: Optional[int] = None):
+    import pyarrow as pa
+
+    types = _arrow_types()
+    arrays = []
+    for name, values in zip(names, zip(*rows)):
+        if name == "embedding":
+            matrix, present = _embeddings(values, dim)
+            arrays.append(pa.FixedSizeListArray.from_arrays(
+                pa.array(matrix.reshape(-1)), matrix.shape[1], mask=pa.array(~present)
+            ))
+        else:
+            arrays.append(pa.array(values, type=types[name]))
+    return pa.record_batch(arrays, names=names)
+
+
+async def encode(fmt: str, names: List[str], batches: AsyncIterator[List[tuple]]) -> AsyncIterator[bytes]:
+    """
+    Encode row batches as `fmt`: NDJSON lines, or one Arrow IPC stream /
+    Parquet file whose record batches (row groups) are emitted as soon as each
+    is written. The Arrow schema, including the embedding width, comes from
+    the first batch with a non-empty embedding; batches before it are held
+    back until then.
+    """
+    if fmt == "ndjson":
+        async for rows in batches:
+            yield ndjson_chunk(names, rows)
+        return
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink, writer = _Drain(), None
+
+    def open_writer(schema):
+        # one place for the writer options, so empty exports match full ones
+        if fmt == "arrow":
+            return pa.ipc.new_stream(sink, schema)
+        return pq.ParquetWriter(sink, schema, compression="zstd")
+
+    embedding = names.index("embedding") if "embedding" in names else None
+    held, dim = [], None
+    async for rows in batches:
+        if embedding is not None and dim is None:
+            dim = _embedding_width([r[embedding] for r in rows])
+            if dim is None:
+                held.append(rows)
+                continue
+        for part in held + [rows]:
+            batch = record_batch(names, part, dim)
+            if writer is None:
+                writer = open_writer(batch.schema)
+            writer.write_batch(batch)
+        held = []
+        yield sink.take()
+    for part in held:
+        # no row had an embedding: zero-width, all null
+        batch = record_batch(names, part, 0)
+        if writer is None:
+            writer = open_writer(batch.schema)
+        writer.write_batch(batch)
+    if writer is None:
+        # no rows: still a valid, empty stream/file with the column layout
+        types = _arrow_types()
+        writer = open_writer(pa.schema([(name, types[name]) for name in names]))
+    writer.close()
+    yield sink.take()
+
+
+async def export_chunks(
+    session_factory: Callable[[], AsyncSession],
+    fmt: str,
+    filters: list,
+    extras: Iterable[str] = (),
+    batch_rows: int = EXPORT_BATCH_ROWS,
+) -> AsyncIterator[bytes]:
+    """
+    The filtered calls/insights join encoded as `fmt`, chunk by chunk. Opens
+    its own session for the lifetime of the stream: a request-scoped one is
+    closed before a StreamingResponse body starts.
+    """
+    stmt = export_statement(filters, extras)
+    names = [c.name for c in stmt.selected_columns]
+    async with session_factory() as session:
+        async for chunk in encode(fmt, names, stream_batches(session, stmt, batch_rows)):
+            yield chunk
@@ -0,0 +1,266 @@
+import asyncio
+import os
+import socket
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import DateTime, delete, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.bulk import copy_insert
+from app.cache import invalidate
+from app.db import SessionLocal
+from app.models import Call, CallInsight, InsightOutbox
+from app.rollups import apply_rollups
+from app.vector_index import index_insights
+from utils.ai_utils import compute_insights_batch
+
+INSIGHT_BATCH_SIZE = int(os.getenv("INSIGHT_BATCH_SIZE", "64"))
+INSIGHT_BATCH_WINDOW_SECONDS = float(os.getenv("INSIGHT_BATCH_WINDOW_SECONDS", "0.25"))
+INSIGHT_WORKERS = int(os.getenv("INSIGHT_WORKERS", "1"))
+INSIGHT_MAX_ATTEMPTS = int(os.getenv("INSIGHT_MAX_ATTEMPTS", "5"))
+# how long an outbox row stays with the process that claimed it
+INSIGHT_CLAIM_SECONDS = float(os.getenv("INSIGHT_CLAIM_SECONDS", "600"))
+
+# insight_outbox timestamps are naive UTC
+UTC_NOW = func.timezone("UTC", func.clock_timestamp(), type_=DateTime)
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+@dataclass
+class PendingCall:
+    call_id: str
+    transcript: str
+    agent_id: str
+    start_time: datetime
+    enqueued_at: float  # epoch seconds, for end-to-end lag
+    attempts: int = 0
+    line_times: Optional[List[float]] = None  # per transcript line; not kept in the outbox
+
+
+class InsightWorker:
+    """
+    Computes insights for calls ingested through the API.
+
+    Calls are queued in memory and, durably, in insight_outbox. Each of
+    `workers` tasks takes up to `batch_size` calls, waiting at most `window`
+    seconds after the first one, so the encoder sees batches instead of
+    single transcripts. A batch is written with its outbox rows deleted in the
+    same transaction; on failure the batch is retried with backoff until
+    `max_attempts`. Outbox rows are claimed by the process that queued them;
+    `start` re-queues only rows nobody has claimed for `claim_seconds`, so
+    API processes booting together don't all pick up the same calls.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = INSIGHT_BATCH_SIZE,
+        window: float = INSIGHT_BATCH_WINDOW_SECONDS,
+        workers: int = INSIGHT_WORKERS,
+        max_attempts: int = INSIGHT_MAX_ATTEMPTS,
+        claim_seconds: float = INSIGHT_CLAIM_SECONDS,
+    ):
+        self.batch_size = batch_size
+        self.window = window
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.claim_seconds = claim_seconds
+        self.worker_id = WORKER_ID
+        self.queue: asyncio.Queue[PendingCall] = asyncio.Queue()
+        self._pending: OrderedDict[str, float] = OrderedDict()
+        self._tasks: List[asyncio.Task] = []
+        self.processed = self.failed = self.batches = 0
+        self.lag_total = self.lag_max = self.lag_last = 0.0
+
+    def enqueue(self, item: PendingCall):
+        self._pending.setdefault(item.call_id, item.enqueued_at)
+        self.queue.put_nowait(item)
+
+    def claim_query(self):
+        """
+        Claim the unclaimed (or lapsed) outbox rows for this process and
+        return their calls. Rows another transaction is claiming are skipped,
+        not waited on, so concurrent claims never overlap.
+        """
+        claimable = (
+            select(InsightOutbox.call_id)
+            .where(
+                InsightOutbox.attempts < self.max_attempts,
+                or_(
+                    InsightOutbox.claimed_at.is_(None),
+                    InsightOutbox.claimed_at < UTC_NOW - timedelta(seconds=self.claim_seconds),
+                ),
+            )
+            .with_for_update(skip_locked=True)
+        )
+        claimed = (
+            update(InsightOutbox)
+            .where(InsightOutbox.call_id.in_(claimable))
+            .values(claimed_by=self.worker_id, claimed_at=UTC_NOW)
+            .returning(InsightOutbox.call_id, InsightOutbox.enqueued_at, InsightOutbox.attempts)
+            .cte("claimed")
+        )
+        return (
+            select(
+                Call.call_id, Call.transcript, Call.agent_id, Call.start_time,
+                func.extract("epoch", UTC_NOW - claimed.c.enqueued_at), claimed.c.attempts,
+            )
+            .join(claimed, Call.call_id == claimed.c.call_id)
+            .order_by(claimed.c.enqueued_at)
+        )
+
+    async def recover(self, session: AsyncSession) -> int:
+        """Queue outbox rows nobody is working on; drop those whose insights already exist."""
+        await session.execute(
+            delete(InsightOutbox).where(
+                InsightOutbox.call_id.in_(select(CallInsight.call_id))
+            )
+        )
+        rows = (await session.execute(self.claim_query())).all()
+        await session.commit()
+        now = time.time()
+        for call_id, transcript, agent_id, start_time, age, attempts in rows:
+            # the age comes from the database clock, so app/db clock skew doesn't skew the lag
+            self.enqueue(PendingCall(call_id, transcript, agent_id, start_time, now - float(age), attempts))
+        return len(rows)
+
+    async def start(self):
+        async with SessionLocal() as session:
+            recovered = await self.recover(session)
+        if recovered:
+            print(f"[INFO] Re-queued {recovered} calls from insight_outbox")
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+
+    async def stop(self):
+        # Whatever is still queued stays in the outbox for the next start
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _next_batch(self) -> List[PendingCall]:
+        batch = [await self.queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.window
+        while len(batch) < self.batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self.process(batch)
+            except Exception as e:
+                await self._failed(batch, e)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    async def process(self, batch: List[PendingCall]):
+        insights = await asyncio.to_thread(
+            compute_insights_batch, [c.transcript for c in batch], [c.line_times for c in batch]
+        )
+        rows = [
+            {
+                "call_id": c.call_id,
+                "start_time": c.start_time,
+                "embedding": emb,
+                "customer_sentiment": sent,
+                **features,
+            }
+            for c, (emb, sent, features) in zip(batch, insights)
+        ]
+        ids = [c.call_id for c in batch]
+        async with SessionLocal() as session:
+            async with session.begin():
+                result = await copy_insert(session, CallInsight, rows, returning="call_id")
+                await apply_rollups(session, result.keys)
+                await session.execute(delete(InsightOutbox).where(InsightOutbox.call_id.in_(ids)))
+
+        index_insights(
+            (c.call_id, emb, c.agent_id, c.start_time)
+            for c, (emb, _, _) in zip(batch, insights)
+        )
+        if result.inserted:
+            await invalidate("insights")
+
+        now = time.time()
+        for c in batch:
+            lag = now - c.enqueued_at
+            self.lag_total += lag
+            self.lag_max = max(self.lag_max, lag)
+            self.lag_last = lag
+            self._pending.pop(c.call_id, None)
+        self.processed += len(batch)
+        self.batches += 1
+
+    async def _failed(self, batch: List[PendingCall], error: Exception):
+        print(f"[WARN] Insight batch of {len(batch)} starting at {batch[0].call_id} failed: {error!r}")
+        try:
+            async with SessionLocal() as session:
+                async with session.begin():
+                    await session.execute(
+                        update(InsightOutbox)
+                        .where(InsightOutbox.call_id.in_([c.call_id for c in batch]))
+                        .values(
+                            attempts=InsightOutbox.attempts + 1,
+                            last_error=repr(error)[:500],
+                            # renew the claim, the retry stays with this process
+                            claimed_by=self.worker_id,
+                            claimed_at=UTC_NOW,
+                        )
+                    )
+        except Exception as e:
+            print(f"[WARN] Recording insight failure in the outbox failed: {e!r}")
+
+        retry = []
+        for c in batch:
+            c.attempts += 1
+            if c.attempts < self.max_attempts:
+                retry.append(c)
+            else:
+                self.failed += 1
+                self._pending.pop(c.call_id, None)
+        if retry:
+            delay = min(60.0, 2.0 ** retry[0].attempts)
+            asyncio.get_running_loop().call_later(delay, self._requeue, retry)
+
+    def _requeue(self, items: List[PendingCall]):
+        for item in items:
+            self.queue.put_nowait(item)
+
+    def stats(self) -> dict:
+        oldest = next(iter(self._pending.values()), None)
+        return {
+            "running": bool(self._tasks),
+            "queue_depth": self.queue.qsize(),
+            "pending": len(self._pending),
+            "oldest_pending_seconds": time.time() - oldest if oldest is not None else 0.0,
+            "processed": self.processed,
+            "failed": self.failed,
+            "batches": self.batches,
+            "avg_batch_size": self.processed / self.batches if self.batches else 0.0,
+            "lag_seconds_last": self.lag_last,
+            "lag_seconds_avg": self.lag_total / self.processed if self.processed else 0.0,
+            "lag_seconds_max": self.lag_max,
+        }
+
+
+_worker: Optional[InsightWorker] = None
+
+
+def get_insight_worker() -> InsightWorker:
+    global _worker
+    if _worker is None:
+        _worker = InsightWorker()
+    return _worker
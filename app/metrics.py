@@ -0,0 +1,350 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+SERVER_TIMING = os.getenv("SERVER_TIMING", "false").lower() == "true"
+SLOW_QUERY_SECONDS = float(os.getenv("SLOW_QUERY_SECONDS", "0.5"))
+METRICS_MAX_STATEMENTS = int(os.getenv("METRICS_MAX_STATEMENTS", "500"))
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, str]) -> Labels:
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels, extra: Iterable[Tuple[str, str]] = ()) -> str:
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name, self.help = name, help
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = _labels(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = list(self._values.items())
+        lines += [f"{self.name}{_format_labels(k)} {_format_value(v)}" for k, v in values]
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram; one bisect and three additions per observation."""
+
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name, self.help = name, help
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Labels, list] = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str):
+        key = _labels(labels)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[i] += 1
+            series[-1] += value
+
+    def snapshot(self, **labels: str) -> Optional[dict]:
+        with self._lock:
+            series = self._series.get(_labels(labels))
+            if series is None:
+                return None
+            series = list(series)
+        return {"count": sum(series[:-1]), "sum": series[-1]}
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._series.items()]
+        for labels, series in items:
+            running = 0
+            for bound, count in zip((*self.buckets, float("inf")), series[:-1]):
+                running += count
+                lines.append(f"{self.name}_bucket{_format_labels(labels, [('le', _format_value(bound))])} {running}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {running}")
+        return lines
+
+
+class Registry:
+    """
+    Metrics rendered in the Prometheus text format. Gauges are callbacks
+    returning {labels: value}, evaluated at scrape time, so components don't
+    have to push their state anywhere; `counter_callback` does the same for
+    totals a component already keeps.
+    """
+
+    def __init__(self):
+        self._metrics: list = []
+        self._gauges: Dict[str, Tuple[str, str, Callable[[], Dict[Labels, float]]]] = {}
+
+    def counter(self, name: str, help: str) -> Counter:
+        metric = Counter(name, help)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, help: str, collect: Callable[[], Dict[Labels, float]]):
+        self._gauges[name] = (help, "gauge", collect)
+
+    def counter_callback(self, name: str, help: str, collect: Callable[[], Dict[Labels, float]]):
+        """A gauge-style callback for a value that only grows; `name` should end in _total."""
+        self._gauges[name] = (help, "counter", collect)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines += metric.render()
+        for name, (help, kind, collect) in self._gauges.items():
+            try:
+                values = collect()
+            except Exception as e:
+                print(f"[WARN] Collecting gauge {name} failed: {e!r}")
+                continue
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+            lines += [
+                f"{name}{_format_labels(labels)} {_format_value(value)}"
+                for labels, value in values.items()
+                if value is not None
+            ]
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+REQUEST_SECONDS = REGISTRY.histogram("http_request_duration_seconds", "HTTP request latency by route.")
+DB_QUERY_SECONDS = REGISTRY.histogram("db_query_duration_seconds", "SQL statement latency by engine and statement type.")
+SLOW_QUERIES = REGISTRY.counter("db_slow_queries_total", "Statements slower than SLOW_QUERY_SECONDS.")
+SPAN_SECONDS = REGISTRY.histogram(
+    "span_duration_seconds", "Time spent in instrumented sections (model inference, LLM calls, search, serialisation).",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+
+# Per-request accumulator for Server-Timing: {name: [seconds, count]}
+_timings: ContextVar[Optional[dict]] = ContextVar("request_timings", default=None)
+
+
+def _record(name: str, seconds: float):
+    timings = _timings.get()
+    if timings is not None:
+        entry = timings.setdefault(name, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+
+
+@contextmanager
+def span(name: str):
+    """
+    Time a block into span_duration_seconds{span=name} and the current
+    request's Server-Timing. Works across `asyncio.to_thread`, which copies
+    the request context.
+    """
+    if not METRICS_ENABLED:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        SPAN_SECONDS.observe(elapsed, span=name)
+        _record(name, elapsed)
+
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\$\d+|%\(\w+\)s|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"\((?:\s*\?\s*,)+\s*\?\s*\)")
+_SPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(statement: str) -> Tuple[str, str, str]:
+    """
+    (id, statement type, normalised SQL) with literals and bind parameters
+    replaced by `?`, so executions of the same query share one fingerprint.
+    Cached: SQLAlchemy hands back the same compiled strings over and over.
+    """
+    normalised = _SPACE.sub(" ", _LITERALS.sub("?", statement)).strip()
+    normalised = _IN_LISTS.sub("(?...)", normalised)
+    verb = normalised.split(" ", 1)[0].upper() if normalised else "OTHER"
+    if verb == "WITH":
+        verb = "SELECT" if " SELECT " in normalised.upper() else verb
+    return hashlib.sha1(normalised.encode()).hexdigest()[:12], verb, normalised
+
+
+class StatementStats:
+    """Call count and time per fingerprint, for the heaviest `max_statements` recent statements."""
+
+    def __init__(self, max_statements: int = METRICS_MAX_STATEMENTS):
+        self.max_statements = max_statements
+        self._stats: OrderedDict[str, list] = OrderedDict()  # id -> [calls, seconds, max, sql]
+        self._lock = threading.Lock()
+
+    def add(self, fp: str, sql: str, seconds: float):
+        with self._lock:
+            entry = self._stats.get(fp)
+            if entry is None:
+                entry = self._stats[fp] = [0, 0.0, 0.0, sql]
+                if len(self._stats) > self.max_statements:
+                    self._stats.popitem(last=False)
+            else:
+                self._stats.move_to_end(fp)
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+    def top(self, limit: int = 20) -> list[dict]:
+        with self._lock:
+            items = [(fp, list(e)) for fp, e in self._stats.items()]
+        items.sort(key=lambda item: -item[1][1])
+        return [
+            {"fingerprint": fp, "calls": calls, "seconds_total": total, "seconds_max": worst,
+             "seconds_avg": total / calls, "sql": sql}
+            for fp, (calls, total, worst, sql) in items[:limit]
+        ]
+
+
+STATEMENTS = StatementStats()
+
+
+def instrument_engine(engine, name: str):
+    """Time every statement `engine` runs; statements over SLOW_QUERY_SECONDS are logged."""
+    if not METRICS_ENABLED:
+        return
+    from sqlalchemy import event
+
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get("query_started")
+        if not started:
+            return
+        elapsed = time.perf_counter() - started.pop()
+        fp, verb, sql = fingerprint(statement)
+        DB_QUERY_SECONDS.observe(elapsed, engine=name, statement=verb)
+        STATEMENTS.add(fp, sql, elapsed)
+        _record("db", elapsed)
+        if elapsed >= SLOW_QUERY_SECONDS:
+            SLOW_QUERIES.inc(engine=name, statement=verb)
+            print(f"[WARN] Slow query ({elapsed * 1000:.0f} ms, {name}, {fp}): {sql[:500]}")
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(context):
+        # a failed statement never reaches after_cursor_execute
+        started = context.connection.info.get("query_started") if context.connection is not None else None
+        if started:
+            started.pop()
+
+
+def _route_label(scope: dict) -> str:
+    route = scope.get("route")
+    if route is not None:
+        return getattr(route, "path", "unmatched")
+    app = scope.get("app")
+    if app is not None:
+        from starlette.routing import Match
+
+        for candidate in getattr(app, "routes", ()):
+            match, _ = candidate.matches(scope)
+            if match == Match.FULL:
+                return getattr(candidate, "path", "unmatched")
+    # unknown paths share one label rather than one series each
+    return "unmatched"
+
+
+def _server_timing(timings: dict, total: float) -> bytes:
+    parts = [
+        f'{name};dur={seconds * 1000:.1f};desc="{count}x"'
+        for name, (seconds, count) in timings.items()
+    ]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts).encode()
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing each HTTP request into
+    http_request_duration_seconds{method, route, status}, labelled by route
+    template (not raw path). With `server_timing`, responses carry a
+    Server-Timing header breaking the time down into DB, model and search
+    spans; for streamed responses it covers the time to the first byte.
+    """
+
+    def __init__(self, app, server_timing: bool = SERVER_TIMING):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        timings: dict = {}
+        token = _timings.set(timings)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", _server_timing(timings, time.perf_counter() - started)))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _timings.reset(token)
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                method=scope["method"], route=_route_label(scope), status=str(status),
+            )
+
+
+def render() -> str:
+    return REGISTRY.render()
@@ -1,24 +1,92 @@
-from sqlalchemy.orm import declarative_base
-from sqlalchemy import Column, String, DateTime, Integer, Float, ForeignKey
-from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import declarative_base, deferred
+from sqlalchemy import BigInteger, Column, Computed, Date, String, DateTime, Integer, Float, ForeignKeyConstraint, and_, func, text
+from sqlalchemy.dialects.postgresql import ARRAY, TSVECTOR
+
+from app.types import PackedVector
 
 Base = declarative_base()
 
 class Call(Base):
+    """Partitioned by month of start_time (app.partitions creates the partitions)."""
     __tablename__ = "calls_db"
+    __table_args__ = {"postgresql_partition_by": "RANGE (start_time)"}
 
-    call_id = Column(String, primary_key=True, index=True)
+    call_id = Column(String, primary_key=True)
     agent_id = Column(String, nullable=False)
     customer_id = Column(String, nullable=False)
     language = Column(String, default="en")
-    start_time = Column(DateTime, nullable=False)
+    start_time = Column(DateTime, primary_key=True)
     duration_seconds = Column(Integer)
     transcript = Column(String, nullable=False)
+    transcript_tsv = deferred(Column(TSVECTOR, Computed("to_tsvector('english', transcript)", persisted=True)))
     
 class CallInsight(Base):
+    """Co-partitioned with calls_db: start_time is the call's."""
     __tablename__ = "call_insights"
+    __table_args__ = (
+        ForeignKeyConstraint(
+            ["call_id", "start_time"], ["calls_db.call_id", "calls_db.start_time"],
+            name="fk_call_insights_call",
+        ),
+        {"postgresql_partition_by": "RANGE (start_time)"},
+    )
 
-    call_id           = Column(String, ForeignKey("calls_db.call_id"), primary_key=True)
-    embedding         = Column(ARRAY(Float), nullable=False)
+    call_id           = Column(String, primary_key=True)
+    start_time        = Column(DateTime, primary_key=True)
+    embedding         = Column(PackedVector(), nullable=False)
     customer_sentiment= Column(Float, nullable=False)
     agent_talk_ratio  = Column(Float, nullable=False)
+    # conversation features (utils.features); NULL until computed, and the
+    # timings also when message times weren't known
+    agent_words       = Column(Integer)
+    customer_words    = Column(Integer)
+    agent_turns       = Column(Integer)
+    customer_turns    = Column(Integer)
+    agent_filler_rate = Column(Float)
+    customer_filler_rate = Column(Float)
+    first_response_seconds = Column(Float)
+    avg_response_gap_seconds = Column(Float)
+    created_at        = Column(DateTime, nullable=False, server_default=func.now(), index=True)
+    # id of the inserting transaction; EmbeddingStore.refresh's cursor, since
+    # unlike created_at it can be compared against what has committed
+    created_xid       = Column(BigInteger, server_default=text("pg_current_xact_id()::text::bigint"), index=True)
+
+
+# Joins on the whole key, so each calls_db partition meets only its own
+# call_insights partition and date filters prune both sides
+INSIGHT_JOIN = and_(Call.call_id == CallInsight.call_id, Call.start_time == CallInsight.start_time)
+
+
+class CoachingNudge(Base):
+    __tablename__ = "coaching_nudges"
+
+    call_id           = Column(String, primary_key=True)
+    transcript_hash   = Column(String(40), nullable=False)
+    nudges            = Column(ARRAY(String), nullable=False)
+    created_at        = Column(DateTime, nullable=False, server_default=func.now())
+
+
+class AgentDailyStats(Base):
+    """Per-agent, per-day sums over calls with insights; averages are sum / call_count."""
+    __tablename__ = "agent_daily_stats"
+
+    agent_id          = Column(String, primary_key=True)
+    day               = Column(Date, primary_key=True, index=True)
+    call_count        = Column(Integer, nullable=False, default=0)
+    sentiment_sum     = Column(Float, nullable=False, default=0.0)
+    talk_ratio_sum    = Column(Float, nullable=False, default=0.0)
+    duration_sum      = Column(BigInteger, nullable=False, default=0)
+
+
+class InsightOutbox(Base):
+    """Calls ingested online whose insights are still to be computed."""
+    __tablename__ = "insight_outbox"
+
+    call_id           = Column(String, primary_key=True)
+    # naive UTC, whatever the session TimeZone is
+    enqueued_at       = Column(DateTime, nullable=False, server_default=func.timezone("UTC", func.now()))
+    attempts          = Column(Integer, nullable=False, server_default="0")
+    last_error        = Column(String)
+    # the API process working on the row; recovery takes rows whose claim lapsed
+    claimed_by        = Column(String)
+    claimed_at        = Column(DateTime)
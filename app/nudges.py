@@ -0,0 +1,184 @@
+import asyncio
+import hashlib
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import httpx
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache import invalidate
+from app.db import SessionLocal
+from app.metrics import span
+from app.models import CoachingNudge
+from utils.ai_utils import NUDGE_MODEL, build_nudge_messages, parse_nudges
+
+NUDGE_BASE_URL = os.getenv("GROQ_BASE_URL", "https://api.groq.com/openai/v1")
+NUDGE_TIMEOUT_SECONDS = float(os.getenv("NUDGE_TIMEOUT_SECONDS", "20"))
+NUDGE_WAIT_SECONDS = float(os.getenv("NUDGE_WAIT_SECONDS", "1.5"))
+NUDGE_CONCURRENCY = int(os.getenv("NUDGE_CONCURRENCY", "8"))
+# Recommendation.nudge's limit; the prompt asks for 40 words, models don't always listen
+NUDGE_MAX_CHARS = 400
+
+
+def clip_nudge(nudge: str, limit: int = NUDGE_MAX_CHARS) -> str:
+    if len(nudge) <= limit:
+        return nudge
+    cut = nudge[:limit - 1]
+    return (cut.rsplit(" ", 1)[0] if " " in cut else cut) + "…"
+
+
+def transcript_hash(transcript: str) -> str:
+    return hashlib.sha1(transcript.encode("utf-8")).hexdigest()
+
+
+class NudgeService:
+    """
+    Async coaching-nudge generation against an OpenAI-compatible chat API
+    (Groq by default, or any local fake via `base_url`/`transport`).
+
+    Results are persisted in coaching_nudges keyed by call_id and transcript
+    hash. Concurrent requests for the same call share one LLM round trip, and
+    at most `concurrency` requests are in flight at once.
+    """
+
+    def __init__(
+        self,
+        base_url: str = NUDGE_BASE_URL,
+        api_key: Optional[str] = None,
+        timeout: float = NUDGE_TIMEOUT_SECONDS,
+        concurrency: int = NUDGE_CONCURRENCY,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        api_key = api_key if api_key is not None else os.getenv("GROQ_API_KEY", "")
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            headers={"Authorization": f"Bearer {api_key}"},
+            timeout=httpx.Timeout(timeout, connect=min(timeout, 5.0)),
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+            transport=transport,
+        )
+        self._slots = asyncio.Semaphore(concurrency)
+        self._inflight: dict[str, asyncio.Task] = {}
+
+    async def generate(self, transcript: str) -> List[str]:
+        async with self._slots:
+            with span("nudges"):
+                resp = await self._client.post("/chat/completions", json={
+                    "model": NUDGE_MODEL,
+                    "messages": build_nudge_messages(transcript),
+                    "temperature": 0.3,
+                })
+        resp.raise_for_status()
+        return [clip_nudge(n) for n in parse_nudges(resp.json()["choices"][0]["message"]["content"])]
+
+    async def cached(self, session: AsyncSession, call_id: str, digest: str) -> Optional[List[str]]:
+        row = await session.get(CoachingNudge, call_id)
+        if row is not None and row.transcript_hash == digest:
+            return [clip_nudge(n) for n in row.nudges]
+        return None
+
+    async def _generate_and_store(self, call_id: str, transcript: str, digest: str) -> List[str]:
+        nudges = await self.generate(transcript)
+        stmt = insert(CoachingNudge).values(call_id=call_id, transcript_hash=digest, nudges=nudges)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[CoachingNudge.call_id],
+            set_={"transcript_hash": digest, "nudges": nudges, "created_at": func.now()},
+        )
+        async with SessionLocal() as session:
+            await session.execute(stmt)
+            await session.commit()
+        # cached recommendations for this call were served without these
+        await invalidate(f"call:{call_id}")
+        return nudges
+
+    def _task(self, call_id: str, transcript: str) -> asyncio.Task:
+        digest = transcript_hash(transcript)
+        key = f"{call_id}:{digest}"
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._generate_and_store(call_id, transcript, digest))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finished(key, t))
+        return task
+
+    def _finished(self, key: str, task: asyncio.Task):
+        self._inflight.pop(key, None)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"[WARN] Nudge generation for {key.split(':')[0]} failed: {task.exception()!r}")
+
+    async def get_nudges(
+        self,
+        session: AsyncSession,
+        call_id: str,
+        transcript: str,
+        wait: float = NUDGE_WAIT_SECONDS,
+    ) -> List[str]:
+        """
+        Cached nudges for the call, or wait up to `wait` seconds for fresh ones.
+        Generation keeps running in the background past the deadline and is
+        persisted for the next request, so the caller never blocks on the LLM.
+        """
+        cached = await self.cached(session, call_id, transcript_hash(transcript))
+        if cached is not None:
+            return cached
+        try:
+            return await asyncio.wait_for(asyncio.shield(self._task(call_id, transcript)), wait)
+        except (asyncio.TimeoutError, httpx.HTTPError, KeyError, ValueError):
+            return []
+
+    async def get_nudges_many(
+        self,
+        session: AsyncSession,
+        items: Dict[str, str],
+        wait: float = NUDGE_WAIT_SECONDS,
+    ) -> Dict[str, List[str]]:
+        """
+        `get_nudges` for many {call_id: transcript} at once: cached rows come
+        from one query, and the rest are generated concurrently under a single
+        shared deadline.
+        """
+        digests = {call_id: transcript_hash(t) for call_id, t in items.items()}
+        rows = await session.execute(
+            select(CoachingNudge.call_id, CoachingNudge.transcript_hash, CoachingNudge.nudges)
+            .where(CoachingNudge.call_id.in_(list(items)))
+        )
+        found = {cid: [clip_nudge(n) for n in nudges] for cid, digest, nudges in rows if digests[cid] == digest}
+        missing = [cid for cid in items if cid not in found]
+        if missing:
+            # asyncio.wait leaves stragglers running, so they still get stored
+            tasks = {cid: self._task(cid, items[cid]) for cid in missing}
+            done, _ = await asyncio.wait(set(tasks.values()), timeout=wait)
+            for cid, task in tasks.items():
+                ok = task in done and not task.cancelled() and task.exception() is None
+                found[cid] = task.result() if ok else []
+        return found
+
+    async def precompute(self, items: Iterable[Tuple[str, str]]) -> int:
+        """Generate and persist nudges for (call_id, transcript) pairs; returns how many succeeded."""
+        results = await asyncio.gather(
+            *(self._task(call_id, transcript) for call_id, transcript in items),
+            return_exceptions=True,
+        )
+        return sum(not isinstance(r, BaseException) for r in results)
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+_service: Optional[NudgeService] = None
+
+
+def get_nudge_service() -> NudgeService:
+    global _service
+    if _service is None:
+        _service = NudgeService()
+    return _service
+
+
+async def close_nudge_service():
+    global _service
+    if _service is not None:
+        await _service.aclose()
+        _service = None
@@ -0,0 +1,188 @@
+import os
+import re
+import zlib
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+# months kept by retention, the current one included; writes older than that
+# are refused rather than recreating a removed partition. 0 keeps everything
+PARTITION_RETENTION_MONTHS = int(os.getenv("PARTITION_RETENTION_MONTHS", "0"))
+# calls_db first: call_insights partitions reference its rows
+PARTITIONED_TABLES = ("calls_db", "call_insights")
+_LOCK_KEY = zlib.crc32(b"partition maintenance")
+_BOUNDS = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+# months this process has already seen partitioned, so writers skip the catalog
+_known: set[date] = set()
+
+
+@dataclass(frozen=True)
+class Partition:
+    table: str
+    name: str
+    start: date  # inclusive
+    end: date  # exclusive
+
+
+def month_start(value: date | datetime) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, n: int) -> date:
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+def create_partition_sql(table: str, month: date) -> str:
+    return (
+        f'CREATE TABLE IF NOT EXISTS "{partition_name(table, month)}" PARTITION OF "{table}" '
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    )
+
+
+def parse_bounds(expr: str) -> Optional[tuple[date, date]]:
+    """(start, end) of a `FOR VALUES FROM (...) TO (...)` bound; None for DEFAULT."""
+    m = _BOUNDS.search(expr)
+    if m is None:
+        return None
+    return datetime.fromisoformat(m.group(1)).date(), datetime.fromisoformat(m.group(2)).date()
+
+
+def retention_floor(keep_months: int = PARTITION_RETENTION_MONTHS, today: Optional[date] = None) -> Optional[date]:
+    """First month inside the retention window; None when every month is kept."""
+    if keep_months < 1:
+        return None
+    return add_months(month_start(today or date.today()), 1 - keep_months)
+
+
+def expired(partitions: Iterable[Partition], keep_months: int, today: date) -> list[Partition]:
+    """Partitions that end before the first of the `keep_months` most recent months (this one included)."""
+    cutoff = add_months(month_start(today), 1 - keep_months)
+    return sorted((p for p in partitions if p.end <= cutoff), key=lambda p: p.start)
+
+
+async def list_partitions(conn: AsyncConnection, table: str) -> list[Partition]:
+    rows = await conn.execute(text(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+        "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = CAST(:table AS regclass)"
+    ), {"table": table})
+    partitions = []
+    for name, bound in rows:
+        bounds = parse_bounds(bound)
+        if bounds is not None:
+            partitions.append(Partition(table, name, *bounds))
+    return sorted(partitions, key=lambda p: p.start)
+
+
+async def _create_missing(conn: AsyncConnection, months: Iterable[date]) -> list[str]:
+    # serialise with other writers and maintenance; released at commit
+    await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _LOCK_KEY})
+    created = []
+    for table in PARTITIONED_TABLES:
+        existing = {p.start for p in await list_partitions(conn, table)}
+        for month in sorted(set(months) - existing):
+            await conn.execute(text(create_partition_sql(table, month)))
+            created.append(partition_name(table, month))
+    return created
+
+
+async def ensure_partitions(values: Iterable[date | datetime], engine: Optional[AsyncEngine] = None) -> list[str]:
+    """
+    Make sure calls_db and call_insights have partitions for the months of
+    `values` (e.g. the start_times of a batch about to be inserted). Runs in
+    its own short transaction, so the writer's transaction never holds the
+    parent table locks that creating a partition takes. Raises ValueError for
+    months before PARTITION_RETENTION_MONTHS, whose partitions retention has
+    removed.
+    """
+    months = {month_start(v) for v in values} - _known
+    if not months:
+        return []
+    floor = retention_floor()
+    late = sorted(m for m in months if floor is not None and m < floor)
+    if late:
+        raise ValueError(
+            f"start_time in {', '.join(f'{m:%Y-%m}' for m in late)} is older than the "
+            f"{PARTITION_RETENTION_MONTHS}-month retention window"
+        )
+    if engine is None:
+        from app.db import engine
+    async with engine.begin() as conn:
+        created = await _create_missing(conn, months)
+    _known.update(months)
+    if created:
+        print(f"[INFO] Created partitions {', '.join(created)}")
+    return created
+
+
+async def ensure_future_partitions(
+    months_ahead: int = PARTITION_MONTHS_AHEAD, today: Optional[date] = None, engine: Optional[AsyncEngine] = None
+) -> list[str]:
+    """Partitions for this month and the next `months_ahead`."""
+    first = month_start(today or date.today())
+    return await ensure_partitions((add_months(first, i) for i in range(months_ahead + 1)), engine)
+
+
+async def apply_retention(
+    keep_months: int,
+    drop: bool = False,
+    dry_run: bool = False,
+    today: Optional[date] = None,
+    engine: Optional[AsyncEngine] = None,
+) -> list[Partition]:
+    """
+    Detach (or drop) the calls_db/call_insights partitions of months older
+    than the `keep_months` most recent ones. Detached partitions are renamed
+    `<name>_detached` and keep their rows, to be archived and dropped by
+    hand. Nudges and outbox entries of those calls are deleted, unless a
+    call in a kept month has the same call_id: those tables are keyed by
+    call_id alone. agent_daily_stats keeps its rows for the expired months.
+    """
+    if keep_months < 1:
+        raise ValueError("keep_months must be at least 1")
+    if engine is None:
+        from app.db import engine
+    async with engine.begin() as conn:
+        await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _LOCK_KEY})
+        calls = expired(await list_partitions(conn, "calls_db"), keep_months, today or date.today())
+        insights = {p.start: p for p in await list_partitions(conn, "call_insights")}
+        if dry_run:
+            return [p for c in calls for p in (insights.get(c.start), c) if p is not None]
+
+        done = []
+        for part in calls:
+            for aux in ("coaching_nudges", "insight_outbox"):
+                await conn.execute(text(
+                    f'DELETE FROM "{aux}" a WHERE a.call_id IN (SELECT call_id FROM "{part.name}") '
+                    "AND NOT EXISTS (SELECT 1 FROM calls_db c WHERE c.call_id = a.call_id "
+                    "AND (c.start_time < :start OR c.start_time >= :end))"
+                ), {"start": part.start, "end": part.end})
+            # the referencing side goes first, and its foreign key with it, so
+            # detaching the calls partition finds nothing pointing at it
+            ins = insights.get(part.start)
+            for p in ([ins] if ins else []) + [part]:
+                await conn.execute(text(f'ALTER TABLE "{p.table}" DETACH PARTITION "{p.name}"'))
+                if p.table == "call_insights":
+                    fks = await conn.execute(text(
+                        "SELECT conname FROM pg_constraint "
+                        "WHERE conrelid = CAST(:name AS regclass) AND contype = 'f'"
+                    ), {"name": p.name})
+                    for (fk,) in fks.all():
+                        await conn.execute(text(f'ALTER TABLE "{p.name}" DROP CONSTRAINT "{fk}"'))
+                if drop:
+                    await conn.execute(text(f'DROP TABLE "{p.name}"'))
+                else:
+                    await conn.execute(text(f'ALTER TABLE "{p.name}" RENAME TO "{p.name}_detached"'))
+                done.append(p)
+    _known.difference_update(p.start for p in done)
+    return done
@@ -0,0 +1,274 @@
+import fcntl
+import json
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+import zlib
+from contextlib import closing, contextmanager
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+RAW_ARCHIVE_DIR = os.getenv("RAW_ARCHIVE_DIR", "data/raw/archive")
+RAW_SEGMENT_BYTES = int(os.getenv("RAW_SEGMENT_BYTES", str(256 << 20)))
+RAW_ARCHIVE_FSYNC = os.getenv("RAW_ARCHIVE_FSYNC", "false").lower() == "true"
+
+# call_id length, compressed payload length; then call_id bytes and payload
+HEADER = struct.Struct("<HI")
+
+
+def encode_record(call_id: str, convo: list[dict]) -> bytes:
+    key = call_id.encode("utf-8")
+    payload = zlib.compress(json.dumps(convo, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+    return HEADER.pack(len(key), len(payload)) + key + payload
+
+
+def iter_records(buf, start: int = 0) -> Iterator[tuple[int, int, str, bytes]]:
+    """(offset, length, call_id, compressed payload) for each complete record in `buf` from `start`."""
+    size, at = len(buf), start
+    while at + HEADER.size <= size:
+        key_len, payload_len = HEADER.unpack_from(buf, at)
+        end = at + HEADER.size + key_len + payload_len
+        if end > size:
+            break  # torn write at the tail
+        key_end = at + HEADER.size + key_len
+        yield at, end - at, buf[at + HEADER.size:key_end].decode("utf-8"), buf[key_end:end]
+        at = end
+
+
+def decode_payload(payload) -> list[dict]:
+    return json.loads(zlib.decompress(payload))
+
+
+class RawArchive:
+    """
+    Append-only store for raw conversations.
+
+    Records (call_id + zlib-compressed compact JSON) are appended to numbered
+    segment files that are sealed once they reach `segment_bytes`, so old
+    segments never change and back up incrementally. An SQLite index maps
+    call_id -> (segment, offset, length): a read is one index lookup and one
+    slice of the memory-mapped segment. Segments are self-describing, so the
+    index can always be rebuilt from them, and records appended but not yet
+    indexed when a writer died are picked up on the next open.
+
+    Safe to share between threads; appends from several processes are
+    serialised with a file lock.
+    """
+
+    def __init__(self, root: str | Path = RAW_ARCHIVE_DIR, segment_bytes: int = RAW_SEGMENT_BYTES):
+        self.root = Path(root)
+        self.segment_bytes = segment_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()  # the index connection and the maps
+        self._write_lock = threading.Lock()
+        self._maps: dict[int, mmap.mmap] = {}
+        self._lock_file = open(self.root / ".lock", "a+b")
+
+        self._db = sqlite3.connect(self.root / "index.sqlite", check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("PRAGMA busy_timeout=30000")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS raw_index ("
+            " call_id TEXT PRIMARY KEY, segment INTEGER NOT NULL,"
+            " offset INTEGER NOT NULL, length INTEGER NOT NULL) WITHOUT ROWID"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS ix_raw_index_segment ON raw_index (segment, offset)")
+        with self._writer():
+            self._recover_tail()
+
+    def segment_path(self, segment: int) -> Path:
+        return self.root / f"seg-{segment:06d}.bin"
+
+    def segments(self) -> list[int]:
+        return sorted(int(p.stem.split("-")[1]) for p in self.root.glob("seg-*.bin"))
+
+    @contextmanager
+    def _writer(self):
+        with self._write_lock:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _query(self, sql: str, params=()) -> list[tuple]:
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def _index(self, rows: list[tuple[str, int, int, int]], replace_all: bool = False):
+        with self._lock:
+            self._db.execute("BEGIN")
+            if replace_all:
+                self._db.execute("DELETE FROM raw_index")
+            self._db.executemany("INSERT OR REPLACE INTO raw_index VALUES (?, ?, ?, ?)", rows)
+            self._db.execute("COMMIT")
+
+    def _recover_tail(self):
+        """
+        Index records past the last indexed one and drop a torn tail. That is
+        the rest of its segment and every later segment, since a writer can
+        roll over to new segments before it dies.
+        """
+        segments = self.segments()
+        if not segments:
+            return
+        [(last, indexed_end)] = self._query(
+            "SELECT segment, MAX(offset + length) FROM raw_index "
+            "WHERE segment = (SELECT MAX(segment) FROM raw_index)"
+        )
+        for segment in segments:
+            if last is not None and segment < last:
+                continue
+            start = indexed_end if segment == last else 0
+            path = self.segment_path(segment)
+            data = path.read_bytes()[start:]
+            rows, end = [], start
+            for offset, length, call_id, _ in iter_records(data):
+                rows.append((call_id, segment, start + offset, length))
+                end = start + offset + length
+            if rows:
+                self._index(rows)
+                print(f"[WARN] Indexed {len(rows)} unindexed raw conversations in {path.name}")
+            if end < path.stat().st_size:
+                print(f"[WARN] Truncating a torn record at the end of {path.name}")
+                os.truncate(path, end)
+
+    def append_many(self, items: Iterable[tuple[str, list[dict]]]) -> int:
+        """
+        Append conversations (a later append for a call_id replaces the
+        earlier one) and index them in one transaction; returns how many.
+        """
+        records = [(call_id, encode_record(call_id, convo)) for call_id, convo in items]
+        if not records:
+            return 0
+        with self._writer():
+            segments = self.segments()
+            segment = segments[-1] if segments else 1
+            path = self.segment_path(segment)
+            size = path.stat().st_size if path.exists() else 0
+            rows = []
+            f = open(path, "ab")
+            try:
+                for call_id, record in records:
+                    if size and size + len(record) > self.segment_bytes:
+                        self._seal(f)
+                        segment, size = segment + 1, 0
+                        path = self.segment_path(segment)
+                        f = open(path, "ab")
+                    f.write(record)
+                    rows.append((call_id, segment, size, len(record)))
+                    size += len(record)
+                self._seal(f)
+            except BaseException:
+                f.close()
+                raise
+            self._index(rows)
+        return len(rows)
+
+    @staticmethod
+    def _seal(f):
+        f.flush()
+        if RAW_ARCHIVE_FSYNC:
+            os.fsync(f.fileno())
+        f.close()
+
+    def append(self, call_id: str, convo: list[dict]):
+        self.append_many([(call_id, convo)])
+
+    def _map(self, segment: int, needed: int) -> mmap.mmap:
+        """Memory map of `segment`, remapped if the segment has grown past it since."""
+        mapped = self._maps.get(segment)
+        if mapped is None or len(mapped) < needed:
+            with open(self.segment_path(segment), "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            old, self._maps[segment] = self._maps.get(segment), mapped
+            if old is not None:
+                old.close()
+        return mapped
+
+    def _read(self, segment: int, offset: int, length: int) -> tuple[str, list[dict]]:
+        with self._lock:
+            mapped = self._map(segment, offset + length)
+            _, _, call_id, payload = next(iter_records(mapped[offset:offset + length]))
+        return call_id, decode_payload(payload)
+
+    def get(self, call_id: str) -> Optional[list[dict]]:
+        rows = self._query("SELECT segment, offset, length FROM raw_index WHERE call_id = ?", (call_id,))
+        return self._read(*rows[0])[1] if rows else None
+
+    def get_many(self, call_ids: list[str]) -> dict[str, list[dict]]:
+        """Conversations for the call_ids that are archived, read in segment order."""
+        rows = []
+        for start in range(0, len(call_ids), 500):
+            part = call_ids[start:start + 500]
+            marks = ",".join("?" * len(part))
+            rows += self._query(f"SELECT segment, offset, length FROM raw_index WHERE call_id IN ({marks})", part)
+        return dict(self._read(*row) for row in sorted(rows))
+
+    def contains_many(self, call_ids: list[str]) -> set[str]:
+        found = set()
+        for start in range(0, len(call_ids), 500):
+            part = call_ids[start:start + 500]
+            marks = ",".join("?" * len(part))
+            found.update(r[0] for r in self._query(f"SELECT call_id FROM raw_index WHERE call_id IN ({marks})", part))
+        return found
+
+    def scan(self, latest_only: bool = True) -> Iterator[tuple[str, list[dict]]]:
+        """
+        Every archived conversation, segment by segment in append order. With
+        `latest_only`, records replaced by a later append are skipped.
+        """
+        for segment in self.segments():
+            live = None
+            if latest_only:
+                live = {r[0] for r in self._query("SELECT offset FROM raw_index WHERE segment = ?", (segment,))}
+            with open(self.segment_path(segment), "rb") as f:
+                if not os.fstat(f.fileno()).st_size:
+                    continue
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped, \
+                        closing(iter_records(mapped)) as records:
+                    for offset, _, call_id, payload in records:
+                        if live is None or offset in live:
+                            yield call_id, decode_payload(payload)
+
+    def rebuild_index(self) -> int:
+        """Recreate the index from the segments (the last record for a call_id wins)."""
+        with self._writer():
+            rows = []
+            for segment in self.segments():
+                data = self.segment_path(segment).read_bytes()
+                rows += [(call_id, segment, offset, length) for offset, length, call_id, _ in iter_records(data)]
+            self._index(rows, replace_all=True)
+        return len(rows)
+
+    def stats(self) -> dict:
+        segments = self.segments()
+        return {
+            "segments": len(segments),
+            "bytes": sum(self.segment_path(s).stat().st_size for s in segments),
+            "conversations": self._query("SELECT COUNT(*) FROM raw_index")[0][0],
+        }
+
+    def close(self):
+        with self._lock:
+            for mapped in self._maps.values():
+                mapped.close()
+            self._maps.clear()
+            self._db.close()
+            self._lock_file.close()
+
+
+_archive: Optional[RawArchive] = None
+_archive_lock = threading.Lock()
+
+
+def get_raw_archive() -> RawArchive:
+    global _archive
+    if _archive is None:
+        with _archive_lock:
+            if _archive is None:
+                _archive = RawArchive()
+    return _archive
@@ -0,0 +1,80 @@
+from datetime import date, datetime, time, timedelta
+from typing import Optional, Sequence
+
+from sqlalchemy import Date, String, any_, bindparam, cast, delete, func, select, text
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import INSIGHT_JOIN, AgentDailyStats, Call, CallInsight
+from app.partitions import list_partitions
+
+SUMS = ("call_count", "sentiment_sum", "talk_ratio_sum", "duration_sum")
+
+
+def daily_totals():
+    """Per-agent, per-day sums over calls joined to their insights."""
+    day = cast(Call.start_time, Date)
+    return (
+        select(
+            Call.agent_id,
+            day.label("day"),
+            func.count().label("call_count"),
+            func.sum(CallInsight.customer_sentiment).label("sentiment_sum"),
+            func.sum(CallInsight.agent_talk_ratio).label("talk_ratio_sum"),
+            func.coalesce(func.sum(Call.duration_seconds), 0).label("duration_sum"),
+        )
+        .join(CallInsight, INSIGHT_JOIN)
+        .group_by(Call.agent_id, day)
+    )
+
+
+async def apply_rollups(session: AsyncSession, call_ids: Sequence[str]) -> int:
+    """
+    Fold calls whose insights were just inserted into agent_daily_stats.
+
+    Must run in the same transaction as the insight insert and only for rows
+    that insert actually created (`copy_insert(..., returning="call_id")`), so
+    every insight is counted exactly once. Returns the number of day rows
+    touched.
+    """
+    if not call_ids:
+        return 0
+    ids = bindparam("call_ids", list(call_ids), type_=ARRAY(String))
+    stmt = insert(AgentDailyStats).from_select(
+        ["agent_id", "day", *SUMS],
+        daily_totals().where(Call.call_id == any_(ids)),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[AgentDailyStats.agent_id, AgentDailyStats.day],
+        set_={name: getattr(AgentDailyStats, name) + getattr(stmt.excluded, name) for name in SUMS},
+    )
+    return (await session.execute(stmt)).rowcount
+
+
+async def rebuild_rollups(
+    session: AsyncSession, from_day: Optional[date] = None, to_day: Optional[date] = None
+) -> int:
+    """
+    Recompute agent_daily_stats, for every day or only those between
+    `from_day` and `to_day` (inclusive). The table stays exclusively locked
+    until the caller commits, so concurrent writers queue behind the rebuild
+    and apply their increments on top of it rather than being lost. A window
+    only reads the calls_db/call_insights partitions it covers, and days
+    older than the oldest partition (expired by retention) are never cleared.
+    """
+    await session.execute(text(f'LOCK TABLE "{AgentDailyStats.__tablename__}" IN EXCLUSIVE MODE'))
+    partitions = await list_partitions(await session.connection(), "calls_db")
+    if partitions and (from_day is None or from_day < partitions[0].start):
+        from_day = partitions[0].start
+    totals, window = daily_totals(), []
+    if from_day is not None:
+        start = datetime.combine(from_day, time.min)
+        totals = totals.where(Call.start_time >= start, CallInsight.start_time >= start)
+        window.append(AgentDailyStats.day >= from_day)
+    if to_day is not None:
+        end = datetime.combine(to_day + timedelta(days=1), time.min)
+        totals = totals.where(Call.start_time < end, CallInsight.start_time < end)
+        window.append(AgentDailyStats.day <= to_day)
+    await session.execute(delete(AgentDailyStats).where(*window))
+    stmt = insert(AgentDailyStats).from_select(["agent_id", "day", *SUMS], totals)
+    return (await session.execute(stmt)).rowcount
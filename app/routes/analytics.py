@@ -1,33 +1,139 @@
-from fastapi import APIRouter, Depends
+from datetime import date
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, Query, Request
+from pydantic import TypeAdapter
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
 
-from app.schemas import AnalyticsAgent
-from app.models import CallInsight, Call
-from app.db import get_session
+from app.schemas import AnalyticsAgent, AnalyticsAgentDay
+from app.models import AgentDailyStats
+from app.cache import ResponseCache, get_response_cache
+from app.db import get_read_session, pool_stats
+from app.insight_worker import get_insight_worker
+from app.metrics import STATEMENTS
+from app.vector_index import current_index
 
 router = APIRouter()
+LEADERBOARD = TypeAdapter(list[AnalyticsAgent])
+AGENT_DAYS = TypeAdapter(list[AnalyticsAgentDay])
+
+
+def window_filters(agent_id: Optional[str], from_date: Optional[date], to_date: Optional[date]) -> list:
+    filters = []
+    if agent_id:
+        filters.append(AgentDailyStats.agent_id == agent_id)
+    if from_date:
+        filters.append(AgentDailyStats.day >= from_date)
+    if to_date:
+        filters.append(AgentDailyStats.day <= to_date)
+    return filters
+
 
 @router.get("/agents", response_model=list[AnalyticsAgent])
-async def agents_leaderboard(session: AsyncSession = Depends(get_session)):
-    stmt = (
-        select(
-            Call.agent_id,
-            func.avg(CallInsight.customer_sentiment).label("avg_sentiment"),
-            func.avg(CallInsight.agent_talk_ratio).label("avg_talk_ratio"),
-            func.count(Call.call_id).label("total_calls"),
+async def agents_leaderboard(
+    request: Request,
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
+    sort_by: Literal["calls", "sentiment", "talk_ratio"] = "calls",
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    session: AsyncSession = Depends(get_read_session),
+    cache: ResponseCache = Depends(get_response_cache),
+):
+    """
+    Agents ranked over the agent_daily_stats rollup, optionally within a date
+    window; cost scales with agents x days in the window, not with calls.
+    """
+    async def load():
+        total_calls = func.sum(AgentDailyStats.call_count)
+        avg_sentiment = func.sum(AgentDailyStats.sentiment_sum) / total_calls
+        avg_talk_ratio = func.sum(AgentDailyStats.talk_ratio_sum) / total_calls
+        avg_duration = func.sum(AgentDailyStats.duration_sum) / total_calls
+        order = {"calls": total_calls, "sentiment": avg_sentiment, "talk_ratio": avg_talk_ratio}[sort_by]
+        stmt = (
+            select(AgentDailyStats.agent_id, avg_sentiment, avg_talk_ratio, total_calls, avg_duration)
+            .where(*window_filters(None, from_date, to_date))
+            .group_by(AgentDailyStats.agent_id)
+            .order_by(order.desc(), AgentDailyStats.agent_id)
+            .offset(offset)
+            .limit(limit)
+        )
+        rows = await session.execute(stmt)
+        return [
+            {
+                "agent_id": agent_id,
+                "avg_sentiment": avg_sentiment,
+                "avg_talk_ratio": avg_talk_ratio,
+                "total_calls": total_calls,
+                "avg_duration_seconds": avg_duration,
+            }
+            for agent_id, avg_sentiment, avg_talk_ratio, total_calls, avg_duration in rows
+        ]
+
+    return await cache.respond(request, "agents_leaderboard", ["insights"], load, LEADERBOARD)
+
+
+@router.get("/agents/daily", response_model=list[AnalyticsAgentDay])
+async def agents_daily(
+    request: Request,
+    agent_id: Optional[str] = None,
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    session: AsyncSession = Depends(get_read_session),
+    cache: ResponseCache = Depends(get_response_cache),
+):
+    """Per-agent, per-day averages, newest day first."""
+    async def load():
+        stmt = (
+            select(AgentDailyStats)
+            .where(*window_filters(agent_id, from_date, to_date))
+            .order_by(AgentDailyStats.day.desc(), AgentDailyStats.agent_id)
+            .offset(offset)
+            .limit(limit)
         )
-        .join(CallInsight, Call.call_id == CallInsight.call_id)
-        .group_by(Call.agent_id)
-        .order_by(func.count(Call.call_id).desc())
-    )
-    rows = await session.execute(stmt)
-    return [
-        {
-            "agent_id": agent_id,
-            "avg_sentiment": avg_sentiment,
-            "avg_talk_ratio": avg_talk_ratio,
-            "total_calls": total_calls,
-        }
-        for agent_id, avg_sentiment, avg_talk_ratio, total_calls in rows
-    ]
+        rows = (await session.execute(stmt)).scalars()
+        return [
+            {
+                "agent_id": r.agent_id,
+                "day": r.day,
+                "avg_sentiment": r.sentiment_sum / r.call_count,
+                "avg_talk_ratio": r.talk_ratio_sum / r.call_count,
+                "total_calls": r.call_count,
+                "avg_duration_seconds": r.duration_sum / r.call_count,
+            }
+            for r in rows
+        ]
+
+    return await cache.respond(request, "agents_daily", ["insights"], load, AGENT_DAYS)
+
+
+@router.get("/embedding-store")
+async def embedding_store_stats():
+    index = current_index()
+    if index is None:
+        return {"loaded": False}
+    return {"loaded": True, "backend": index.name, **index.store.stats()}
+
+
+@router.get("/insight-queue")
+async def insight_queue_stats():
+    return get_insight_worker().stats()
+
+
+@router.get("/db-pool")
+async def db_pool_stats():
+    return pool_stats()
+
+
+@router.get("/cache")
+async def response_cache_stats(cache: ResponseCache = Depends(get_response_cache)):
+    return cache.stats()
+
+
+@router.get("/db-statements")
+async def db_statement_stats(limit: int = Query(20, ge=1, le=500)):
+    """Statement fingerprints by total time spent in this process."""
+    return STATEMENTS.top(limit)
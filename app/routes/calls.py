@@ -1,88 +1,435 @@
+import asyncio
+import base64
+import json
+import time
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, Query
+
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
-from typing import List
-from sklearn.metrics.pairwise import cosine_similarity
-from utils.ai_utils import generate_coaching_nudges
+from sqlalchemy import LargeBinary, String, any_, bindparam, select, func, tuple_, type_coerce
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from typing import List, Literal, Optional
 
 from app.schemas import (
+    CallBatchRequest,
+    CallBatchResponse,
     CallsListResponse,
     CallDetail,
+    IngestRequest,
+    IngestResponse,
     Recommendation,
+    RecommendationBatchRequest,
+    RecommendationBatchResponse,
     ErrorResponse,
+    SearchRequest,
+    SearchResponse,
 )
-from app.models import Call, CallInsight
-from app.db import get_session
+from app.models import INSIGHT_JOIN, Call, CallInsight, InsightOutbox
+from app.cache import ResponseCache, get_response_cache
+from app.conversations import build_call, transcript_times, write_raw
+from app.db import ReadSessionLocal, get_read_session, get_session
+from app.export import FORMATS, OPTIONAL_COLUMNS, export_chunks
+from app.insight_worker import UTC_NOW, InsightWorker, PendingCall, get_insight_worker
+from app.metrics import span
+from app.nudges import NudgeService, get_nudge_service
+from app.pagination import decode_cursor, encode_cursor
+from app.partitions import ensure_partitions
+from app.search import hybrid_search, lexical_search
+from app.vector_index import VectorIndex, get_vector_index
+from utils.features import FEATURE_COLUMNS
 
 
 router = APIRouter()
+CALL_DETAIL = TypeAdapter(CallDetail)
+RECOMMENDATIONS = TypeAdapter(List[Recommendation])
+
+def call_filters(
+    agent_id: Optional[str] = None,
+    from_date: Optional[datetime] = None,
+    to_date: Optional[datetime] = None,
+    min_sentiment: Optional[float] = None,
+    max_sentiment: Optional[float] = None,
+    max_first_response_seconds: Optional[float] = None,
+    max_agent_filler_rate: Optional[float] = None,
+) -> list:
+    filters = []
+    if agent_id:
+        filters.append(Call.agent_id == agent_id)
+    # date bounds go on both sides of the join so both tables' partitions are pruned
+    if from_date:
+        filters += [Call.start_time >= from_date, CallInsight.start_time >= from_date]
+    if to_date:
+        filters += [Call.start_time <= to_date, CallInsight.start_time <= to_date]
+    if min_sentiment is not None:
+        filters.append(CallInsight.customer_sentiment >= min_sentiment)
+    if max_sentiment is not None:
+        filters.append(CallInsight.customer_sentiment <= max_sentiment)
+    if max_first_response_seconds is not None:
+        filters.append(CallInsight.first_response_seconds <= max_first_response_seconds)
+    if max_agent_filler_rate is not None:
+        filters.append(CallInsight.agent_filler_rate <= max_agent_filler_rate)
+    return filters
+
+
+async def count_rows(session: AsyncSession, stmt, mode: str) -> Optional[int]:
+    """
+    Row count for `stmt`: exact COUNT(*), the planner's estimate (cheap but
+    approximate, from table statistics), or None when the caller opts out.
+    """
+    if mode == "none":
+        return None
+    if mode == "estimate":
+        conn = await session.connection()
+        compiled = stmt.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True})
+        # sent as-is: text() would take a ":name" inside a filter literal for a bind
+        plan = (await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}")).scalar_one()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+    return (await session.execute(select(func.count()).select_from(stmt.subquery()))).scalar_one()
+
+
+SUMMARY_COLUMNS = {
+    "call_id": Call.call_id,
+    "agent_id": Call.agent_id,
+    "customer_id": Call.customer_id,
+    "language": Call.language,
+    "start_time": Call.start_time,
+    "duration_seconds": Call.duration_seconds,
+    "customer_sentiment": CallInsight.customer_sentiment,
+    "agent_talk_ratio": CallInsight.agent_talk_ratio,
+    **{name: getattr(CallInsight, name) for name in FEATURE_COLUMNS},
+}
+
+
+DETAIL_COLUMNS = [
+    Call.call_id, Call.agent_id, Call.customer_id, Call.language, Call.start_time,
+    Call.duration_seconds, Call.transcript,
+    CallInsight.customer_sentiment, CallInsight.agent_talk_ratio,
+    *(getattr(CallInsight, name) for name in FEATURE_COLUMNS),
+]
+# raw packed bytes: base64 output never decodes the vector at all
+RAW_EMBEDDING = type_coerce(CallInsight.embedding, LargeBinary).label("embedding")
+
+
+def any_of(column, values: List[str]):
+    """`column = ANY(:values)`: one array parameter however many values there are."""
+    return column == any_(bindparam("values", values, type_=ARRAY(String)))
+
+
+def format_embedding(raw: bytes, embedding_format: str):
+    if embedding_format == "base64":
+        return base64.b64encode(raw).decode()
+    return np.frombuffer(raw, dtype="<f4").tolist()
+
+
+def parse_list_param(value: Optional[str], allowed, name: str) -> list[str]:
+    names = [v.strip() for v in value.split(",") if v.strip()] if value else []
+    unknown = set(names) - set(allowed)
+    if unknown:
+        raise HTTPException(422, f"Unknown {name}: {', '.join(sorted(unknown))}")
+    return names
+
 
 @router.get(
     "", response_model=CallsListResponse,
+    response_model_exclude_unset=True,
     responses={422: {"model": ErrorResponse}}
 )
 async def list_calls(
     limit: int = Query(10, ge=1, le=100),
     offset: int = Query(0, ge=0),
+    cursor: str = Query(None, description="next_cursor from the previous page; replaces offset"),
+    total: Literal["exact", "estimate", "none"] = Query("exact"),
     agent_id: str = Query(None),
     from_date: datetime = Query(None),
     to_date: datetime = Query(None),
     min_sentiment: float = Query(None, ge=-1.0, le=1.0),
     max_sentiment: float = Query(None, ge=-1.0, le=1.0),
-    session: AsyncSession = Depends(get_session)
+    max_first_response_seconds: float = Query(None, ge=0.0),
+    max_agent_filler_rate: float = Query(None, ge=0.0, le=1.0),
+    fields: str = Query(None, description=f"comma-separated subset of {', '.join(SUMMARY_COLUMNS)}"),
+    include: str = Query(None, description="comma-separated extras: transcript"),
+    transcript_chars: int = Query(None, ge=1, le=10000, description="include the first N transcript characters"),
+    session: AsyncSession = Depends(get_read_session)
 ):
-    filters = []
-    if agent_id:
-        filters.append(Call.agent_id == agent_id)
-    if from_date:
-        filters.append(Call.start_time >= from_date)
-    if to_date:
-        filters.append(Call.start_time <= to_date)
-    if min_sentiment is not None:
-        filters.append(CallInsight.customer_sentiment >= min_sentiment)
-    if max_sentiment is not None:
-        filters.append(CallInsight.customer_sentiment <= max_sentiment)
+    # Project only the requested columns; transcripts are the bulk of a row,
+    # so they are left out unless asked for (optionally truncated in SQL)
+    wanted = parse_list_param(fields, SUMMARY_COLUMNS, "fields") or list(SUMMARY_COLUMNS)
+    extras = parse_list_param(include, ["transcript"], "include")
+    columns = [SUMMARY_COLUMNS[name].label(name) for name in wanted if name not in ("call_id", "start_time")]
+    if transcript_chars:
+        columns.append(func.left(Call.transcript, transcript_chars).label("transcript"))
+    elif "transcript" in extras:
+        columns.append(Call.transcript.label("transcript"))
+    output = ["call_id", *(c.name for c in columns)]
+    if "start_time" in wanted:
+        output.append("start_time")
+
+    filters = call_filters(
+        agent_id, from_date, to_date, min_sentiment, max_sentiment,
+        max_first_response_seconds, max_agent_filler_rate,
+    )
+    base = (
+        select(Call.call_id)
+        .join(CallInsight, INSIGHT_JOIN)
+        .where(*filters)
+    )
+    count = await count_rows(session, base, total)
 
+    # Keyset pagination on (start_time, call_id) DESC: the cursor seeks
+    # straight into the composite index, so deep pages cost the same as page 1
     stmt = (
-        select(Call, CallInsight)
-        .join(CallInsight, Call.call_id == CallInsight.call_id)
-        .where(and_(*filters)) if filters else
-        select(Call, CallInsight)
-        .join(CallInsight, Call.call_id == CallInsight.call_id)
+        select(Call.call_id.label("call_id"), Call.start_time.label("start_time"), *columns)
+        .join(CallInsight, INSIGHT_JOIN)
+        .where(*filters)
+        .order_by(Call.start_time.desc(), Call.call_id.desc())
+        .limit(limit + 1)
     )
-    total = (await session.execute(stmt.with_only_columns([Call.call_id]).order_by(None))).rowcount
-    result = await session.execute(stmt.order_by(Call.start_time.desc()).limit(limit).offset(offset))
-    items = [
-        {
-            **call.__dict__,
-            "customer_sentiment": insight.customer_sentiment,
-            "agent_talk_ratio": insight.agent_talk_ratio
-        }
-        for call, insight in result.all()
-    ]
-    return {"total": total, "items": items}
+    if cursor:
+        start_time, call_id = decode_cursor(cursor, datetime, str)
+        stmt = stmt.where(
+            tuple_(Call.start_time, Call.call_id) < tuple_(start_time, call_id),
+            # redundant with the row comparison, but lets the planner skip newer partitions
+            Call.start_time <= start_time,
+            CallInsight.start_time <= start_time,
+        )
+    elif offset:
+        stmt = stmt.offset(offset)
+    rows = (await session.execute(stmt)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].start_time, rows[-1].call_id)
+    items = [{name: row._mapping[name] for name in output} for row in rows]
+    return {"total": count, "items": items, "next_cursor": next_cursor}
+
+
+@router.post(
+    "", response_model=IngestResponse, status_code=202,
+    responses={200: {"model": IngestResponse}, 422: {"model": ErrorResponse}}
+)
+async def ingest_call(
+    req: IngestRequest,
+    response: Response,
+    session: AsyncSession = Depends(get_session),
+    worker: InsightWorker = Depends(get_insight_worker),
+):
+    """
+    Store one conversation as a call and return immediately (202); insights
+    are computed by the background insight worker. Re-posting a call that
+    already exists is a no-op answered with 200 and status "duplicate".
+    """
+    convo = [m.model_dump() for m in req.messages]
+    try:
+        call = build_call(convo)
+    except ValueError as e:
+        raise HTTPException(422, f"Unparseable created_at: {e}")
+    if call is None:
+        raise HTTPException(422, "A conversation needs at least one agent and one customer message")
+
+    try:
+        await ensure_partitions([call["start_time"]])
+    except ValueError as e:
+        raise HTTPException(422, str(e))
+    stmt = (
+        insert(Call).values(**call)
+        .on_conflict_do_nothing(index_elements=[Call.call_id, Call.start_time])
+        .returning(Call.call_id)
+    )
+    if (await session.execute(stmt)).scalar_one_or_none() is None:
+        response.status_code = 200
+        return {"call_id": call["call_id"], "status": "duplicate"}
+    # the outbox row makes the insight work durable before we acknowledge
+    await session.execute(insert(InsightOutbox).values(
+        call_id=call["call_id"], claimed_by=worker.worker_id, claimed_at=UTC_NOW,
+    ))
+    await session.commit()
+
+    await asyncio.to_thread(write_raw, call["call_id"], convo)
+    worker.enqueue(PendingCall(
+        call["call_id"], call["transcript"], call["agent_id"], call["start_time"], time.time(),
+        line_times=transcript_times(convo),
+    ))
+    return {"call_id": call["call_id"], "status": "queued"}
+
+
+@router.get("/export", response_class=StreamingResponse, responses={422: {"model": ErrorResponse}})
+async def export_calls(
+    format: Literal["ndjson", "arrow", "parquet"] = Query("ndjson"),
+    agent_id: str = Query(None),
+    from_date: datetime = Query(None),
+    to_date: datetime = Query(None),
+    min_sentiment: float = Query(None, ge=-1.0, le=1.0),
+    max_sentiment: float = Query(None, ge=-1.0, le=1.0),
+    max_first_response_seconds: float = Query(None, ge=0.0),
+    max_agent_filler_rate: float = Query(None, ge=0.0, le=1.0),
+    include: str = Query(None, description="comma-separated extras: transcript, embedding"),
+):
+    """
+    Every call matching the filters in one streamed response, read through a
+    server-side cursor so memory stays flat however many rows match.
+    Embeddings are float lists in NDJSON and fixed_size_list<float32> columns
+    in Arrow/Parquet.
+    """
+    extras = parse_list_param(include, OPTIONAL_COLUMNS, "include")
+    filters = call_filters(
+        agent_id, from_date, to_date, min_sentiment, max_sentiment,
+        max_first_response_seconds, max_agent_filler_rate,
+    )
+    return StreamingResponse(
+        export_chunks(ReadSessionLocal, format, filters, extras),
+        media_type=FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="calls.{format}"'},
+    )
+
+
+@router.post(
+    "/search", response_model=SearchResponse,
+    responses={422: {"model": ErrorResponse}}
+)
+async def search_calls(
+    req: SearchRequest,
+    session: AsyncSession = Depends(get_read_session),
+    index: VectorIndex = Depends(get_vector_index),
+):
+    if req.mode == "hybrid":
+        return await hybrid_search(session, req, index)
+    return await lexical_search(session, req)
+
+
+@router.post(
+    "/batch", response_model=CallBatchResponse,
+    response_model_exclude_unset=True,
+    responses={422: {"model": ErrorResponse}}
+)
+async def get_calls_batch(
+    req: CallBatchRequest,
+    session: AsyncSession = Depends(get_read_session),
+):
+    """Many `GET /{call_id}` lookups in one query; unknown ids are listed in `missing`."""
+    call_ids = list(dict.fromkeys(req.call_ids))
+    columns = DETAIL_COLUMNS + [RAW_EMBEDDING] if "embedding" in req.include else DETAIL_COLUMNS
+    stmt = select(*columns).join(
+        CallInsight, INSIGHT_JOIN
+    ).where(any_of(Call.call_id, call_ids))
+    found = {}
+    for rec in await session.execute(stmt):
+        item = dict(rec._mapping)
+        if "embedding" in item:
+            item["embedding"] = format_embedding(item["embedding"], req.embedding_format)
+        found[item["call_id"]] = item
+    return {
+        "items": [found[c] for c in call_ids if c in found],
+        "missing": [c for c in call_ids if c not in found],
+    }
+
+
+@router.post(
+    "/recommendations/batch", response_model=RecommendationBatchResponse,
+    responses={422: {"model": ErrorResponse}}
+)
+async def get_recommendations_batch(
+    req: RecommendationBatchRequest,
+    session: AsyncSession = Depends(get_read_session),
+    index: VectorIndex = Depends(get_vector_index),
+    nudge_service: NudgeService = Depends(get_nudge_service),
+):
+    """
+    Recommendations for many calls: all query embeddings are scored together
+    (`VectorIndex.search_many`) and each item reports its own error instead
+    of failing the whole batch.
+    """
+    call_ids = list(dict.fromkeys(req.call_ids))
+    vectors = {c: index.get_vector(c) for c in call_ids}
+    unindexed = [c for c, v in vectors.items() if v is None]
+    if unindexed:
+        stmt = select(CallInsight.call_id, CallInsight.embedding).where(
+            any_of(CallInsight.call_id, unindexed)
+        )
+        vectors.update({cid: emb for cid, emb in await session.execute(stmt)})
+
+    errors, ready = {}, []
+    for cid in call_ids:
+        emb = vectors[cid]
+        if emb is None or len(emb) == 0:
+            errors[cid] = f"Insights for {cid} not found"
+        elif index.store.dim is not None and len(emb) != index.store.dim:
+            errors[cid] = f"Embedding for {cid} has {len(emb)} dimensions, index has {index.store.dim}"
+        else:
+            ready.append(cid)
+
+    results = {}
+    if ready:
+        with span("vector_search"):
+            tops = index.search_many(
+                np.stack([np.asarray(vectors[c], dtype=np.float32) for c in ready]), req.k,
+                exclude=ready,
+                agent_id=req.agent_id,
+                from_date=req.from_date,
+                to_date=req.to_date,
+                probes=req.probes,
+            )
+        results = dict(zip(ready, tops))
+
+    nudges = {}
+    if req.nudges and ready:
+        stmt = select(Call.call_id, Call.transcript).where(any_of(Call.call_id, ready))
+        transcripts = dict((await session.execute(stmt)).all())
+        nudges = await nudge_service.get_nudges_many(session, transcripts)
+
+    items = []
+    for cid in call_ids:
+        if cid in errors:
+            items.append({"call_id": cid, "error": errors[cid]})
+            continue
+        call_nudges = nudges.get(cid, [])
+        items.append({
+            "call_id": cid,
+            "recommendations": [
+                {"call_id": rid, "similarity": sim, "nudge": call_nudges[i] if i < len(call_nudges) else ""}
+                for i, (rid, sim) in enumerate(results[cid])
+            ],
+        })
+    return {"items": items}
 
 
 @router.get(
     "/{call_id}", response_model=CallDetail,
+    response_model_exclude_unset=True,
     responses={404: {"model": ErrorResponse}}
 )
-async def get_call(call_id: str, session: AsyncSession = Depends(get_session)):
-    stmt = select(Call, CallInsight).join(
-        CallInsight, Call.call_id == CallInsight.call_id
-    ).where(Call.call_id == call_id)
-    result = await session.execute(stmt)
-    rec = result.first()
-    if not rec:
-        raise HTTPException(404, f"Call {call_id} not found")
-    call, insight = rec
-    return {
-        **call.__dict__,
-        "embedding": insight.embedding,
-        "customer_sentiment": insight.customer_sentiment,
-        "agent_talk_ratio": insight.agent_talk_ratio
-    }
+async def get_call(
+    call_id: str,
+    request: Request,
+    include: str = Query(None, description="comma-separated extras: embedding"),
+    embedding_format: Literal["base64", "list"] = Query("base64"),
+    session: AsyncSession = Depends(get_read_session),
+    cache: ResponseCache = Depends(get_response_cache),
+):
+    extras = parse_list_param(include, ["embedding"], "include")
+
+    async def load():
+        columns = DETAIL_COLUMNS + [RAW_EMBEDDING] if "embedding" in extras else DETAIL_COLUMNS
+        stmt = select(*columns).join(
+            CallInsight, INSIGHT_JOIN
+        ).where(Call.call_id == call_id)
+        result = await session.execute(stmt)
+        rec = result.first()
+        if not rec:
+            raise HTTPException(404, f"Call {call_id} not found")
+        item = dict(rec._mapping)
+        if "embedding" in item:
+            item["embedding"] = format_embedding(item["embedding"], embedding_format)
+        return item
+
+    return await cache.respond(
+        request, "get_call", [f"call:{call_id}", "insights"], load, CALL_DETAIL, exclude_unset=True
+    )
 
 
 @router.get(
@@ -92,37 +439,65 @@ async def get_call(call_id: str, session: AsyncSession = Depends(get_session)):
 )
 async def get_recommendations(
     call_id: str,
-    session: AsyncSession = Depends(get_session)
+    request: Request,
+    k: int = Query(5, ge=1, le=50),
+    agent_id: str = Query(None),
+    from_date: datetime = Query(None),
+    to_date: datetime = Query(None),
+    probes: int = Query(None, ge=1, le=4096),
+    session: AsyncSession = Depends(get_read_session),
+    index: VectorIndex = Depends(get_vector_index),
+    nudge_service: NudgeService = Depends(get_nudge_service),
+    cache: ResponseCache = Depends(get_response_cache),
 ):
-    # fetch embedding for this call
-    stmt0 = select(CallInsight.embedding).where(CallInsight.call_id == call_id)
-    res0 = await session.execute(stmt0)
-    emb = res0.scalar_one_or_none()
-    if emb is None:
-        raise HTTPException(404, f"Insights for {call_id} not found")
-
-    # fetch all other embeddings
-    stmt1 = select(CallInsight.call_id, CallInsight.embedding)
-    rows = await session.execute(stmt1)
-    others = [(cid, vec) for cid, vec in rows if cid != call_id]
-
-    # compute cosine similarity
-    sims = cosine_similarity([emb], [vec for _, vec in others])[0]
-    top5 = sorted(zip(others, sims), key=lambda x: -x[1])[:5]
-
-    # Fetch original transcript
-    transcript = Call.transcript
-    
-    # Generate nudges via Groq API
-    nudges = generate_coaching_nudges(transcript)
-
-    recommendations = []
-    for (cid, _), sim in top5:
-        nudge_text = nudges.pop(0) if nudges else ""
-        recommendations.append({
-            "call_id": cid,
-            "similarity": float(sim),
-            "nudge": nudge_text
-        })
+    async def load():
+        # fetch the transcript and embedding for this call; the index's copy of
+        # the embedding is preferred, the stored one covers rows it hasn't picked
+        # up yet (or has dropped since)
+        stmt0 = (
+            select(Call.transcript, CallInsight.embedding)
+            .join(CallInsight, INSIGHT_JOIN)
+            .where(Call.call_id == call_id)
+        )
+        res0 = await session.execute(stmt0)
+        rec = res0.first()
+        if rec is None:
+            raise HTTPException(404, f"Insights for {call_id} not found")
+        transcript = rec[0]
+        emb = index.get_vector(call_id)
+        if emb is None:
+            emb = rec.embedding
+        if emb is None or len(emb) == 0:
+            raise HTTPException(404, f"Insights for {call_id} not found")
 
-    return recommendations
+        # nearest neighbours from the vector index (`probes` is the recall/latency
+        # knob for approximate backends)
+        with span("vector_search"):
+            top = index.search(
+                emb, k,
+                exclude=call_id,
+                agent_id=agent_id,
+                from_date=from_date,
+                to_date=to_date,
+                probes=probes,
+            )
+
+        # Coaching nudges: cached per transcript, otherwise generated without
+        # blocking the event loop (empty if the LLM is slow)
+        nudges = await nudge_service.get_nudges(session, call_id, transcript)
+
+        recommendations = []
+        for i, (cid, sim) in enumerate(top):
+            nudge_text = nudges[i] if i < len(nudges) else ""
+            recommendations.append({
+                "call_id": cid,
+                "similarity": float(sim),
+                "nudge": nudge_text
+            })
+
+        return recommendations
+
+    # depends on this call (nudges land later) and on every other call's insights
+    return await cache.respond(
+        request, "get_recommendations", [f"call:{call_id}", "insights"], load, RECOMMENDATIONS
+    )
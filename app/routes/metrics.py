@@ -0,0 +1,76 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.cache import get_response_cache
+from app.db import pool_stats
+from app.insight_worker import get_insight_worker
+from app.metrics import REGISTRY, render
+from app.vector_index import current_index
+
+router = APIRouter()
+PROMETHEUS_TEXT = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _pool(key: str):
+    return lambda: {(("engine", name),): stats[key] for name, stats in pool_stats().items()}
+
+
+def _cache(key: str):
+    return lambda: {(("route", route),): stats[key] for route, stats in get_response_cache().stats().items()}
+
+
+def _index(key: str):
+    def collect():
+        index = current_index()
+        return {(): index.store.stats()[key]} if index is not None else {}
+    return collect
+
+
+def _insight_queue(key: str):
+    return lambda: {(): get_insight_worker().stats()[key]}
+
+
+for key, help in (
+    ("size", "Pooled connections kept open."),
+    ("in_use", "Connections checked out."),
+    ("idle", "Connections checked in."),
+    ("overflow", "Connections opened beyond the pool size."),
+    ("wait_seconds_max", "Longest wait for a connection since start."),
+):
+    REGISTRY.gauge(f"db_pool_{key}", help, _pool(key))
+for key, help in (
+    ("checkouts", "Connection checkouts since start."),
+    ("timeouts", "Checkouts that timed out waiting for a connection."),
+):
+    REGISTRY.counter_callback(f"db_pool_{key}_total", help, _pool(key))
+for key, help in (
+    ("hits", "Responses served from the response cache since start."),
+    ("misses", "Responses computed since start."),
+    ("coalesced", "Misses that waited for an identical in-flight computation."),
+):
+    REGISTRY.counter_callback(f"response_cache_{key}_total", help, _cache(key))
+for key, help in (
+    ("rows", "Embeddings held by the vector index."),
+    ("bytes", "Memory used by the indexed embeddings."),
+    ("staleness_seconds", "Seconds since the index last pulled new insights."),
+    ("snapshot_generation", "Embedding snapshot generation the index maps, if any."),
+    ("mapped_bytes", "Embedding snapshot bytes mapped (shared between worker processes)."),
+):
+    REGISTRY.gauge(f"vector_index_{key}", help, _index(key))
+for key, help in (
+    ("queue_depth", "Calls queued for the insight worker."),
+    ("pending", "Calls accepted but not yet processed."),
+    ("oldest_pending_seconds", "Age of the oldest unprocessed call."),
+    ("lag_seconds_max", "Longest ingest-to-insight lag since start."),
+):
+    REGISTRY.gauge(f"insight_{key}", help, _insight_queue(key))
+for key, help in (
+    ("processed", "Calls processed since start."),
+    ("failed", "Calls dropped after INSIGHT_MAX_ATTEMPTS."),
+):
+    REGISTRY.counter_callback(f"insight_{key}_total", help, _insight_queue(key))
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(render(), media_type=PROMETHEUS_TEXT)
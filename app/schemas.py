@@ -1,5 +1,5 @@
-from datetime import datetime
-from typing import List, Optional
+from datetime import date, datetime
+from typing import List, Literal, Optional, Union
 from pydantic import BaseModel, Field
 
 
@@ -14,25 +14,52 @@ class CallBase(BaseModel):
 
 
 class CallDetail(CallBase):
-    embedding: Optional[List[float]] = None
+    # base64 of little-endian float32 by default, or a float list on request
+    embedding: Optional[Union[str, List[float]]] = None
     customer_sentiment: Optional[float] = None
     agent_talk_ratio: Optional[float] = None
+    agent_words: Optional[int] = None
+    customer_words: Optional[int] = None
+    agent_turns: Optional[int] = None
+    customer_turns: Optional[int] = None
+    agent_filler_rate: Optional[float] = None
+    customer_filler_rate: Optional[float] = None
+    first_response_seconds: Optional[float] = None
+    avg_response_gap_seconds: Optional[float] = None
 
 
-class CallSummary(CallBase):
-    customer_sentiment: float
-    agent_talk_ratio: float
+class CallSummary(BaseModel):
+    # Listing is projected: only call_id is always present
+    call_id: str
+    agent_id: Optional[str] = None
+    customer_id: Optional[str] = None
+    language: Optional[str] = None
+    start_time: Optional[datetime] = None
+    duration_seconds: Optional[int] = None
+    transcript: Optional[str] = None
+    customer_sentiment: Optional[float] = None
+    agent_talk_ratio: Optional[float] = None
+    agent_words: Optional[int] = None
+    customer_words: Optional[int] = None
+    agent_turns: Optional[int] = None
+    customer_turns: Optional[int] = None
+    agent_filler_rate: Optional[float] = None
+    customer_filler_rate: Optional[float] = None
+    first_response_seconds: Optional[float] = None
+    avg_response_gap_seconds: Optional[float] = None
 
 
 class CallsListResponse(BaseModel):
-    total: int
+    total: Optional[int] = None
     items: List[CallSummary]
+    next_cursor: Optional[str] = None
 
 
 class Recommendation(BaseModel):
     call_id: str
     similarity: float
-    nudge: str = Field(..., max_length=40)
+    # nudges are asked for in at most 40 words; NudgeService clips longer ones
+    nudge: str = Field(..., max_length=400)
 
 
 class AnalyticsAgent(BaseModel):
@@ -40,7 +67,84 @@ class AnalyticsAgent(BaseModel):
     avg_sentiment: float
     avg_talk_ratio: float
     total_calls: int
+    avg_duration_seconds: Optional[float] = None
+
+
+class AnalyticsAgentDay(AnalyticsAgent):
+    day: date
 
 
 class ErrorResponse(BaseModel):
     detail: str
+
+
+class SearchRequest(BaseModel):
+    query: str = Field(..., min_length=1)
+    mode: Literal["lexical", "hybrid"] = "lexical"
+    limit: int = Field(10, ge=1, le=100)
+    cursor: Optional[str] = None
+    agent_id: Optional[str] = None
+    from_date: Optional[datetime] = None
+    to_date: Optional[datetime] = None
+
+
+class SearchHit(BaseModel):
+    call_id: str
+    agent_id: str
+    start_time: datetime
+    score: float
+    snippet: str
+
+
+class SearchResponse(BaseModel):
+    items: List[SearchHit]
+    next_cursor: Optional[str] = None
+
+
+class CallBatchRequest(BaseModel):
+    call_ids: List[str] = Field(..., min_length=1, max_length=1000)
+    include: List[Literal["embedding"]] = []
+    embedding_format: Literal["base64", "list"] = "base64"
+
+
+class CallBatchResponse(BaseModel):
+    items: List[CallDetail]
+    missing: List[str]
+
+
+class RecommendationBatchRequest(BaseModel):
+    call_ids: List[str] = Field(..., min_length=1, max_length=500)
+    k: int = Field(5, ge=1, le=50)
+    agent_id: Optional[str] = None
+    from_date: Optional[datetime] = None
+    to_date: Optional[datetime] = None
+    probes: Optional[int] = Field(None, ge=1, le=4096)
+    nudges: bool = False
+
+
+class RecommendationBatchItem(BaseModel):
+    call_id: str
+    recommendations: List[Recommendation] = []
+    error: Optional[str] = None
+
+
+class RecommendationBatchResponse(BaseModel):
+    items: List[RecommendationBatchItem]
+
+
+class IngestMessage(BaseModel):
+    # One tweet of the conversation, as in the support-tweet CSV
+    tweet_id: Union[int, str]
+    author_id: str
+    inbound: bool
+    created_at: str = Field(..., description='e.g. "Tue Oct 31 22:10:47 +0000 2017"')
+    text: str
+
+
+class IngestRequest(BaseModel):
+    messages: List[IngestMessage] = Field(..., min_length=1, max_length=500)
+
+
+class IngestResponse(BaseModel):
+    call_id: str
+    status: Literal["queued", "duplicate"]
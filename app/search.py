@@ -0,0 +1,129 @@
+import asyncio
+import os
+from collections import defaultdict
+
+from sqlalchemy import and_, func, literal_column, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.metrics import span
+from app.models import Call
+from app.pagination import decode_cursor, encode_cursor
+from app.schemas import SearchRequest
+from app.vector_index import VectorIndex
+from utils.ai_utils import compute_embeddings
+
+ENGLISH = literal_column("'english'::regconfig")
+HEADLINE_OPTIONS = "MaxWords=35, MinWords=15, MaxFragments=2, StartSel=<b>, StopSel=</b>"
+HYBRID_CANDIDATES = int(os.getenv("SEARCH_HYBRID_CANDIDATES", "100"))
+RRF_K = 60
+
+
+def _filters(req: SearchRequest) -> list:
+    filters = []
+    if req.agent_id:
+        filters.append(Call.agent_id == req.agent_id)
+    if req.from_date:
+        filters.append(Call.start_time >= req.from_date)
+    if req.to_date:
+        filters.append(Call.start_time <= req.to_date)
+    return filters
+
+
+def _page(rows: list, limit: int, key) -> dict:
+    items = rows[:limit]
+    next_cursor = encode_cursor(*key(items[-1])) if len(rows) > limit else None
+    return {"items": items, "next_cursor": next_cursor}
+
+
+async def lexical_search(session: AsyncSession, req: SearchRequest) -> dict:
+    """
+    Ranked full-text search: `websearch_to_tsquery` matched through the
+    transcript_tsv GIN index, ordered by `ts_rank_cd` with call_id as a
+    tie-break, keyset-paginated on (rank, call_id). Highlights are only
+    computed for the rows on the page.
+    """
+    tsq = func.websearch_to_tsquery(ENGLISH, req.query)
+    ranked = (
+        select(Call.call_id, Call.start_time, func.ts_rank_cd(Call.transcript_tsv, tsq).label("rank"))
+        .where(Call.transcript_tsv.bool_op("@@")(tsq), *_filters(req))
+        .subquery()
+    )
+    page = select(ranked.c.call_id, ranked.c.start_time, ranked.c.rank)
+    if req.cursor:
+        rank, call_id = decode_cursor(req.cursor, float, str)
+        page = page.where(or_(
+            ranked.c.rank < rank,
+            and_(ranked.c.rank == rank, ranked.c.call_id > call_id),
+        ))
+    page = page.order_by(ranked.c.rank.desc(), ranked.c.call_id).limit(req.limit + 1).subquery()
+
+    stmt = (
+        select(
+            Call.call_id, Call.agent_id, Call.start_time, page.c.rank,
+            func.ts_headline(ENGLISH, Call.transcript, tsq, HEADLINE_OPTIONS),
+        )
+        .join(page, and_(page.c.call_id == Call.call_id, page.c.start_time == Call.start_time))
+        .order_by(page.c.rank.desc(), page.c.call_id)
+    )
+    rows = [
+        {"call_id": cid, "agent_id": agent, "start_time": start, "score": rank, "snippet": snippet}
+        for cid, agent, start, rank, snippet in await session.execute(stmt)
+    ]
+    return _page(rows, req.limit, lambda r: (r["score"], r["call_id"]))
+
+
+async def hybrid_search(session: AsyncSession, req: SearchRequest, index: VectorIndex) -> dict:
+    """
+    Fuse the top lexical matches with the nearest embeddings of the query by
+    reciprocal rank fusion (score = sum of 1 / (RRF_K + rank)), so calls that
+    match on wording or on meaning both surface.
+    """
+    tsq = func.websearch_to_tsquery(ENGLISH, req.query)
+    lexical = (
+        select(Call.call_id)
+        .where(Call.transcript_tsv.bool_op("@@")(tsq), *_filters(req))
+        .order_by(func.ts_rank_cd(Call.transcript_tsv, tsq).desc(), Call.call_id)
+        .limit(HYBRID_CANDIDATES)
+    )
+    lexical_ids = (await session.execute(lexical)).scalars().all()
+
+    query_vec = await asyncio.to_thread(compute_embeddings, req.query)
+    try:
+        with span("vector_search"):
+            semantic = index.search(
+                query_vec, HYBRID_CANDIDATES,
+                agent_id=req.agent_id, from_date=req.from_date, to_date=req.to_date,
+            ) if query_vec else []
+    except ValueError:
+        # index built from a different embedding model/width
+        semantic = []
+
+    scores = defaultdict(float)
+    for rank, call_id in enumerate(lexical_ids):
+        scores[call_id] += 1.0 / (RRF_K + rank + 1)
+    for rank, (call_id, _) in enumerate(semantic):
+        scores[call_id] += 1.0 / (RRF_K + rank + 1)
+    fused = sorted(scores.items(), key=lambda x: (-x[1], x[0]))
+    if req.cursor:
+        score, call_id = decode_cursor(req.cursor, float, str)
+        fused = [(c, s) for c, s in fused if s < score or (s == score and c > call_id)]
+    fused = fused[: req.limit + 1]
+    if not fused:
+        return {"items": [], "next_cursor": None}
+
+    stmt = select(
+        Call.call_id, Call.agent_id, Call.start_time,
+        func.ts_headline(ENGLISH, Call.transcript, tsq, HEADLINE_OPTIONS),
+    ).where(Call.call_id.in_([c for c, _ in fused]))
+    details = {row[0]: row for row in await session.execute(stmt)}
+    rows = [
+        {
+            "call_id": call_id,
+            "agent_id": details[call_id][1],
+            "start_time": details[call_id][2],
+            "score": score,
+            "snippet": details[call_id][3],
+        }
+        for call_id, score in fused if call_id in details
+    ]
+    return _page(rows, req.limit, lambda r: (r["score"], r["call_id"]))
@@ -0,0 +1,38 @@
+from typing import Optional
+
+import numpy as np
+from sqlalchemy.types import LargeBinary, TypeDecorator
+
+
+class PackedVector(TypeDecorator):
+    """
+    Fixed-width float vector stored as raw little-endian bytes (`bytea`).
+
+    Values bind from any sequence or ndarray and load as a read-only NumPy view
+    over the fetched buffer via `np.frombuffer`, so reading an embedding never
+    builds per-element Python floats. `dtype` may be float32 (default) or
+    float16 for half the storage at some precision cost.
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def __init__(self, dim: Optional[int] = None, dtype: str = "float32"):
+        super().__init__()
+        self.dim = dim
+        self.dtype = np.dtype(dtype).newbyteorder("<")
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        vec = np.asarray(value, dtype=self.dtype)
+        if vec.ndim != 1:
+            raise ValueError(f"expected a 1-d vector, got shape {vec.shape}")
+        if self.dim is not None and vec.size != self.dim:
+            raise ValueError(f"expected {self.dim} dimensions, got {vec.size}")
+        return vec.tobytes()
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return np.frombuffer(value, dtype=self.dtype)
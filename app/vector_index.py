@@ -0,0 +1,418 @@
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from fastapi import Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db import SessionLocal, get_session
+from app.embedding_snapshot import Snapshot, current_generation, open_snapshot
+from app.embedding_store import EmbeddingStore, Row, normalise
+
+INDEX_BACKEND = os.getenv("VECTOR_INDEX_BACKEND", "ivf")
+INDEX_REFRESH_SECONDS = float(os.getenv("VECTOR_INDEX_REFRESH_SECONDS", "30"))
+IVF_LISTS = int(os.getenv("VECTOR_INDEX_IVF_LISTS", "0"))
+IVF_PROBES = int(os.getenv("VECTOR_INDEX_IVF_PROBES", "8"))
+SEARCH_BLOCK_ROWS = int(os.getenv("VECTOR_INDEX_BLOCK_ROWS", "65536"))
+# map the embedding snapshot (utils.build_embedding_snapshot) instead of loading every row
+INDEX_SNAPSHOT = os.getenv("VECTOR_INDEX_SNAPSHOT", "false").lower() == "true"
+
+
+class VectorIndex:
+    """
+    Cosine-similarity index over the rows of an EmbeddingStore.
+
+    Store rows are L2-normalised float32, so similarity is a dot product, and
+    the store's per-row agent and start time let searches be pre-filtered
+    without going back to the database.
+    """
+
+    name = "base"
+
+    def __init__(self, store: Optional[EmbeddingStore] = None):
+        self.store = store if store is not None else EmbeddingStore()
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def __contains__(self, call_id: str) -> bool:
+        return call_id in self.store
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self.store.vectors
+
+    def add(self, items: Iterable[Row]) -> int:
+        """Add (call_id, embedding, agent_id, start_time) rows, returning how many were indexed."""
+        start, block = self.store.add(items)
+        if len(block):
+            self._on_add(start, block)
+        return len(block)
+
+    async def refresh(self, session: AsyncSession) -> int:
+        """Pull newly inserted insights into the store and index them."""
+        start, block = await self.store.refresh(session)
+        if len(block):
+            self._on_add(start, block)
+        return len(block)
+
+    def _on_add(self, start: int, block: np.ndarray):
+        pass
+
+    def _on_load(self):
+        """Called once the store's snapshot rows are in place, which `_on_add` never sees."""
+
+    def get_vector(self, call_id: str) -> Optional[np.ndarray]:
+        return self.store.get_vector(call_id)
+
+    def _candidates(self, query: np.ndarray, probes: Optional[int]) -> Optional[np.ndarray]:
+        """Rows to score for `query`; None means every row."""
+        return None
+
+    def search(
+        self,
+        query: Iterable[float],
+        k: int = 5,
+        *,
+        exclude: Optional[str] = None,
+        agent_id: Optional[str] = None,
+        from_date: Optional[datetime] = None,
+        to_date: Optional[datetime] = None,
+        probes: Optional[int] = None,
+    ) -> List[Tuple[str, float]]:
+        store = self.store
+        if not len(store):
+            return []
+        q = normalise(np.asarray(query, dtype=np.float32).reshape(1, -1))[0]
+        if q.size != store.dim:
+            raise ValueError(f"query has {q.size} dimensions, index has {store.dim}")
+
+        mask = store.filter_mask(agent_id, from_date, to_date)
+        excluded = store.row(exclude) if exclude is not None else None
+        if excluded is not None:
+            if mask is None:
+                mask = np.ones(len(store), dtype=bool)
+            mask[excluded] = False
+
+        rows = self._candidates(q, probes)
+        if rows is None:
+            rows = np.flatnonzero(mask) if mask is not None else None
+        elif mask is not None:
+            rows = rows[mask[rows]]
+
+        if rows is None:
+            scores = store.matmul(q)
+            rows = np.arange(len(store))
+        else:
+            if rows.size == 0:
+                return []
+            scores = store.take(rows) @ q
+
+        k = min(k, scores.size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(store.call_id(rows[i]), float(scores[i])) for i in top]
+
+    def search_many(
+        self,
+        queries: np.ndarray,
+        k: int = 5,
+        *,
+        exclude: Optional[Sequence[Optional[str]]] = None,
+        agent_id: Optional[str] = None,
+        from_date: Optional[datetime] = None,
+        to_date: Optional[datetime] = None,
+        probes: Optional[int] = None,
+    ) -> List[List[Tuple[str, float]]]:
+        """
+        `search` for a batch of queries: candidates are scored against all
+        queries at once as (rows x queries) matrix products, SEARCH_BLOCK_ROWS
+        rows at a time, keeping a running top-k per query. Approximate
+        backends score the union of the queries' probed lists, so each query
+        sees at least the rows `search` would give it. `exclude[j]` is left out
+        of query j's results.
+        """
+        store = self.store
+        queries = np.asarray(queries, dtype=np.float32)
+        m = queries.shape[0]
+        if not len(store) or not m:
+            return [[] for _ in range(m)]
+        Q = normalise(queries.reshape(m, -1))
+        if Q.shape[1] != store.dim:
+            raise ValueError(f"queries have {Q.shape[1]} dimensions, index has {store.dim}")
+
+        mask = store.filter_mask(agent_id, from_date, to_date)
+        candidates = [self._candidates(q, probes) for q in Q]
+        if all(c is not None for c in candidates):
+            rows = np.unique(np.concatenate(candidates))
+            if mask is not None:
+                rows = rows[mask[rows]]
+        else:
+            rows = np.flatnonzero(mask) if mask is not None else np.arange(len(store))
+        if rows.size == 0:
+            return [[] for _ in range(m)]
+
+        excluded = np.full(m, -1, dtype=np.int64)
+        for j, call_id in enumerate(exclude or ()):
+            row = store.row(call_id) if call_id is not None else None
+            if row is not None:
+                excluded[j] = row
+
+        # one spare slot per query so an excluded row can't cost a result
+        wanted = k
+        k = min(k + bool((excluded >= 0).any()), rows.size)
+        cols = np.arange(m)
+        best_rows = np.empty((0, m), dtype=np.int64)
+        best_scores = np.empty((0, m), dtype=np.float32)
+        for start in range(0, rows.size, SEARCH_BLOCK_ROWS):
+            block = rows[start:start + SEARCH_BLOCK_ROWS]
+            scores = store.take(block) @ Q.T
+            scores[block[:, None] == excluded[None, :]] = -np.inf
+            kk = min(k, block.size)
+            top = np.argpartition(-scores, kk - 1, axis=0)[:kk]
+            best_rows = np.concatenate([best_rows, block[top]])
+            best_scores = np.concatenate([best_scores, scores[top, cols]])
+            if best_rows.shape[0] > k:
+                keep = np.argpartition(-best_scores, k - 1, axis=0)[:k]
+                best_rows, best_scores = best_rows[keep, cols], best_scores[keep, cols]
+
+        order = np.argsort(-best_scores, axis=0, kind="stable")
+        best_rows, best_scores = best_rows[order, cols], best_scores[order, cols]
+        return [
+            [
+                (store.call_id(r), float(s))
+                for r, s in zip(best_rows[:, j], best_scores[:, j])
+                if s != -np.inf
+            ][:wanted]
+            for j in range(m)
+        ]
+
+
+class BruteForceIndex(VectorIndex):
+    """Exact search: one matrix-vector product over every row."""
+
+    name = "exact"
+
+
+class IVFIndex(VectorIndex):
+    """
+    Inverted-file index: rows are bucketed by their nearest k-means centroid and
+    a query only scores the `probes` closest buckets. More probes trade latency
+    for recall; probing every list is equivalent to exact search.
+
+    Until enough rows exist to train the quantiser it behaves like exact search.
+    The quantiser is retrained whenever the index has doubled since the last
+    fit; on the event loop the fit runs in a worker thread and searches keep
+    using the previous quantiser until the new one is swapped in.
+    """
+
+    name = "ivf"
+    min_train_rows = 1024
+
+    def __init__(
+        self,
+        store: Optional[EmbeddingStore] = None,
+        n_lists: int = 0,
+        probes: int = IVF_PROBES,
+    ):
+        super().__init__(store)
+        self.n_lists = n_lists
+        self.probes = probes
+        self.centroids: Optional[np.ndarray] = None
+        self._lists: List[List[np.ndarray]] = []
+        self._trained_on = 0
+        self._training: Optional[asyncio.Task] = None
+
+    def _on_add(self, start: int, block: np.ndarray):
+        if self.centroids is not None:
+            self._assign(start, block)
+        n = len(self)
+        if n >= self.min_train_rows and (self.centroids is None or n >= 2 * self._trained_on):
+            self._retrain()
+
+    def _on_load(self):
+        if len(self) >= self.min_train_rows:
+            self.train()
+
+    def _assign(self, start: int, block: np.ndarray):
+        assign = np.argmax(block @ self.centroids.T, axis=1)
+        rows = np.arange(start, start + block.shape[0])
+        for lst in np.unique(assign):
+            self._lists[lst].append(rows[assign == lst])
+
+    def _retrain(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.train()
+            return
+        if self._training is None or self._training.done():
+            self._training = loop.create_task(self._train_in_thread())
+
+    async def _train_in_thread(self):
+        try:
+            # the parts are taken here so the fit only sees rows present now
+            fitted = await asyncio.to_thread(self._fit, len(self), self.store.parts())
+        except Exception as e:
+            print(f"[WARN] Retraining the IVF quantiser failed: {e!r}")
+            return
+        self._install(*fitted)
+
+    def train(self, iterations: int = 10, seed: int = 0):
+        self._install(*self._fit(len(self), self.store.parts(), iterations, seed))
+
+    def _fit(
+        self, n: int, parts: List[Tuple[int, np.ndarray]], iterations: int = 10, seed: int = 0
+    ) -> Tuple[np.ndarray, List[List[np.ndarray]], int]:
+        """Centroids and lists for the first `n` rows; touches no index state."""
+        n_lists = self.n_lists or max(1, int(np.sqrt(n)))
+        rng = np.random.default_rng(seed)
+        sample = self.store.take(rng.choice(n, size=min(n, n_lists * 64), replace=False))
+        centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(n_lists):
+                members = sample[assign == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            centroids = normalise(centroids)
+
+        # per part, so snapshot rows are read straight from the mapping
+        assign = np.concatenate([np.argmax(m @ centroids.T, axis=1) for _, m in parts])[:n]
+        order = np.argsort(assign, kind="stable")
+        bounds = np.searchsorted(assign[order], np.arange(n_lists + 1))
+        return centroids, [[order[bounds[c] : bounds[c + 1]]] for c in range(n_lists)], n
+
+    def _install(self, centroids: np.ndarray, lists: List[List[np.ndarray]], trained_on: int):
+        # no await in here, so searches see either the old quantiser or the new one
+        self.centroids, self._lists, self._trained_on = centroids, lists, trained_on
+        if len(self) > trained_on:
+            # rows added while the fit ran
+            self._assign(trained_on, self.store.take(np.arange(trained_on, len(self))))
+
+    def _candidates(self, query: np.ndarray, probes: Optional[int]) -> Optional[np.ndarray]:
+        if self.centroids is None:
+            return None
+        probes = min(probes or self.probes, len(self.centroids))
+        if probes >= len(self.centroids):
+            return None
+        nearest = np.argpartition(-(self.centroids @ query), probes - 1)[:probes]
+        parts = [part for c in nearest for part in self._lists[c]]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+
+BACKENDS = {
+    BruteForceIndex.name: BruteForceIndex,
+    IVFIndex.name: IVFIndex,
+}
+
+
+def make_index(backend: str = INDEX_BACKEND, store: Optional[EmbeddingStore] = None) -> VectorIndex:
+    try:
+        cls = BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown vector index backend {backend!r}; expected one of {sorted(BACKENDS)}")
+    if cls is IVFIndex:
+        return IVFIndex(store, n_lists=IVF_LISTS)
+    return cls(store)
+
+
+async def build_index(
+    session: AsyncSession, backend: str = INDEX_BACKEND, snapshot: Optional[Snapshot] = None
+) -> VectorIndex:
+    """
+    An index over every insight. With a snapshot, its rows are mapped rather
+    than loaded and only insights created since it was built are read.
+    """
+    index = make_index(backend, EmbeddingStore(snapshot=snapshot) if snapshot is not None else None)
+    if len(index):
+        await asyncio.to_thread(index._on_load)
+    await index.refresh(session)
+    return index
+
+
+def _open_snapshot() -> Optional[Snapshot]:
+    if not INDEX_SNAPSHOT:
+        return None
+    snapshot = open_snapshot()
+    if snapshot is None:
+        print("[WARN] VECTOR_INDEX_SNAPSHOT is set but no embedding snapshot exists yet; loading from the database")
+    return snapshot
+
+
+_index: Optional[VectorIndex] = None
+_index_lock = asyncio.Lock()
+# background refreshes; the loop only keeps weak references to tasks
+_refreshes: set = set()
+
+
+async def get_vector_index(session: AsyncSession = Depends(get_session)) -> VectorIndex:
+    """
+    FastAPI dependency returning the process-wide index. The store is loaded on
+    first use (or by `load_index` at startup) and then refreshed incrementally
+    in the background every VECTOR_INDEX_REFRESH_SECONDS, so rows inserted by
+    other processes are picked up without a full reload. With
+    VECTOR_INDEX_SNAPSHOT, the refresh also swaps to a newer snapshot
+    generation when one has been published.
+    """
+    global _index
+    if _index is None:
+        async with _index_lock:
+            if _index is None:
+                _index = await build_index(session, snapshot=_open_snapshot())
+    elif _is_stale(_index) and not _index_lock.locked():
+        task = asyncio.create_task(_refresh())
+        _refreshes.add(task)
+        task.add_done_callback(_refresh_done)
+    return _index
+
+
+async def load_index() -> VectorIndex:
+    global _index
+    async with _index_lock:
+        if _index is None:
+            async with SessionLocal() as session:
+                _index = await build_index(session, snapshot=_open_snapshot())
+    return _index
+
+
+def current_index() -> Optional[VectorIndex]:
+    return _index
+
+
+def _is_stale(index: VectorIndex) -> bool:
+    refreshed = index.store.refreshed_at
+    return refreshed is None or time.time() - refreshed > INDEX_REFRESH_SECONDS
+
+
+async def _refresh():
+    global _index
+    async with _index_lock:
+        if _index is None or not _is_stale(_index):
+            return
+        generation = current_generation() if INDEX_SNAPSHOT else None
+        async with SessionLocal() as session:
+            if generation is not None and generation != _index.store.generation:
+                # Swap to the new generation; requests already holding the old
+                # index finish on it and its mapping goes when they're done
+                _index = await build_index(session, _index.name, snapshot=open_snapshot())
+                print(f"[INFO] Vector index now maps embedding snapshot generation {_index.store.generation}")
+            else:
+                await _index.refresh(session)
+
+
+def _refresh_done(task: asyncio.Task):
+    _refreshes.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        print(f"[WARN] Vector index refresh failed: {task.exception()!r}")
+
+
+def index_insights(rows: Iterable[Row]) -> int:
+    """Keep the in-process index in sync after inserting insights."""
+    if _index is None:
+        return 0
+    return _index.add(rows)
+
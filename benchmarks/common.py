@@ -0,0 +1,81 @@
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Optional
+
+RESULTS_DIR = Path(os.getenv("BENCH_RESULTS_DIR", "benchmarks/results"))
+
+
+def git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip()
+
+
+def environment() -> dict:
+    import numpy as np
+
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+
+
+def timeit(fn: Callable[[], object], items: int, repeat: int = 5, warmup: int = 1) -> dict:
+    """
+    Run `fn` `warmup` + `repeat` times; `items` is how much work one run does,
+    for throughput. Reports the median run (robust to the odd slow one).
+    """
+    for _ in range(warmup):
+        fn()
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - started)
+    median = statistics.median(runs)
+    return {
+        "items": items,
+        "repeat": repeat,
+        "seconds_median": median,
+        "seconds_min": min(runs),
+        "items_per_second": items / median if median else None,
+    }
+
+
+def percentiles(samples: list[float], points=(50, 90, 99)) -> dict:
+    if not samples:
+        return {f"p{p}": None for p in points}
+    ordered = sorted(samples)
+    return {
+        f"p{p}": ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+        for p in points
+    }
+
+
+def write_results(kind: str, results: dict, params: dict, output: Optional[Path] = None) -> Path:
+    """Write {"kind", "env", "params", "results"} as JSON, named by suite and commit unless `output` is given."""
+    env = environment()
+    if output is None:
+        stamp = env["timestamp"].replace(":", "").replace("-", "")[:15]
+        output = RESULTS_DIR / f"{kind}-{env['commit'] or 'nogit'}-{stamp}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(
+        {"kind": kind, "env": env, "params": params, "results": results}, indent=2
+    ))
+    print(f"[INFO] Wrote {output}", file=sys.stderr)
+    return output
@@ -0,0 +1,59 @@
+import argparse
+import json
+import sys
+from pathlib import Path
+
+# metric -> True when bigger is better
+METRICS = {
+    "items_per_second": True,
+    "requests_per_second": True,
+    "latency_seconds.p50": False,
+    "latency_seconds.p99": False,
+}
+
+
+def _get(result: dict, dotted: str):
+    for part in dotted.split("."):
+        if not isinstance(result, dict) or part not in result:
+            return None
+        result = result[part]
+    return result
+
+
+def compare(base: dict, head: dict, threshold: float) -> list[dict]:
+    """Relative change of every shared metric; `regression` when it moved the wrong way by more than `threshold`."""
+    rows = []
+    for name in sorted(set(base["results"]) & set(head["results"])):
+        for metric, higher_is_better in METRICS.items():
+            old, new = _get(base["results"][name], metric), _get(head["results"][name], metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            rows.append({
+                "benchmark": name,
+                "metric": metric,
+                "base": old,
+                "head": new,
+                "change": change,
+                "regression": worse > threshold,
+            })
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("base", type=Path)
+    parser.add_argument("head", type=Path)
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative slowdown that counts as a regression")
+    args = parser.parse_args()
+
+    base, head = json.loads(args.base.read_text()), json.loads(args.head.read_text())
+    if base["kind"] != head["kind"]:
+        raise SystemExit(f"Can't compare a {base['kind']} run with a {head['kind']} run")
+    print(f"{base['kind']}: {base['env']['commit']} -> {head['env']['commit']}")
+    rows = compare(base, head, args.threshold)
+    for r in rows:
+        flag = "REGRESSION" if r["regression"] else ""
+        print(f"{r['benchmark']:28s} {r['metric']:22s} {r['base']:12.4g} -> {r['head']:12.4g} {r['change']:+7.1%} {flag}")
+    sys.exit(1 if any(r["regression"] for r in rows) else 0)
@@ -0,0 +1,90 @@
+import argparse
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Measure the models, not the result cache
+os.environ.setdefault("INSIGHT_CACHE", "off")
+
+from benchmarks.common import timeit, write_results  # noqa: E402
+from benchmarks.micro import transcripts  # noqa: E402
+
+
+def embedding_parity(reference: np.ndarray, candidate: np.ndarray) -> dict:
+    """Per-sentence cosine similarity between two embedding matrices."""
+    cos = (reference * candidate).sum(axis=1) / (
+        np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1)
+    )
+    return {"cosine_min": float(cos.min()), "cosine_mean": float(cos.mean())}
+
+
+def sentiment_parity(reference: list[dict], candidate: list[dict]) -> dict:
+    same = [r["label"] == c["label"] for r, c in zip(reference, candidate)]
+    drift = [abs(r["score"] - c["score"]) for r, c in zip(reference, candidate)]
+    return {"label_agreement": sum(same) / len(same), "score_drift_max": max(drift)}
+
+
+def main(args) -> tuple[dict, bool]:
+    from utils.ai_utils import (
+        EMBED_MODEL_NAME, SENT_MODEL_ID, _torch_embedder, _torch_sentiment, split_sentences,
+    )
+    from utils.onnx_models import load
+
+    texts = transcripts(args.texts)
+    sentences = list(dict.fromkeys(s for t in texts for s in split_sentences(t)))[:args.sentences]
+    snippets = [t[:512] for t in texts]
+    variants = {"torch": None, "onnx_fp32": False, "onnx_int8": True}
+
+    results, ok = {}, True
+    reference_emb = reference_sent = None
+    for name, quantized in variants.items():
+        if quantized is None:
+            embedder, classifier = _torch_embedder(), _torch_sentiment()
+        else:
+            embedder = load("embed", EMBED_MODEL_NAME, args.model_dir, quantized)
+            classifier = load("sentiment", SENT_MODEL_ID, args.model_dir, quantized)
+
+        embed = lambda: embedder.encode(sentences, batch_size=args.batch_size, show_progress_bar=False)
+        classify = lambda: classifier(snippets, batch_size=args.batch_size)
+        emb, sent = np.asarray(embed()), classify()
+        results[f"embeddings_{name}"] = timeit(embed, len(sentences), args.repeat)
+        results[f"sentiment_{name}"] = timeit(classify, len(snippets), args.repeat)
+
+        if quantized is None:
+            reference_emb, reference_sent = emb, sent
+            continue
+        emb_parity = embedding_parity(reference_emb, emb)
+        sent_parity = sentiment_parity(reference_sent, sent)
+        results[f"embeddings_{name}"].update(emb_parity)
+        results[f"sentiment_{name}"].update(sent_parity)
+        if emb_parity["cosine_min"] < args.min_cosine or sent_parity["label_agreement"] < 1.0:
+            print(f"[WARN] {name} is not at parity with torch: {emb_parity} {sent_parity}", file=sys.stderr)
+            ok = False
+    return results, ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Parity and throughput of the ONNX Runtime backends (fp32, int8) against torch."
+    )
+    parser.add_argument("--texts", type=int, default=512, help="synthetic transcripts (sentiment inputs)")
+    parser.add_argument("--sentences", type=int, default=2048, help="distinct sentences to embed")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--min-cosine", type=float, default=0.99,
+                        help="lowest acceptable per-sentence cosine similarity to torch")
+    parser.add_argument("--model-dir", type=Path, default=Path(os.getenv("ONNX_MODEL_DIR", "models/onnx")),
+                        help="exported models; missing ones are exported first")
+    parser.add_argument("--output", type=Path, help="result file (default: benchmarks/results/inference-<commit>-<time>.json)")
+    args = parser.parse_args()
+
+    results, ok = main(args)
+    for name, r in results.items():
+        parity = {k: round(v, 4) for k, v in r.items() if k.startswith(("cosine", "label", "score"))}
+        print(f"{name:24s} {r['items_per_second']:10.1f} items/sec  {parity or ''}")
+    write_results("inference", results, vars(args) | {
+        "model_dir": str(args.model_dir), "output": str(args.output) if args.output else None,
+    }, args.output)
+    sys.exit(0 if ok else 1)
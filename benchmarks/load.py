@@ -0,0 +1,122 @@
+import argparse
+import asyncio
+import random
+import time
+from pathlib import Path
+
+import httpx
+
+from benchmarks.common import percentiles, write_results
+
+API = "/api/v1"
+SCENARIOS = {
+    "list_calls": lambda ids, rng: f"{API}/calls?limit=20&total=estimate",
+    "get_call": lambda ids, rng: f"{API}/calls/{rng.choice(ids)}",
+    "get_recommendations": lambda ids, rng: f"{API}/calls/{rng.choice(ids)}/recommendations?k=5",
+    "agents_leaderboard": lambda ids, rng: f"{API}/analytics/agents",
+}
+
+
+async def sample_call_ids(client: httpx.AsyncClient, count: int) -> list[str]:
+    """Walk list_calls with its cursor until `count` ids have been seen."""
+    ids, cursor = [], None
+    while len(ids) < count:
+        params = {"limit": 100, "total": "none", "fields": "call_id"}
+        if cursor:
+            params["cursor"] = cursor
+        page = (await client.get(f"{API}/calls", params=params)).raise_for_status().json()
+        ids.extend(item["call_id"] for item in page["items"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    return ids[:count]
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    path_for,
+    ids: list[str],
+    requests: int,
+    concurrency: int,
+    seed: int,
+    cache_bust: bool,
+) -> dict:
+    """
+    Issue `requests` GETs from `concurrency` workers and report latency
+    percentiles, throughput and how many responses the API served from its
+    response cache (X-Cache: hit). `cache_bust` makes every URL unique.
+    """
+    rng = random.Random(seed)
+    paths = [path_for(ids, rng) for _ in range(requests)]
+    if cache_bust:
+        paths = [f"{p}{'&' if '?' in p else '?'}_bench={i}" for i, p in enumerate(paths)]
+    latencies, statuses, hits = [], {}, 0
+    pending = iter(paths)
+
+    async def worker():
+        nonlocal hits
+        for path in pending:
+            started = time.perf_counter()
+            try:
+                response = await client.get(path)
+                status = str(response.status_code)
+                hits += response.headers.get("x-cache") == "hit"
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "seconds": elapsed,
+        "requests_per_second": requests / elapsed if elapsed else None,
+        "latency_seconds": {
+            **percentiles(latencies),
+            "mean": sum(latencies) / len(latencies) if latencies else None,
+            "max": max(latencies, default=None),
+        },
+        "statuses": statuses,
+        "errors": sum(n for s, n in statuses.items() if not s.startswith("2")),
+        "cache_hit_ratio": hits / requests if requests else None,
+    }
+
+
+async def main(args) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        ids = await sample_call_ids(client, args.sample_ids)
+        if not ids:
+            raise SystemExit("No calls to query; load some with `python -m benchmarks.synthetic db` first.")
+        results = {}
+        for name in args.scenarios:
+            results[name] = await run_scenario(
+                client, SCENARIOS[name], ids, args.requests, args.concurrency, args.seed, args.cache_bust
+            )
+            r = results[name]
+            print(
+                f"{name:22s} {r['requests_per_second']:8.1f} req/s  "
+                f"p50 {r['latency_seconds']['p50'] * 1000:7.1f} ms  "
+                f"p99 {r['latency_seconds']['p99'] * 1000:7.1f} ms  errors {r['errors']}"
+            )
+        return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the read endpoints of a running API.")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=2000, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--sample-ids", type=int, default=1000, help="call ids to draw get_call/recommendation targets from")
+    parser.add_argument("--cache-bust", action="store_true", help="unique query string per request, to measure uncached latency")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="result file (default: benchmarks/results/load-<commit>-<time>.json)")
+    args = parser.parse_args()
+
+    results = asyncio.run(main(args))
+    write_results("load", results, vars(args) | {"output": str(args.output) if args.output else None}, args.output)
@@ -0,0 +1,83 @@
+import argparse
+import os
+import sys
+from pathlib import Path
+
+# Measure the models, not the result cache
+os.environ.setdefault("INSIGHT_CACHE", "off")
+
+from benchmarks.common import timeit, write_results  # noqa: E402
+from benchmarks.synthetic import generate_tweets  # noqa: E402
+
+
+def bench_ingest(conversations: int, repeat: int) -> dict:
+    from app.conversations import build_call
+    from utils.ingest import normalize_conversations
+
+    df = generate_tweets(conversations)
+    threads = normalize_conversations(df)
+    return {
+        "normalize_conversations": {
+            "tweets": len(df),
+            **timeit(lambda: normalize_conversations(df), len(threads), repeat),
+        },
+        "build_call": timeit(lambda: [build_call(t) for t in threads], len(threads), repeat),
+    }
+
+
+def transcripts(n: int) -> list[str]:
+    from app.conversations import build_call
+    from utils.ingest import normalize_conversations
+
+    calls = [build_call(t) for t in normalize_conversations(generate_tweets(n))]
+    # suffix each one so the batch helpers can't collapse repeated sentences
+    return [f"{c['transcript']}\nCustomer ({c['customer_id']}): ref {i}" for i, c in enumerate(calls)]
+
+
+def bench_features(texts: list[str], repeat: int) -> dict:
+    from utils.features import extract_features
+
+    return timeit(lambda: extract_features(texts), len(texts), repeat)
+
+
+def bench_models(texts: list[str], repeat: int) -> dict:
+    """Embedding and sentiment throughput; skipped (with the reason) when the models can't load."""
+    from utils.ai_utils import MODELS, compute_embeddings_batch, compute_sentiment_batch
+
+    results = {}
+    for name, model, fn in (
+        ("embeddings", "embed", compute_embeddings_batch),
+        ("sentiment", "sentiment", compute_sentiment_batch),
+    ):
+        try:
+            MODELS.get(model)
+        except Exception as e:
+            print(f"[WARN] Skipping {name}: {e!r}", file=sys.stderr)
+            results[name] = {"skipped": repr(e)}
+            continue
+        results[name] = {
+            "load_seconds": MODELS.load_seconds.get(model),
+            **timeit(lambda: fn(texts), len(texts), repeat),
+        }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for ingest parsing and insight extraction.")
+    parser.add_argument("--conversations", type=int, default=10_000, help="synthetic conversations for the parsing benchmarks")
+    parser.add_argument("--model-calls", type=int, default=512, help="transcripts for the embedding/sentiment benchmarks")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--skip-models", action="store_true", help="don't load the embedding/sentiment models")
+    parser.add_argument("--output", type=Path, help="result file (default: benchmarks/results/micro-<commit>-<time>.json)")
+    args = parser.parse_args()
+
+    results = bench_ingest(args.conversations, args.repeat)
+    results["extract_features"] = bench_features(transcripts(args.conversations), args.repeat)
+    if not args.skip_models:
+        # model runs are slow; one timed pass after the warm-up is enough
+        results.update(bench_models(transcripts(args.model_calls), max(1, args.repeat // 5)))
+
+    for name, r in results.items():
+        rate = r.get("items_per_second")
+        print(f"{name:28s} " + (f"{rate:12.0f} items/sec" if rate else r.get("skipped", "")))
+    write_results("micro", results, vars(args) | {"output": str(args.output) if args.output else None}, args.output)
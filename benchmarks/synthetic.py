@@ -0,0 +1,186 @@
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+CUSTOMER_LINES = [
+    "my order still hasn't arrived and it's been two weeks",
+    "um I was charged twice for the same subscription",
+    "the app keeps crashing when I try to log in",
+    "can you help me reset my password please",
+    "you know I've been waiting on hold for an hour",
+    "like why is my refund not processed yet",
+    "the package was delivered to the wrong address",
+    "hmm my card was declined but the payment went through",
+    "I want to cancel my plan before the renewal date",
+    "thanks that fixed it, appreciate the quick help",
+]
+AGENT_LINES = [
+    "sorry to hear that, could you DM us your order number",
+    "thanks for reaching out, we're looking into this for you",
+    "I've issued a refund, it should show in 3-5 business days",
+    "please try reinstalling the latest version and let us know",
+    "um I can see the duplicate charge and have reversed it",
+    "we've sent a password reset link to your registered email",
+    "I've escalated this to our delivery team for an update",
+    "your plan is cancelled and you won't be billed again",
+    "happy to help, is there anything else we can do",
+    "like I mentioned, the fix is rolling out this week",
+]
+EPOCH = datetime(2017, 1, 1)
+TWITTER_FORMAT = "%a %b %d %H:%M:%S +0000 %Y"
+
+
+def generate_tweets(
+    n_conversations: int,
+    seed: int = 0,
+    first_conversation: int = 0,
+    agents: int = 50,
+    max_turns: int = 6,
+    shuffle: bool = False,
+) -> pd.DataFrame:
+    """
+    Tweets in the shape of the Twitter customer-support dump (twcs.csv):
+    each conversation is a reply chain that a customer opens and agent and
+    customer alternate on, 2..max_turns tweets long. As in the dump, replies
+    are listed before the tweets they answer, so every conversation threads
+    into exactly one call; `shuffle` scatters the rows instead, which yields
+    one call per agent reply. Ids are derived from `first_conversation`, so
+    consecutive chunks never collide.
+    """
+    rng = np.random.default_rng(seed + first_conversation)
+    n = n_conversations
+    turns = rng.integers(2, max_turns + 1, size=n)
+    total = int(turns.sum())
+    conv = np.repeat(np.arange(n), turns)
+    pos = np.arange(total) - np.repeat(np.cumsum(turns) - turns, turns)
+
+    tweet_id = first_conversation * max_turns + 1 + np.arange(total)
+    inbound = pos % 2 == 0
+    last = pos == turns[conv] - 1
+    agent = rng.integers(0, agents, size=n)[conv]
+    customer = 100_000 + first_conversation + conv
+
+    gaps = np.where(pos == 0, 0, rng.integers(30, 900, size=total)).cumsum()
+    elapsed = gaps - np.repeat(gaps[np.cumsum(turns) - turns], turns)
+    started = rng.integers(0, 365 * 86400, size=n)[conv]
+    created = pd.to_datetime(EPOCH) + pd.to_timedelta(started + elapsed, unit="s")
+    customer_text = np.array(CUSTOMER_LINES)[rng.integers(0, len(CUSTOMER_LINES), size=total)]
+    agent_text = np.array(AGENT_LINES)[rng.integers(0, len(AGENT_LINES), size=total)]
+
+    df = pd.DataFrame({
+        "tweet_id": tweet_id,
+        "author_id": np.where(inbound, customer.astype(str), np.char.add("SupportCo", agent.astype(str))),
+        "inbound": inbound,
+        "created_at": created.strftime(TWITTER_FORMAT),
+        "text": np.where(inbound, customer_text, agent_text),
+        "response_tweet_id": np.where(last, np.nan, tweet_id + 1),
+        "in_response_to_tweet_id": np.where(pos == 0, np.nan, tweet_id - 1),
+    })
+    if shuffle:
+        return df.sample(frac=1, random_state=seed).reset_index(drop=True)
+    return df.iloc[np.lexsort((-pos, conv))].reset_index(drop=True)
+
+
+def write_csv(path: Path, n_conversations: int, seed: int = 0, chunk: int = 100_000) -> int:
+    """Write `n_conversations` to `path` `chunk` at a time; returns the tweet count."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    rows = 0
+    for first in range(0, n_conversations, chunk):
+        df = generate_tweets(min(chunk, n_conversations - first), seed, first_conversation=first)
+        df.to_csv(path, mode="w" if first == 0 else "a", header=first == 0, index=False)
+        rows += len(df)
+    return rows
+
+
+def generate_calls(
+    n_calls: int, dim: int = 384, seed: int = 0, batch: int = 10_000, agents: int = 50
+) -> Iterator[tuple[list[dict], list[dict]]]:
+    """
+    (calls_db rows, call_insights rows) batches with random unit embeddings,
+    ready for copy_insert, so the API can be loaded without running a model.
+    """
+    for first in range(0, n_calls, batch):
+        rng = np.random.default_rng(seed + first)
+        n = min(batch, n_calls - first)
+        emb = rng.standard_normal((n, dim)).astype(np.float32)
+        emb /= np.linalg.norm(emb, axis=1, keepdims=True)
+        agent = rng.integers(0, agents, size=n)
+        starts = rng.integers(0, 365 * 86400, size=n)
+        durations = rng.integers(30, 3600, size=n)
+        sentiment = rng.uniform(-1, 1, size=n)
+        ratio = rng.uniform(0, 1, size=n)
+        lines = rng.integers(0, len(CUSTOMER_LINES), size=(n, 2))
+        start_times = [EPOCH + timedelta(seconds=int(s)) for s in starts]
+        calls, insights = [], []
+        for i in range(n):
+            call_id = f"syn{first + i:09d}"
+            calls.append({
+                "call_id": call_id,
+                "agent_id": f"SupportCo{agent[i]}",
+                "customer_id": str(100_000 + first + i),
+                "language": "en",
+                "start_time": start_times[i],
+                "duration_seconds": int(durations[i]),
+                "transcript": (
+                    f"Customer ({100_000 + first + i}): {CUSTOMER_LINES[lines[i, 0]]}\n"
+                    f"Agent (SupportCo{agent[i]}): {AGENT_LINES[lines[i, 1]]}"
+                ),
+            })
+            insights.append({
+                "call_id": call_id,
+                "start_time": start_times[i],
+                "embedding": emb[i],
+                "customer_sentiment": float(sentiment[i]),
+                "agent_talk_ratio": float(ratio[i]),
+            })
+        yield calls, insights
+
+
+async def load_db(n_calls: int, dim: int = 384, seed: int = 0, batch: int = 10_000):
+    """Insert synthetic calls and insights (and their rollups) into the configured database."""
+    from app.bulk import copy_insert
+    from app.cache import invalidate
+    from app.db import SessionLocal, dispose_engines
+    from app.models import Call, CallInsight
+    from app.partitions import ensure_partitions
+    from app.rollups import apply_rollups
+
+    done, started = 0, time.perf_counter()
+    for calls, insights in generate_calls(n_calls, dim, seed, batch):
+        await ensure_partitions(c["start_time"] for c in calls)
+        async with SessionLocal() as session:
+            async with session.begin():
+                await copy_insert(session, Call, calls)
+                result = await copy_insert(session, CallInsight, insights, returning="call_id")
+                await apply_rollups(session, result.keys)
+        done += len(calls)
+        print(f"[INFO] Loaded {done}/{n_calls} calls ({done / (time.perf_counter() - started):.0f}/sec)")
+    await invalidate("insights")
+    await dispose_engines()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic support conversations for benchmarks.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    csv = sub.add_parser("csv", help="write a twcs-shaped CSV for utils.ingest")
+    csv.add_argument("output", type=Path)
+    csv.add_argument("--conversations", type=int, default=10_000)
+    csv.add_argument("--seed", type=int, default=0)
+    db = sub.add_parser("db", help="insert pre-embedded calls and insights into the database")
+    db.add_argument("--calls", type=int, default=10_000)
+    db.add_argument("--dim", type=int, default=384)
+    db.add_argument("--seed", type=int, default=0)
+    db.add_argument("--batch", type=int, default=10_000)
+    args = parser.parse_args()
+
+    if args.command == "csv":
+        rows = write_csv(args.output, args.conversations, args.seed)
+        print(f"Wrote {rows} tweets ({args.conversations} conversations) to {args.output}.")
+    else:
+        asyncio.run(load_db(args.calls, args.dim, args.seed, args.batch))
@@ -1,7 +1,48 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
-from app.routes import calls, analytics
+from app.routes import calls, analytics, metrics
+from app.db import dispose_engines, init_db
+from app.insight_worker import get_insight_worker
+from app.metrics import MetricsMiddleware
+from app.nudges import close_nudge_service
+from app.partitions import ensure_future_partitions
+from app.vector_index import load_index
+from utils.ai_utils import MODELS
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await init_db()
+    # Partitions for the coming months, so ingest rarely has to create one
+    try:
+        await ensure_future_partitions()
+    except Exception as e:
+        print(f"[WARN] Creating calls_db/call_insights partitions failed (is the schema migrated?): {e!r}")
+    # Load embeddings once per worker so the first recommendation request
+    # doesn't pay for it
+    if os.getenv("EMBEDDING_STORE_PRELOAD", "true").lower() == "true":
+        await load_index()
+    # Models load on first use; MODEL_WARMUP=embed,sentiment loads them here instead
+    warmup = [name for name in os.getenv("MODEL_WARMUP", "").split(",") if name]
+    if warmup:
+        await asyncio.to_thread(MODELS.warm, *warmup)
+    # Computes insights for calls posted to POST /api/v1/calls
+    worker_enabled = os.getenv("INSIGHT_WORKER", "true").lower() == "true"
+    if worker_enabled:
+        await get_insight_worker().start()
+    yield
+    if worker_enabled:
+        await get_insight_worker().stop()
+    await close_nudge_service()
+    await dispose_engines()
+
 
-app = FastAPI(title="Sales Call Analytics API")
+app = FastAPI(title="Sales Call Analytics API", lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(calls.router, prefix="/api/v1/calls", tags=["calls"])
 app.include_router(analytics.router, prefix="/api/v1/analytics", tags=["analytics"])
+app.include_router(metrics.router, tags=["metrics"])
@@ -1,7 +1,8 @@
 import asyncio
 import pytest
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
-from app.db import Base, get_session
+from app.db import Base, get_read_session, get_session
+from app.partitions import ensure_future_partitions
 from main import app
 
 # Override the dependency
@@ -24,6 +25,8 @@ async def initialized_app(monkeypatch):
     # Create tables
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+    # calls_db/call_insights need a partition for the seeded rows' month
+    await ensure_future_partitions(engine=engine)
 
     # Override FastAPI’s get_session to use TestingSession
     async def _get_test_session():
@@ -31,4 +34,5 @@ async def initialized_app(monkeypatch):
             yield session
 
     app.dependency_overrides[get_session] = _get_test_session
+    app.dependency_overrides[get_read_session] = _get_test_session
     return app
@@ -0,0 +1,81 @@
+import asyncio
+from datetime import datetime
+
+from sqlalchemy.dialects import postgresql
+
+from app.bulk import copy_insert
+from app.models import Call
+
+
+class FakeRaw:
+    """asyncpg connection whose statements autocommit outside a transaction."""
+
+    def __init__(self):
+        self.in_transaction = False
+        self.stage = []
+
+    def is_in_transaction(self):
+        return self.in_transaction
+
+    def _statement_done(self):
+        if not self.in_transaction:
+            self.stage = []  # ON COMMIT DELETE ROWS
+
+    async def execute(self, sql):
+        if sql.startswith("INSERT"):
+            status = f"INSERT 0 {len(self.stage)}"
+        else:
+            status = "OK"
+            if sql.startswith("TRUNCATE"):
+                self.stage = []
+        self._statement_done()
+        return status
+
+    async def copy_records_to_table(self, table, records, columns):
+        self.stage = list(records)
+        self._statement_done()
+
+    async def fetch(self, sql):
+        rows = [(r[0],) for r in self.stage]
+        self._statement_done()
+        return rows
+
+
+class FakeConnection:
+    dialect = postgresql.dialect()
+
+    def __init__(self):
+        self.raw = FakeRaw()
+
+    async def get_raw_connection(self):
+        return type("Pooled", (), {"driver_connection": self.raw})()
+
+    async def exec_driver_sql(self, sql):
+        self.raw.in_transaction = True  # the adapter's lazy BEGIN
+
+
+class FakeSession:
+    def __init__(self):
+        self.conn = FakeConnection()
+
+    async def connection(self):
+        return self.conn
+
+
+def _calls(n):
+    return [
+        {"call_id": f"c{i}", "agent_id": "a", "customer_id": "u", "start_time": datetime(2024, 1, 1),
+         "transcript": "Agent: hi"}
+        for i in range(n)
+    ]
+
+
+def test_copy_insert_opens_the_transaction_when_it_is_the_first_statement():
+    async def run():
+        keyed = await copy_insert(FakeSession(), Call, _calls(3), returning="call_id")
+        counted = await copy_insert(FakeSession(), Call, _calls(2))
+        return keyed, counted
+
+    keyed, counted = asyncio.run(run())
+    assert keyed.inserted == 3 and keyed.keys == ["c0", "c1", "c2"] and keyed.skipped == 0
+    assert counted.inserted == 2
@@ -7,18 +7,20 @@ from datetime import datetime
 async def test_list_and_get_call(initialized_app):
     async with AsyncClient(app=initialized_app, base_url="http://test") as client:
         # 1) Seed one call + insight
+        started = datetime.utcnow()
         call = Call(
             call_id="test1",
             agent_id="AgentA",
             customer_id="Cust1",
             language="en",
-            start_time=datetime.utcnow(),
+            start_time=started,
             duration_seconds=30,
             transcript="Agent: Hello\nCustomer: Hi"
         )
         insight = CallInsight(
             call_id="test1",
-            embedding=[0.1, 0.2, 0.3],
+            start_time=started,  # the call's: insights are keyed and partitioned on it
+            embedding=[0.1] * 384,
             customer_sentiment=0.5,
             agent_talk_ratio=0.5
         )
@@ -38,7 +40,7 @@ async def test_list_and_get_call(initialized_app):
         assert body["items"][0]["call_id"] == "test1"
 
         # 3) Test get detail
-        resp2 = await client.get("/api/v1/calls/test1")
+        resp2 = await client.get("/api/v1/calls/test1", params={"include": "embedding"})
         assert resp2.status_code == 200
         data = resp2.json()
         assert data["call_id"] == "test1"
@@ -0,0 +1,87 @@
+import json
+from datetime import datetime
+
+import numpy as np
+
+from app.embedding_snapshot import current_generation, open_snapshot, write_snapshot
+from app.embedding_store import EmbeddingStore
+from app.vector_index import BruteForceIndex, IVFIndex
+
+
+def _rows(n, first=0, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    vecs = rng.normal(size=(n, dim)).astype(np.float32)
+    return [
+        (f"c{first + i}", vecs[i], f"agent{i % 3}", datetime(2024, 1, 1 + i % 28))
+        for i in range(n)
+    ]
+
+
+def _publish(root, store, keep=3):
+    ids, vectors, codes, times, agents = store.arrays()
+    return write_snapshot(root, ids, vectors, codes, times, agents, store.cursor, keep=keep)
+
+
+def test_snapshot_store_matches_in_memory_store(tmp_path):
+    rows = _rows(300)
+    plain = EmbeddingStore()
+    plain.add(rows)
+    assert _publish(tmp_path, plain) == 1
+
+    snapshot = open_snapshot(tmp_path)
+    assert isinstance(snapshot.vectors, np.memmap) and len(snapshot) == 300
+    mapped = EmbeddingStore(snapshot=snapshot)
+    # rows added after the snapshot live in memory next to the mapped ones
+    extra = _rows(40, first=300, seed=1)
+    plain.add(extra)
+    mapped.add(extra + rows[:5])
+    assert len(mapped) == 340 and len(mapped.ids) == 40 and mapped.stats()["snapshot_rows"] == 300
+    assert "c17" in mapped and "c320" in mapped and "nope" not in mapped
+    assert np.allclose(mapped.get_vector("c17"), plain.get_vector("c17"))
+
+    a, b = BruteForceIndex(plain), BruteForceIndex(mapped)
+    for i in (0, 310):
+        q = plain.get_vector(f"c{i}")
+        kwargs = dict(k=8, exclude=f"c{i}", agent_id="agent1", to_date=datetime(2024, 1, 20))
+        assert [c for c, _ in a.search(q, **kwargs)] == [c for c, _ in b.search(q, **kwargs)]
+    queries = np.stack([plain.get_vector(c) for c in ("c3", "c333")])
+    assert [[c for c, _ in hits] for hits in a.search_many(queries, k=5)] == \
+        [[c for c, _ in hits] for hits in b.search_many(queries, k=5)]
+
+    ivf = IVFIndex(EmbeddingStore(snapshot=open_snapshot(tmp_path)), n_lists=8)
+    ivf.min_train_rows = 100
+    ivf._on_load()
+    assert ivf.centroids is not None
+    assert ivf.search(plain.get_vector("c42"), k=1, probes=8)[0][0] == "c42"
+
+
+def test_generations_are_published_atomically_and_pruned(tmp_path):
+    store = EmbeddingStore()
+    store.add(_rows(10))
+    for _ in range(3):
+        _publish(tmp_path, store, keep=2)
+    assert current_generation(tmp_path) == 3
+    assert sorted(p.name for p in tmp_path.iterdir() if p.name.startswith("gen-")) == ["gen-000002", "gen-000003"]
+
+    old = open_snapshot(tmp_path)
+    grown = EmbeddingStore(snapshot=old)
+    grown.add(_rows(5, first=10))
+    assert _publish(tmp_path, grown, keep=1) == 4
+    # a reader still mapping a pruned generation keeps working
+    assert old.call_id(old.row("c9")) == "c9" and len(old) == 10
+    new = open_snapshot(tmp_path)
+    assert new.generation == 4 and len(new) == 15 and new.row("c14") is not None
+
+
+def test_snapshot_keeps_the_refresh_cursor(tmp_path):
+    store = EmbeddingStore()
+    store.add(_rows(4))
+    store.cursor = 1234
+    _publish(tmp_path, store)
+    assert EmbeddingStore(snapshot=open_snapshot(tmp_path)).cursor == 1234
+
+    # generations written with the old created_at cursor fall back to a full read
+    path = tmp_path / "gen-000001" / "meta.json"
+    meta = json.loads(path.read_text())
+    path.write_text(json.dumps({**meta, "cursor": "2024-01-01T00:00:00"}))
+    assert open_snapshot(tmp_path).cursor is None
@@ -0,0 +1,88 @@
+import asyncio
+import io
+import json
+from datetime import datetime
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from app.export import encode
+
+NAMES = ["call_id", "start_time", "duration_seconds", "customer_sentiment", "embedding"]
+
+
+def _batches(sizes, dim=4):
+    batches, n = [], 0
+    for size in sizes:
+        batches.append([
+            (f"c{n + i}", datetime(2024, 1, 1 + i), None if i % 2 else 30, 0.25,
+             np.full(dim, n + i, dtype="<f4").tobytes())
+            for i in range(size)
+        ])
+        n += size
+    return batches
+
+
+def _encode(fmt, batches):
+    async def source():
+        for rows in batches:
+            yield rows
+
+    async def run():
+        return [chunk async for chunk in encode(fmt, NAMES, source())]
+
+    return asyncio.run(run())
+
+
+def test_ndjson_lines_with_float_embeddings():
+    chunks = _encode("ndjson", _batches([3, 2]))
+    assert len(chunks) == 2
+    lines = [json.loads(line) for line in b"".join(chunks).splitlines()]
+    assert [r["call_id"] for r in lines] == ["c0", "c1", "c2", "c3", "c4"]
+    assert lines[1] == {
+        "call_id": "c1", "start_time": "2024-01-02T00:00:00", "duration_seconds": None,
+        "customer_sentiment": 0.25, "embedding": [1.0, 1.0, 1.0, 1.0],
+    }
+
+
+@pytest.mark.parametrize("fmt", ["arrow", "parquet"])
+def test_arrow_formats_stream_fixed_size_embeddings(fmt):
+    chunks = _encode(fmt, _batches([3, 2]))
+    # one chunk per batch plus the stream/file footer
+    assert len(chunks) == 3 and all(chunks[:2])
+    data = b"".join(chunks)
+    table = pa.ipc.open_stream(data).read_all() if fmt == "arrow" else pq.read_table(io.BytesIO(data))
+    assert table.num_rows == 5
+    emb = table.schema.field("embedding").type
+    assert pa.types.is_fixed_size_list(emb) and emb.list_size == 4 and emb.value_type == pa.float32()
+    matrix = np.stack(table.column("embedding").to_numpy(zero_copy_only=False))
+    assert np.array_equal(matrix[:, 0], np.arange(5, dtype=np.float32))
+    if fmt == "parquet":
+        assert pq.ParquetFile(io.BytesIO(data)).metadata.row_group(0).column(0).compression == "ZSTD"
+
+
+@pytest.mark.parametrize("fmt", ["arrow", "parquet"])
+def test_empty_export_is_still_readable(fmt):
+    data = b"".join(_encode(fmt, []))
+    table = pa.ipc.open_stream(data).read_all() if fmt == "arrow" else pq.read_table(io.BytesIO(data))
+    assert table.num_rows == 0 and table.column_names == NAMES
+
+
+@pytest.mark.parametrize("fmt", ["ndjson", "arrow", "parquet"])
+def test_empty_embeddings_export_as_null(fmt):
+    batches = _batches([2, 3])
+    # transcripts without sentences store an empty embedding, here filling the whole first batch
+    for rows in batches:
+        for i in range(len(rows)):
+            if rows[i][0] in ("c0", "c1", "c3"):
+                rows[i] = rows[i][:4] + (b"",)
+    data = b"".join(_encode(fmt, batches))
+    if fmt == "ndjson":
+        embeddings = [json.loads(line)["embedding"] for line in data.splitlines()]
+    else:
+        table = pa.ipc.open_stream(data).read_all() if fmt == "arrow" else pq.read_table(io.BytesIO(data))
+        assert table.schema.field("embedding").type.list_size == 4
+        embeddings = table.column("embedding").to_pylist()
+    assert embeddings == [None, None, [2.0] * 4, None, [4.0] * 4]
@@ -0,0 +1,62 @@
+import math
+
+from app.conversations import build_call, transcript_times
+from utils.features import extract_features, feature_rows, message_features
+
+TRANSCRIPT = """Customer (9): you know my order, um, is late
+Agent (A1): Sorry! Let me check
+Customer (9): thanks
+Agent (A1): It ships today you know"""
+
+
+def test_features_of_a_transcript():
+    [row] = feature_rows(extract_features([TRANSCRIPT], [[0, 30, 60, 150]]))
+    # speaker labels aren't words; "you know" is one filler, not two words
+    assert row["customer_words"] == 5
+    assert row["agent_words"] == 7
+    assert row["agent_talk_ratio"] == 7 / 12
+    assert row["customer_filler_rate"] == 2 / 8
+    assert row["agent_filler_rate"] == 1 / 9
+    assert (row["agent_turns"], row["customer_turns"]) == (2, 2)
+    assert row["first_response_seconds"] == 30
+    assert row["avg_response_gap_seconds"] == 60
+
+
+def test_transcripts_are_independent_in_a_batch():
+    texts = [TRANSCRIPT, "Agent: hi there\nAgent: anyone?", "", "Customer: hello UM"]
+    batch = feature_rows(extract_features(texts, [None, [0, 5], None, None]))
+    assert batch == [feature_rows(extract_features([t]))[0] for t in texts]
+    assert batch[0]["first_response_seconds"] is None  # no times given
+    assert batch[1]["agent_turns"] == 1 and batch[1]["first_response_seconds"] is None
+    assert batch[2]["agent_talk_ratio"] == 0.0 and batch[2]["agent_turns"] == 0
+    assert batch[3]["customer_words"] == 1 and batch[3]["customer_filler_rate"] == 0.5
+
+
+def test_message_features_match_built_transcripts():
+    convo = [
+        {"tweet_id": 1, "author_id": "9", "inbound": True, "created_at": "Tue Oct 31 22:10:47 +0000 2017",
+         "text": "my order is late,\nyou know"},
+        {"tweet_id": 2, "author_id": "A1", "inbound": False, "created_at": "Tue Oct 31 22:12:17 +0000 2017",
+         "text": "Sorry, let me check"},
+    ]
+    call = build_call(convo)
+    times = transcript_times(convo)
+    assert len(times) == call["transcript"].count("\n") + 1
+
+    columnar = feature_rows(message_features(
+        [2], [not m["inbound"] for m in convo], [m["text"] for m in convo], [times[0], times[-1]]
+    ))
+    assert columnar == feature_rows(extract_features([call["transcript"]], [times]))
+    assert columnar[0]["first_response_seconds"] == 90
+    assert not math.isnan(columnar[0]["customer_filler_rate"])
+
+
+def test_unlabelled_lines_are_not_the_customer():
+    text = "[system] chat opened via web widget\nCustomer (9): my order\nis late\n\nAgent (A1): sorry about that"
+    [row] = feature_rows(extract_features([text], [[0, 10, 10, 10, 40]]))
+    # the system note is nobody's; the continuation line is still the customer's
+    assert (row["customer_words"], row["agent_words"]) == (4, 3)
+    assert row["agent_talk_ratio"] == 3 / 7
+    assert (row["agent_turns"], row["customer_turns"]) == (1, 1)
+    assert row["first_response_seconds"] == 30
+    assert feature_rows(extract_features(["[system] transferred", "Agent: hi"]))[0]["agent_talk_ratio"] == 0.0
@@ -0,0 +1,28 @@
+import numpy as np
+
+from benchmarks.inference import embedding_parity, sentiment_parity
+from utils import ai_utils
+
+
+def test_onnx_backend_falls_back_to_torch(monkeypatch):
+    def unavailable(kind, model_id):
+        raise RuntimeError("no onnxruntime")
+
+    monkeypatch.setattr(ai_utils, "INFERENCE_BACKEND", "onnx")
+    monkeypatch.setattr(ai_utils, "load_onnx", unavailable)
+    assert ai_utils._with_backend("embed", "m", lambda: "torch model") == "torch model"
+
+    monkeypatch.setattr(ai_utils, "load_onnx", lambda kind, model_id: f"onnx {kind} {model_id}")
+    assert ai_utils._with_backend("embed", "m", lambda: "torch model") == "onnx embed m"
+
+
+def test_parity_measures():
+    ref = np.array([[1.0, 0.0], [0.0, 2.0]])
+    assert embedding_parity(ref, ref * 3)["cosine_min"] == 1.0
+    assert embedding_parity(ref, np.array([[1.0, 1.0], [0.0, 1.0]]))["cosine_min"] < 0.99
+
+    a = [{"label": "POSITIVE", "score": 0.9}, {"label": "NEGATIVE", "score": 0.8}]
+    b = [{"label": "POSITIVE", "score": 0.85}, {"label": "POSITIVE", "score": 0.6}]
+    parity = sentiment_parity(a, b)
+    assert parity["label_agreement"] == 0.5
+    assert abs(parity["score_drift_max"] - 0.2) < 1e-9
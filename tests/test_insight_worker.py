@@ -0,0 +1,72 @@
+import asyncio
+import time
+from datetime import datetime
+
+from sqlalchemy.dialects import postgresql
+
+from app.insight_worker import InsightWorker, PendingCall
+
+
+class RecordingWorker(InsightWorker):
+    """Records batch sizes instead of computing and writing insights."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.sizes = []
+
+    async def process(self, batch):
+        self.sizes.append(len(batch))
+        self.processed += len(batch)
+        for c in batch:
+            self._pending.pop(c.call_id, None)
+
+
+def _call(i):
+    return PendingCall(f"c{i}", "Agent: hi", "agent", datetime(2024, 1, 1), time.time())
+
+
+def test_micro_batches_by_size_then_window():
+    async def run():
+        worker = RecordingWorker(batch_size=64, window=0.05, workers=1)
+        worker._tasks = [asyncio.create_task(worker._run())]
+        for i in range(150):
+            worker.enqueue(_call(i))
+        await worker.queue.join()
+        assert worker.stats()["queue_depth"] == 0
+
+        # a lone call waits at most one window for company
+        started = time.perf_counter()
+        worker.enqueue(_call(150))
+        await worker.queue.join()
+        waited = time.perf_counter() - started
+        await worker.stop()
+        return worker, waited
+
+    worker, waited = asyncio.run(run())
+    assert worker.sizes == [64, 64, 22, 1]
+    assert 0.04 <= waited < 1.0
+    stats = worker.stats()
+    assert stats["processed"] == 151 and stats["pending"] == 0 and not stats["running"]
+
+
+def test_parallel_workers_share_the_queue():
+    async def run():
+        worker = RecordingWorker(batch_size=10, window=0.01, workers=3)
+        worker._tasks = [asyncio.create_task(worker._run()) for _ in range(worker.workers)]
+        for i in range(95):
+            worker.enqueue(_call(i))
+        await worker.queue.join()
+        await worker.stop()
+        return worker
+
+    worker = asyncio.run(run())
+    assert sum(worker.sizes) == 95 and max(worker.sizes) <= 10
+
+
+def test_recovery_claims_rows_instead_of_reading_the_whole_outbox():
+    sql = str(InsightWorker(claim_seconds=60).claim_query().compile(dialect=postgresql.dialect()))
+    # concurrent boots skip each other's rows, and only take unclaimed or lapsed ones
+    assert "FOR UPDATE SKIP LOCKED" in sql
+    assert "UPDATE insight_outbox SET claimed_by" in sql and "claimed_at IS NULL" in sql
+    # lag is measured against the database's UTC clock, like enqueued_at
+    assert "EXTRACT(epoch FROM timezone(" in sql
@@ -0,0 +1,69 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import create_engine, text
+
+from app import metrics
+from app.metrics import MetricsMiddleware, fingerprint, instrument_engine, span
+
+
+def make_app():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware, server_timing=True)
+
+    @app.get("/things/{thing_id}")
+    async def thing(thing_id: str):
+        def infer():
+            with span("embeddings"):
+                return thing_id.upper()
+
+        return {"id": await asyncio.to_thread(infer)}
+
+    return app
+
+
+def test_requests_are_timed_by_route_template_with_server_timing():
+    async def go():
+        transport = httpx.ASGITransport(app=make_app())
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return [await client.get(f"/things/t{i}") for i in range(3)] + [await client.get("/nope")]
+
+    *ok, missing = asyncio.run(go())
+    assert [r.json()["id"] for r in ok] == ["T0", "T1", "T2"]
+    # spans run in worker threads still land in the request's header
+    assert ok[0].headers["server-timing"].startswith('embeddings;dur=')
+    assert "total;dur=" in missing.headers["server-timing"]
+
+    text_format = metrics.render()
+    assert 'http_request_duration_seconds_count{method="GET",route="/things/{thing_id}",status="200"} 3' in text_format
+    assert 'route="unmatched",status="404"' in text_format
+    assert 'span_duration_seconds_bucket{span="embeddings",le="+Inf"} 3' in text_format
+
+
+def test_statements_are_fingerprinted_and_slow_ones_logged(monkeypatch, capsys):
+    a = fingerprint("SELECT * FROM calls_db WHERE call_id = $1 AND agent_id = 'x' LIMIT 10")
+    b = fingerprint("SELECT *\n  FROM calls_db WHERE call_id = $2 AND agent_id = 'y' LIMIT 20")
+    assert a == b and a[1] == "SELECT"
+    assert "?" in a[2] and "'x'" not in a[2]
+
+    monkeypatch.setattr(metrics, "SLOW_QUERY_SECONDS", 0.0)
+    engine = create_engine("sqlite://")
+    instrument_engine(engine, "test")
+    with engine.connect() as conn:
+        for i in range(3):
+            conn.execute(text(f"SELECT {i} + 1"))
+
+    top = [s for s in metrics.STATEMENTS.top(500) if s["sql"] == "SELECT ? + ?"]
+    assert top and top[0]["calls"] == 3
+    assert 'db_query_duration_seconds_count{engine="test",statement="SELECT"} 3' in metrics.render()
+    assert "[WARN] Slow query" in capsys.readouterr().out
+
+
+def test_running_totals_are_counters_and_levels_gauges():
+    registry = metrics.Registry()
+    registry.counter_callback("cache_hits_total", "Hits.", lambda: {(("route", "r"),): 5})
+    registry.gauge("queue_depth", "Depth.", lambda: {(): 2})
+    rendered = registry.render()
+    assert "# TYPE cache_hits_total counter\ncache_hits_total{route=\"r\"} 5" in rendered
+    assert "# TYPE queue_depth gauge\nqueue_depth 2" in rendered
@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+
+from utils.ingest import iter_conversation_chunks, normalize_conversations
+
+
+def legacy_normalize(df):
+    """The original iterrows/parent-walk implementation, kept as an oracle."""
+    tweet_map = {row["tweet_id"]: row for _, row in df.iterrows()}
+    conversations, visited = [], set()
+    for _, row in df.iterrows():
+        if row["tweet_id"] in visited:
+            continue
+        if not row["inbound"] and pd.notnull(row["in_response_to_tweet_id"]):
+            thread, current = [], row
+            while True:
+                thread.append(current)
+                visited.add(current["tweet_id"])
+                parent = current["in_response_to_tweet_id"]
+                if pd.isna(parent) or parent not in tweet_map:
+                    break
+                current = tweet_map[parent]
+            conversations.append(list(reversed(thread)))
+    return conversations
+
+
+def random_forest(n, seed):
+    rng = np.random.default_rng(seed)
+    ids = rng.permutation(np.arange(1000, 1000 + n))
+    parents = np.full(n, np.nan)
+    for i in range(1, n):
+        r = rng.random()
+        if r < 0.8:
+            parents[i] = ids[rng.integers(0, i)]
+        elif r < 0.85:
+            parents[i] = 999999  # parent outside the dump
+    df = pd.DataFrame({
+        "tweet_id": ids,
+        "author_id": [f"u{i % 7}" for i in range(n)],
+        "inbound": rng.random(n) < 0.5,
+        "created_at": "Tue Oct 31 22:10:47 +0000 2017",
+        "text": [f"msg {i}" for i in range(n)],
+        "in_response_to_tweet_id": parents,
+    })
+    return df.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+def test_matches_legacy_thread_builder():
+    for seed in range(5):
+        df = random_forest(300, seed)
+        expected = [[m["tweet_id"] for m in convo] for convo in legacy_normalize(df)]
+        actual = [[m["tweet_id"] for m in convo] for convo in normalize_conversations(df)]
+        assert actual == expected
+
+
+def test_no_replies_gives_no_conversations():
+    df = random_forest(5, 0).assign(inbound=True)
+    assert normalize_conversations(df) == []
+
+
+def test_streaming_chunks_match_whole_file(tmp_path):
+    df = random_forest(400, 7)
+    csv = tmp_path / "tweets.csv"
+    df.to_csv(csv, index=False)
+
+    expected = sorted(tuple(m["tweet_id"] for m in c) for c in normalize_conversations(df))
+    streamed, resume_rows = [], []
+    for conversations, resume_row in iter_conversation_chunks(str(csv), chunk_rows=37, max_pending=1000):
+        streamed += [tuple(m["tweet_id"] for m in c) for c in conversations]
+        resume_rows.append(resume_row)
+
+    assert sorted(streamed) == expected
+    assert resume_rows == sorted(resume_rows) and resume_rows[-1] == len(df)
+
+
+def _streamed(df, path, chunk_rows, max_pending=1000):
+    df.to_csv(path, index=False)
+    return [
+        tuple(m["tweet_id"] for m in c)
+        for conversations, _ in iter_conversation_chunks(str(path), chunk_rows=chunk_rows, max_pending=max_pending)
+        for c in conversations
+    ]
+
+
+def test_streaming_waits_for_replies_that_may_hang_below(tmp_path):
+    # 6 answers 9, which is only read in the second chunk and answers 7: the
+    # whole-file threading gives one thread ending at 6, never a prefix ending at 7
+    df = pd.DataFrame({
+        "tweet_id": [6, 4, 7, 9],
+        "author_id": ["SupportCo", "u1", "SupportCo", "u1"],
+        "inbound": [False, True, False, True],
+        "created_at": "Tue Oct 31 22:10:47 +0000 2017",
+        "text": ["a", "b", "c", "d"],
+        "in_response_to_tweet_id": [9, np.nan, 4, 7],
+    })
+    expected = [tuple(m["tweet_id"] for m in c) for c in normalize_conversations(df)]
+    assert expected == [(4, 7, 9, 6)]
+    assert _streamed(df, tmp_path / "tweets.csv", chunk_rows=3) == expected
+
+    # about a third of these diverged before
+    for seed in range(30):
+        df = random_forest(120, seed)
+        expected = sorted(tuple(m["tweet_id"] for m in c) for c in normalize_conversations(df))
+        assert sorted(_streamed(df, tmp_path / "tweets.csv", chunk_rows=7)) == expected, seed
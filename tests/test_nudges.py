@@ -0,0 +1,161 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app import nudges
+from app.models import CoachingNudge
+from app.nudges import NUDGE_MAX_CHARS, NudgeService, transcript_hash
+
+
+class FakeLLM(BaseHTTPRequestHandler):
+    """Minimal OpenAI-compatible /chat/completions endpoint."""
+
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with FakeLLM.lock:
+            FakeLLM.active += 1
+            FakeLLM.peak = max(FakeLLM.peak, FakeLLM.active)
+        time.sleep(0.05)
+        with FakeLLM.lock:
+            FakeLLM.active -= 1
+        transcript = body["messages"][-1]["content"].splitlines()[-1]
+        content = f"- Greet warmly\n• Confirm: {transcript}\n\n- Close politely\n- Extra"
+        payload = json.dumps({"choices": [{"message": {"content": content}}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fake_llm():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeLLM)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def test_generate_parses_nudges_and_limits_concurrency(fake_llm):
+    async def run():
+        service = NudgeService(base_url=fake_llm, api_key="test", concurrency=2)
+        try:
+            return await asyncio.gather(*(service.generate(f"Agent: hi {i}") for i in range(6)))
+        finally:
+            await service.aclose()
+
+    FakeLLM.peak = 0
+    results = asyncio.run(run())
+    assert results[3] == ["Greet warmly", "Confirm: Agent: hi 3", "Close politely"]
+    assert FakeLLM.peak <= 2
+
+
+class FakeSession:
+    """Just enough AsyncSession for NudgeService: get, execute, commit."""
+
+    def __init__(self, stored=None):
+        self.stored = stored
+        self.executed = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def get(self, model, key):
+        return self.stored
+
+    async def execute(self, stmt):
+        self.executed.append(stmt)
+
+    async def commit(self):
+        pass
+
+
+def nudge_service(handler):
+    return NudgeService(base_url="http://llm", api_key="test", transport=httpx.MockTransport(handler))
+
+
+def completion(content):
+    return httpx.Response(200, json={"choices": [{"message": {"content": content}}]})
+
+
+def test_get_nudges_serves_persisted_nudges_without_the_llm():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return completion("- unused")
+
+    async def run():
+        service = nudge_service(handler)
+        stored = CoachingNudge(call_id="c1", transcript_hash=transcript_hash("Agent: hi"), nudges=["Smile", "x" * 500])
+        try:
+            return await service.get_nudges(FakeSession(stored), "c1", "Agent: hi")
+        finally:
+            await service.aclose()
+
+    nudges = asyncio.run(run())
+    assert nudges[0] == "Smile" and len(nudges[1]) <= NUDGE_MAX_CHARS
+    assert calls == []
+
+
+def test_get_nudges_gives_up_on_slow_or_failing_llm():
+    async def slow(request):
+        await asyncio.sleep(0.5)
+        return completion("- late")
+
+    def failing(request):
+        return httpx.Response(503, json={"error": "overloaded"})
+
+    async def run(handler):
+        service = nudge_service(handler)
+        try:
+            return await service.get_nudges(FakeSession(), "c1", "Agent: hi", wait=0.05)
+        finally:
+            await service.aclose()
+
+    assert asyncio.run(run(slow)) == []
+    assert asyncio.run(run(failing)) == []
+
+
+def test_generated_nudges_are_clipped_and_stored(monkeypatch):
+    written = FakeSession()
+    invalidated = []
+
+    async def invalidate(*tags):
+        invalidated.extend(tags)
+
+    monkeypatch.setattr(nudges, "SessionLocal", lambda: written)
+    monkeypatch.setattr(nudges, "invalidate", invalidate)
+    long_nudge = "word " * 120
+
+    async def run():
+        service = nudge_service(lambda request: completion(f"- Greet warmly\n- {long_nudge}"))
+        try:
+            return await service.get_nudges(FakeSession(), "c1", "Agent: hi")
+        finally:
+            await service.aclose()
+
+    result = asyncio.run(run())
+    assert result[0] == "Greet warmly" and len(result[1]) <= NUDGE_MAX_CHARS
+    [stmt] = written.executed
+    params = stmt.compile(dialect=postgresql.dialect()).params
+    assert params["call_id"] == "c1" and params["nudges"] == result
+    assert params["transcript_hash"] == transcript_hash("Agent: hi")
+    assert invalidated == ["call:c1"]
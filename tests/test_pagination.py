@@ -0,0 +1,49 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from app.models import Call
+from app.pagination import decode_cursor, encode_cursor
+from app.routes.calls import count_rows
+
+
+def test_cursor_round_trip():
+    ts = datetime(2017, 10, 31, 22, 10, 47)
+    cursor = encode_cursor(ts, "119237")
+    assert decode_cursor(cursor, datetime, str) == (ts, "119237")
+    assert decode_cursor(encode_cursor(0.1, "a"), float, str) == (0.1, "a")
+
+
+@pytest.mark.parametrize("bad", ["not-base64!", encode_cursor("only-one")])
+def test_invalid_cursor_is_422(bad):
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor(bad, datetime, str)
+    assert exc.value.status_code == 422
+
+
+def test_estimated_count_keeps_colons_in_filter_values():
+    class Result:
+        def scalar_one(self):
+            return [{"Plan": {"Plan Rows": 7}}]
+
+    class Connection:
+        dialect = postgresql.dialect()
+
+        async def exec_driver_sql(self, sql):
+            self.sql = sql
+            return Result()
+
+    class Session:
+        conn = Connection()
+
+        async def connection(self):
+            return self.conn
+
+    session = Session()
+    stmt = select(Call.call_id).where(Call.agent_id == "team:x")
+    assert asyncio.run(count_rows(session, stmt, "estimate")) == 7
+    assert "'team:x'" in session.conn.sql
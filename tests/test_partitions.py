@@ -0,0 +1,67 @@
+import asyncio
+from datetime import date, datetime
+
+import numpy as np
+import pytest
+
+from app import partitions
+from app.embedding_store import EmbeddingStore
+from app.partitions import (
+    Partition,
+    add_months,
+    create_partition_sql,
+    ensure_partitions,
+    expired,
+    month_start,
+    parse_bounds,
+    partition_name,
+    retention_floor,
+)
+
+
+def test_month_arithmetic_and_partition_ddl():
+    assert month_start(datetime(2024, 2, 29, 23, 59)) == date(2024, 2, 1)
+    assert add_months(date(2024, 11, 1), 3) == date(2025, 2, 1)
+    assert add_months(date(2024, 1, 1), -1) == date(2023, 12, 1)
+    assert partition_name("calls_db", date(2024, 3, 1)) == "calls_db_p202403"
+    assert create_partition_sql("call_insights", date(2024, 12, 1)) == (
+        'CREATE TABLE IF NOT EXISTS "call_insights_p202412" PARTITION OF "call_insights" '
+        "FOR VALUES FROM ('2024-12-01') TO ('2025-01-01')"
+    )
+
+
+def test_bounds_and_retention_cutoff():
+    assert parse_bounds("FOR VALUES FROM ('2024-03-01 00:00:00') TO ('2024-04-01 00:00:00')") == (
+        date(2024, 3, 1), date(2024, 4, 1)
+    )
+    assert parse_bounds("DEFAULT") is None
+
+    parts = [
+        Partition("calls_db", partition_name("calls_db", m), m, add_months(m, 1))
+        for m in (add_months(date(2024, 1, 1), i) for i in range(12))
+    ]
+    # keeping 3 months on 2024-06-15 keeps April, May and June
+    old = expired(reversed(parts), 3, date(2024, 6, 15))
+    assert [p.name for p in old] == ["calls_db_p202401", "calls_db_p202402", "calls_db_p202403"]
+    assert expired(parts, 12, date(2024, 6, 15)) == []
+
+
+def test_index_hides_calls_in_expired_partitions():
+    store = EmbeddingStore()
+    store.add((f"c{m}", np.eye(4)[m % 4] + 0.1, "agent", datetime(2024, m, 15)) for m in range(1, 7))
+    store.set_min_start(date(2024, 4, 1))  # retention left April onwards
+
+    assert "c3" not in store and store.get_vector("c3") is None and "c4" in store
+    assert store.filter_mask().tolist() == [False, False, False, True, True, True]
+    ids, vectors, *_ = store.arrays()
+    assert ids.tolist() == [b"c4", b"c5", b"c6"] and len(vectors) == 3
+
+
+def test_writes_before_the_retention_window_are_refused(monkeypatch):
+    assert retention_floor(0) is None
+    assert retention_floor(3, date(2024, 6, 15)) == date(2024, 4, 1)
+
+    monkeypatch.setattr(partitions, "PARTITION_RETENTION_MONTHS", 3)
+    monkeypatch.setattr(partitions, "retention_floor", lambda: date(2024, 4, 1))
+    with pytest.raises(ValueError, match="2024-02, 2024-03 is older than the 3-month retention window"):
+        asyncio.run(ensure_partitions([datetime(2024, 3, 31), datetime(2024, 2, 1), datetime(2024, 5, 1)]))
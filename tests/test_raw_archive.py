@@ -0,0 +1,71 @@
+import json
+
+from app.raw_archive import RawArchive, encode_record
+
+
+def convo(i: int) -> list[dict]:
+    return [
+        {"tweet_id": i, "author_id": "9", "inbound": True, "created_at": "Tue Oct 31 22:10:47 +0000 2017",
+         "text": f"order {i} is late — día {i}"},
+        {"tweet_id": i + 1, "author_id": "SupportCo", "inbound": False,
+         "created_at": "Tue Oct 31 22:12:17 +0000 2017", "text": "Sorry! " * (i % 7)},
+    ]
+
+
+def test_random_reads_scans_and_segment_rollover(tmp_path):
+    archive = RawArchive(tmp_path, segment_bytes=2000)
+    archive.append_many((f"c{i}", convo(i)) for i in range(100))
+    archive.append("c5", convo(500))  # replaces the first c5
+
+    assert archive.stats()["segments"] > 1
+    assert archive.get("c42") == convo(42)
+    assert archive.get("c5") == convo(500)
+    assert archive.get("missing") is None
+    assert archive.get_many(["c7", "missing", "c99"]) == {"c7": convo(7), "c99": convo(99)}
+
+    scanned = dict(archive.scan())
+    assert len(scanned) == 100 and scanned["c5"] == convo(500)
+    assert len(list(archive.scan(latest_only=False))) == 101
+    next(archive.scan())  # abandoning a scan mid-segment is fine
+    archive.close()
+
+
+def test_unindexed_and_torn_records_are_recovered_on_open(tmp_path):
+    archive = RawArchive(tmp_path)
+    archive.append_many((f"c{i}", convo(i)) for i in range(10))
+    archive.close()
+
+    # a writer died after appending two records, the second one half-written,
+    # before indexing them
+    segment = tmp_path / "seg-000001.bin"
+    with open(segment, "ab") as f:
+        f.write(encode_record("c10", convo(10)))
+        f.write(encode_record("c11", convo(11))[:-5])
+
+    archive = RawArchive(tmp_path)
+    assert archive.get("c10") == convo(10)
+    assert archive.get("c11") is None
+    archive.append("c11", convo(11))
+    assert archive.get("c11") == convo(11)
+    assert archive.rebuild_index() == 12
+    assert json.dumps(archive.get("c3")) == json.dumps(convo(3))
+    archive.close()
+
+
+def test_records_in_earlier_segments_are_recovered_after_a_rollover(tmp_path):
+    archive = RawArchive(tmp_path, segment_bytes=2000)
+    archive.append_many((f"c{i}", convo(i)) for i in range(5))
+    archive.close()
+
+    # a writer filled the segment, rolled over twice and died before indexing
+    first = max(tmp_path.glob("seg-*.bin"))
+    with open(first, "ab") as f:
+        f.write(encode_record("c5", convo(5)))
+    number = int(first.stem.split("-")[1])
+    for i, n in ((6, number + 1), (7, number + 2)):
+        (tmp_path / f"seg-{n:06d}.bin").write_bytes(encode_record(f"c{i}", convo(i)))
+
+    archive = RawArchive(tmp_path, segment_bytes=2000)
+    assert [archive.get(f"c{i}") for i in (5, 6, 7)] == [convo(5), convo(6), convo(7)]
+    assert archive.stats()["conversations"] == 8
+    archive.close()
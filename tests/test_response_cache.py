@@ -0,0 +1,92 @@
+import asyncio
+
+import httpx
+from fastapi import Depends, FastAPI, HTTPException, Request
+from pydantic import TypeAdapter
+
+from app.cache import ResponseCache
+
+
+class DictBackend:
+    """Shared-backend stand-in: plain dict, TTL ignored."""
+
+    def __init__(self):
+        self.data = {}
+
+    async def get_many(self, keys):
+        return [self.data.get(k) for k in keys]
+
+    async def set(self, key, value, ttl):
+        self.data[key] = value
+
+    async def incr(self, key):
+        value = int(self.data.get(key, b"0")) + 1
+        self.data[key] = str(value).encode()
+        return value
+
+
+def make_app(cache: ResponseCache):
+    app = FastAPI()
+    app.state.computed = 0
+    adapter = TypeAdapter(dict)
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: str, request: Request, c: ResponseCache = Depends(lambda: cache)):
+        async def load():
+            await asyncio.sleep(0.05)
+            app.state.computed += 1
+            if item_id == "missing":
+                raise HTTPException(404, "not found")
+            return {"id": item_id, "version": app.state.computed}
+
+        return await c.respond(request, "item", [f"item:{item_id}"], load, adapter)
+
+    return app
+
+
+def run(app, coro_fn):
+    async def go():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await coro_fn(client)
+    return asyncio.run(go())
+
+
+def test_concurrent_misses_are_coalesced_and_etag_revalidates():
+    cache = ResponseCache(DictBackend())
+    app = make_app(cache)
+
+    async def scenario(client):
+        first = await asyncio.gather(*(client.get("/items/a") for _ in range(10)))
+        etag = first[0].headers["etag"]
+        again = await client.get("/items/a", headers={"If-None-Match": etag})
+        return first, again
+
+    first, again = run(app, scenario)
+    assert app.state.computed == 1
+    assert all(r.status_code == 200 and r.json() == {"id": "a", "version": 1} for r in first)
+    assert again.status_code == 304 and again.headers["x-cache"] == "hit"
+    stats = cache.stats()["item"]
+    assert stats["misses"] == 10 and stats["coalesced"] == 9 and stats["hits"] == 1
+    assert stats["not_modified"] == 1
+
+
+def test_invalidation_and_errors_are_not_cached():
+    cache = ResponseCache(DictBackend())
+    app = make_app(cache)
+
+    async def scenario(client):
+        a1 = await client.get("/items/a")
+        b1 = await client.get("/items/b")
+        await cache.invalidate("item:a")
+        a2 = await client.get("/items/a")
+        b2 = await client.get("/items/b")
+        missing = [await client.get("/items/missing") for _ in range(2)]
+        return a1, a2, b1, b2, missing
+
+    a1, a2, b1, b2, missing = run(app, scenario)
+    assert a2.json()["version"] > a1.json()["version"]
+    assert a1.headers["etag"] != a2.headers["etag"]
+    assert b2.json() == b1.json() and b2.headers["x-cache"] == "hit"
+    assert [r.status_code for r in missing] == [404, 404]
+    assert app.state.computed == 5
@@ -0,0 +1,36 @@
+from utils.result_cache import ResultCache
+
+
+def test_memory_and_disk_tiers(tmp_path):
+    path = tmp_path / "cache.sqlite"
+    cache = ResultCache(path, memory_items=2)
+    cache.put_many("m", {"a": b"1", "b": b"2", "c": b"3"})
+
+    assert cache.get_many("m", ["c", "a", "zz"]) == [b"3", b"1", None]
+    assert cache.get_many("other-model", ["a"]) == [None]
+    stats = cache.stats()
+    assert stats["memory_hits"] == 1 and stats["disk_hits"] == 1 and stats["misses"] == 2
+
+    reopened = ResultCache(path)
+    assert reopened.get_many("m", ["b"]) == [b"2"]
+
+
+def test_evicts_least_recently_used_past_size_limit(tmp_path):
+    cache = ResultCache(tmp_path / "cache.sqlite", memory_items=1, disk_bytes=250)
+    cache.put_many("m", {"old": b"x" * 100})
+    cache.put_many("m", {"mid": b"x" * 100})
+    cache.get_many("m", ["old"])
+    cache.put_many("m", {"new": b"x" * 100})
+
+    assert cache.stats()["disk_bytes"] <= 250
+    fresh = ResultCache(tmp_path / "cache.sqlite")
+    assert fresh.get_many("m", ["old", "mid", "new"]) == [b"x" * 100, None, b"x" * 100]
+
+
+def test_disk_size_counts_only_new_rows(tmp_path):
+    cache = ResultCache(tmp_path / "cache.sqlite")
+    cache.put_many("m", {"a": b"x" * 10, "b": b"x" * 20})
+    cache.put_many("m", {"a": b"x" * 10, "c": b"x" * 5})
+
+    assert cache.stats()["disk_bytes"] == 35
+    assert ResultCache(tmp_path / "cache.sqlite").stats()["disk_bytes"] == 35
@@ -0,0 +1,31 @@
+import json
+import os
+import subprocess
+import sys
+
+# Importing the API must stay cheap: no model frameworks until an endpoint needs them.
+# The module check is the real guard; the time budget only catches gross regressions
+# (a framework import costs several seconds) and is loose enough for a busy CI box.
+IMPORT_BUDGET_SECONDS = float(os.getenv("IMPORT_BUDGET_SECONDS", "10.0"))
+HEAVY_MODULES = ["torch", "transformers", "sentence_transformers", "sklearn", "groq", "onnxruntime"]
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import main
+print(json.dumps({
+    "seconds": time.perf_counter() - started,
+    "heavy": [m for m in %r if m in sys.modules],
+}))
+""" % HEAVY_MODULES
+
+
+def test_api_import_is_lazy():
+    env = {**os.environ, "DB_URL": os.getenv("DB_URL", "postgresql+asyncpg://u:p@localhost/db")}
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE], capture_output=True, text=True, env=env, check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    report = json.loads(out.stdout.strip().splitlines()[-1])
+    assert report["heavy"] == []
+    assert report["seconds"] < IMPORT_BUDGET_SECONDS
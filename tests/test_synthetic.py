@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+from app.conversations import build_call
+from benchmarks.synthetic import generate_calls, generate_tweets, write_csv
+from utils.ingest import iter_conversation_chunks, normalize_conversations
+
+
+def test_generated_conversations_thread_into_one_call_each(tmp_path):
+    df = generate_tweets(300, seed=3)
+    assert df["tweet_id"].is_unique
+    calls = [build_call(c) for c in normalize_conversations(df)]
+    assert len(calls) == 300
+    assert all(c is not None and c["duration_seconds"] > 0 for c in calls)
+    assert all(c["agent_id"].startswith("SupportCo") for c in calls)
+
+    # chunks written separately still thread into exactly the same calls
+    path = tmp_path / "synthetic.csv"
+    rows = write_csv(path, 300, seed=3, chunk=70)
+    whole = pd.read_csv(path)
+    assert len(whole) == rows
+    streamed = [c for chunk, _ in iter_conversation_chunks(str(path), chunk_rows=101) for c in chunk]
+    expected = {c[-1]["tweet_id"]: len(c) for c in normalize_conversations(whole)}
+    assert len(expected) == 300
+    assert {c[-1]["tweet_id"]: len(c) for c in streamed} == expected
+
+
+def test_generated_insights_are_unit_vectors():
+    batches = list(generate_calls(25, dim=16, batch=10))
+    assert [len(calls) for calls, _ in batches] == [10, 10, 5]
+    ids = [c["call_id"] for calls, _ in batches for c in calls]
+    assert len(set(ids)) == 25
+    emb = np.stack([i["embedding"] for _, insights in batches for i in insights])
+    assert np.allclose(np.linalg.norm(emb, axis=1), 1.0, atol=1e-5)
@@ -0,0 +1,22 @@
+import numpy as np
+import pytest
+
+from app.types import PackedVector
+
+
+def test_packed_vector_round_trip_is_float32_view():
+    col = PackedVector()
+    raw = col.process_bind_param([0.1, 0.2, 0.3], dialect=None)
+    assert isinstance(raw, bytes) and len(raw) == 12
+
+    vec = col.process_result_value(raw, dialect=None)
+    assert vec.dtype == np.float32
+    assert not vec.flags["OWNDATA"]
+    assert np.allclose(vec, [0.1, 0.2, 0.3])
+
+
+def test_packed_vector_checks_width():
+    with pytest.raises(ValueError):
+        PackedVector(dim=384).process_bind_param([0.0] * 3, dialect=None)
+    half = PackedVector(dtype="float16")
+    assert len(half.process_bind_param(np.zeros(384), dialect=None)) == 768
@@ -0,0 +1,133 @@
+import asyncio
+from datetime import datetime
+
+import numpy as np
+
+from app import vector_index
+from app.embedding_store import EmbeddingStore
+from app.vector_index import BruteForceIndex, IVFIndex
+
+
+def _rows(n, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    vecs = rng.normal(size=(n, dim)).astype(np.float32)
+    return [
+        (f"c{i}", vecs[i], f"agent{i % 3}", datetime(2024, 1, 1 + i % 28))
+        for i in range(n)
+    ], vecs
+
+
+def test_exact_search_matches_numpy():
+    rows, vecs = _rows(200)
+    index = BruteForceIndex()
+    assert index.add(rows) == 200
+
+    hits = index.search(vecs[0], k=5, exclude="c0")
+    normed = vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+    sims = normed[1:] @ normed[0]
+    expected = [f"c{i + 1}" for i in np.argsort(-sims)[:5]]
+    assert [cid for cid, _ in hits] == expected
+    assert hits[0][1] >= hits[-1][1]
+
+
+def test_prefilter_by_agent_and_date():
+    rows, vecs = _rows(60)
+    index = BruteForceIndex()
+    index.add(rows)
+
+    hits = index.search(
+        vecs[0], k=50, agent_id="agent1",
+        from_date=datetime(2024, 1, 5), to_date=datetime(2024, 1, 10),
+    )
+    assert hits
+    for cid, _ in hits:
+        i = int(cid[1:])
+        assert i % 3 == 1 and 5 <= 1 + i % 28 <= 10
+
+
+def test_ivf_recall_improves_with_probes():
+    rows, vecs = _rows(3000, dim=32, seed=1)
+    exact, ivf = BruteForceIndex(), IVFIndex(n_lists=32, probes=1)
+    exact.add(rows)
+    ivf.add(rows)
+    assert ivf.centroids is not None
+
+    def recall(probes):
+        found = 0
+        for q in vecs[:50]:
+            truth = {cid for cid, _ in exact.search(q, k=10)}
+            found += len(truth & {cid for cid, _ in ivf.search(q, k=10, probes=probes)})
+        return found / 500
+
+    assert recall(32) == 1.0
+    assert recall(8) >= recall(1)
+
+
+def test_ivf_retrains_off_the_event_loop():
+    rows, vecs = _rows(600, dim=32, seed=2)
+
+    async def run():
+        ivf = IVFIndex(n_lists=8, probes=8)
+        ivf.min_train_rows = 100
+        ivf.add(rows[:200])
+        # searches stay exact while the first fit runs in a thread
+        assert ivf.centroids is None and ivf._training is not None
+        assert ivf.search(vecs[3], k=1)[0][0] == "c3"
+        await asyncio.sleep(0)  # the fit has started
+        ivf.add(rows[200:300])
+        await ivf._training
+        return ivf
+
+    ivf = asyncio.run(run())
+    assert ivf.centroids is not None and ivf._trained_on == 200
+    # rows that arrived during the fit were assigned once the new lists went in
+    listed = np.sort(np.concatenate([part for lst in ivf._lists for part in lst]))
+    assert listed.tolist() == list(range(300))
+    assert ivf.search(vecs[250], k=1, probes=8)[0][0] == "c250"
+
+
+def test_store_is_contiguous_float32_and_appends_incrementally():
+    rows, vecs = _rows(10)
+    store = EmbeddingStore()
+    start, block = store.add(rows[:6])
+    assert start == 0 and block.shape == (6, 16)
+    start, block = store.add(rows[4:])
+    assert start == 6 and block.shape == (4, 16)
+
+    assert store.vectors.dtype == np.float32
+    assert store.vectors.flags["C_CONTIGUOUS"]
+    assert np.allclose(np.linalg.norm(store.vectors, axis=1), 1.0)
+    assert store.row_of["c7"] == 7
+    assert store.stats()["bytes"] == 10 * 16 * 4
+
+
+def test_search_many_matches_single_queries(monkeypatch):
+    rows, vecs = _rows(500, seed=3)
+    index = BruteForceIndex()
+    index.add(rows)
+    monkeypatch.setattr(vector_index, "SEARCH_BLOCK_ROWS", 64)
+
+    batched = index.search_many(vecs[:20], k=7, exclude=[f"c{i}" for i in range(20)], agent_id="agent2")
+    for i, hits in enumerate(batched):
+        single = index.search(vecs[i], k=7, exclude=f"c{i}", agent_id="agent2")
+        assert [cid for cid, _ in hits] == [cid for cid, _ in single]
+        assert np.allclose([s for _, s in hits], [s for _, s in single], atol=1e-5)
+
+
+def test_background_refresh_is_kept_and_its_failure_logged(monkeypatch, capsys):
+    async def failing_refresh():
+        raise RuntimeError("db down")
+
+    stale = BruteForceIndex()
+    monkeypatch.setattr(vector_index, "_index", stale)
+    monkeypatch.setattr(vector_index, "_refresh", failing_refresh)
+
+    async def run():
+        assert await vector_index.get_vector_index(session=None) is stale
+        assert len(vector_index._refreshes) == 1
+        await asyncio.gather(*vector_index._refreshes, return_exceptions=True)
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert not vector_index._refreshes
+    assert "[WARN] Vector index refresh failed: RuntimeError('db down')" in capsys.readouterr().out
@@ -1,60 +1,199 @@
-from sentence_transformers import SentenceTransformer
-from transformers import pipeline
-import re
 import os
-from groq import Groq
-from typing import List
+import struct
+import threading
+import time
+import numpy as np
+from typing import Callable, List, Optional
 from dotenv import load_dotenv
+from app.metrics import span
+from utils.features import extract_features, feature_rows
+from utils.onnx_models import ONNX_QUANTIZE, load as load_onnx
+from utils.result_cache import ResultCache, open_cache
 load_dotenv()
 
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+EMBED_MODEL_NAME = "all-MiniLM-L6-v2"
+SENT_MODEL_ID = os.getenv("SENTIMENT_MODEL", "distilbert/distilbert-base-uncased-finetuned-sst-2-english")
+# torch, or onnx (ONNX Runtime, see utils.onnx_models) with torch as the fallback
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch").lower()
+# cached outputs are kept apart per backend, since quantised models differ slightly
+_BACKEND_TAG = "" if INFERENCE_BACKEND == "torch" else f"@onnx-{ONNX_QUANTIZE}"
+EMBED_CACHE_NAME = f"{EMBED_MODEL_NAME}{_BACKEND_TAG}"
+SENT_MODEL_NAME = f"sentiment:{SENT_MODEL_ID}{_BACKEND_TAG}"
 
-def generate_coaching_nudges(transcript: str) -> List[str]:
+
+class ModelRegistry:
+    """
+    Loads models on first use instead of at import time, so importing this
+    module (and the API that depends on it) never pulls in torch. `warm()`
+    loads models up front, e.g. from a FastAPI lifespan hook.
+    """
+
+    def __init__(self):
+        self._loaders: dict[str, Callable[[], object]] = {}
+        self._models: dict[str, object] = {}
+        self._lock = threading.Lock()
+        self.load_seconds: dict[str, float] = {}
+
+    def register(self, name: str, loader: Callable[[], object]):
+        self._loaders[name] = loader
+
+    def get(self, name: str):
+        model = self._models.get(name)
+        if model is None:
+            with self._lock:
+                model = self._models.get(name)
+                if model is None:
+                    started = time.perf_counter()
+                    model = self._models[name] = self._loaders[name]()
+                    self.load_seconds[name] = time.perf_counter() - started
+        return model
+
+    def warm(self, *names: str):
+        for name in names or self._loaders:
+            self.get(name)
+
+    def loaded(self) -> list[str]:
+        return list(self._models)
+
+
+def _torch_embedder():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(EMBED_MODEL_NAME)
+
+
+def _torch_sentiment():
+    from transformers import pipeline
+    return pipeline("sentiment-analysis", model=SENT_MODEL_ID)
+
+
+def _with_backend(kind: str, model_id: str, torch_loader: Callable[[], object]):
+    if INFERENCE_BACKEND == "onnx":
+        try:
+            return load_onnx(kind, model_id)
+        except Exception as e:
+            print(f"[WARN] ONNX {kind} model unavailable, falling back to torch: {e!r}")
+    return torch_loader()
+
+
+def _load_embedder():
+    return _with_backend("embed", EMBED_MODEL_NAME, _torch_embedder)
+
+
+def _load_sentiment():
+    return _with_backend("sentiment", SENT_MODEL_ID, _torch_sentiment)
+
+
+def _load_groq():
+    from groq import Groq
+    return Groq(api_key=os.getenv("GROQ_API_KEY"))
+
+
+MODELS = ModelRegistry()
+MODELS.register("embed", _load_embedder)
+MODELS.register("sentiment", _load_sentiment)
+MODELS.register("groq", _load_groq)
+
+
+NUDGE_MODEL = os.getenv("NUDGE_MODEL", "llama-3.1-8b-instant")
+
+
+def build_nudge_messages(transcript: str) -> list[dict]:
     system = {
         "role": "system",
-        "content": "You are a coaching assistant helping customer service agents improve their calls. Provide three concise nudges, each ≤ 40 words."
+        "content": "You are a coaching assistant helping customer service agents improve their calls. Provide three concise nudges, each ≤ 40 words."
     }
     user = {
         "role": "user",
         "content": f"Here is a call transcript:\n\n{transcript}"
     }
+    return [system, user]
 
-    response = client.chat.completions.create(
-        model="llama-3.1-8b-instant",
-        messages=[system, user],
-        temperature=0.3
-    )
 
-    raw = response.choices[0].message.content
+def parse_nudges(raw: str) -> List[str]:
     # Split lines and strip bullet markers
     nudges = [line.lstrip("-• ").strip() for line in raw.splitlines() if line.strip()]
     return nudges[:3]
 
-# Load model
-EMBED_MODEL = SentenceTransformer("all-MiniLM-L6-v2")
-SENT_PIPE = pipeline("sentiment-analysis")
-FILLERS = {"um", "uh", "ah", "like", "you know", "hmm"}
-WORD_RE = re.compile(r"\b\w+\b")
+
+def generate_coaching_nudges(transcript: str) -> List[str]:
+    with span("nudges"):
+        response = MODELS.get("groq").chat.completions.create(
+            model=NUDGE_MODEL,
+            messages=build_nudge_messages(transcript),
+            temperature=0.3
+        )
+    return parse_nudges(response.choices[0].message.content)
+
+
+_result_cache: Optional[ResultCache] = None
+_result_cache_opened = False
+
+
+def get_result_cache() -> Optional[ResultCache]:
+    global _result_cache, _result_cache_opened
+    if not _result_cache_opened:
+        _result_cache, _result_cache_opened = open_cache(), True
+    return _result_cache
+
+
+def _cached(model: str, texts: list[str], compute, encode, decode) -> list:
+    """
+    Map `compute` over `texts` through the result cache: duplicates are
+    computed once and only cache misses reach the model, in a single call.
+    """
+    unique = list(dict.fromkeys(texts))
+    cache = get_result_cache()
+    hits = cache.get_many(model, unique) if cache else [None] * len(unique)
+    values = {t: decode(v) for t, v in zip(unique, hits) if v is not None}
+    misses = [t for t in unique if t not in values]
+    if misses:
+        computed = list(compute(misses))
+        values.update(zip(misses, computed))
+        if cache:
+            cache.put_many(model, {t: encode(v) for t, v in zip(misses, computed)})
+    return [values[t] for t in texts]
+
+
+def split_sentences(transcript: str) -> list[str]:
+    return [s.strip() for s in transcript.split('.') if s.strip()]
 
 
 def compute_embeddings(transcript: str) -> list[float]:
     """
     Split transcript into sentences, compute embeddings, and return mean vector.
     """
-    sentences = [s.strip() for s in transcript.split('.') if s.strip()]
+    return compute_embeddings_batch([transcript])[0]
+
+
+def compute_embeddings_batch(transcripts: list[str], batch_size: int = 64) -> list[list[float]]:
+    """
+    Embed many transcripts with a single encoder call: sentences from every
+    transcript are flattened into one batch and mean-pooled back per transcript.
+    Sentence embeddings are cached, so boilerplate lines are encoded once.
+    Transcripts without sentences get an empty list.
+    """
+    per_doc = [split_sentences(t) for t in transcripts]
+    sentences = [s for doc in per_doc for s in doc]
     if not sentences:
-        return []
-    # Compute embeddings
-    vectors = EMBED_MODEL.encode(sentences, show_progress_bar=False)
-    # Average across sentences
-    mean_vec = vectors.mean(axis=0)
-    return mean_vec.tolist()
+        return [[] for _ in transcripts]
+    def embed(batch):
+        with span("embeddings"):
+            return MODELS.get("embed").encode(batch, batch_size=batch_size, show_progress_bar=False)
 
+    vectors = np.vstack(_cached(
+        EMBED_CACHE_NAME, sentences, embed,
+        encode=lambda v: np.asarray(v, dtype="<f4").tobytes(),
+        decode=lambda b: np.frombuffer(b, dtype="<f4"),
+    ))
 
-def compute_sentiment_score(transcript: str) -> float:
-    # Truncate to first 512 characters to limit processing
-    snippet = transcript[:512]
-    result = SENT_PIPE(snippet)[0]
+    counts = np.array([len(doc) for doc in per_doc])
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    sums = np.add.reduceat(vectors, starts[counts > 0], axis=0)
+    means = iter(sums / counts[counts > 0, None])
+    return [next(means).tolist() if n else [] for n in counts]
+
+
+def _signed_score(result: dict) -> float:
     score = result.get("score", 0.0)
     label = result.get("label", "NEUTRAL")
     if label.upper().startswith("NEGATIVE"):
@@ -62,25 +201,41 @@ def compute_sentiment_score(transcript: str) -> float:
     return score
 
 
+def compute_sentiment_score(transcript: str) -> float:
+    return compute_sentiment_batch([transcript])[0]
+
+
+def compute_sentiment_batch(transcripts: list[str], batch_size: int = 32) -> list[float]:
+    # Truncate to first 512 characters to limit processing
+    snippets = [t[:512] for t in transcripts]
+
+    def classify(batch):
+        with span("sentiment"):
+            return [_signed_score(r) for r in MODELS.get("sentiment")(batch, batch_size=batch_size)]
+
+    return _cached(
+        SENT_MODEL_NAME, snippets, classify,
+        encode=lambda v: struct.pack("<d", v),
+        decode=lambda b: struct.unpack("<d", b)[0],
+    )
+
+
 def compute_agent_talk_ratio(transcript: str) -> float:
-    total_words = 0
-    agent_words = 0
-
-    for line in transcript.split('\n'):
-        # Determine speaker
-        if line.startswith("Agent"):
-            speaker = "agent"
-        else:
-            speaker = "customer"
-        # Extract words
-        words = WORD_RE.findall(line.lower())
-        # Filter out fillers
-        words = [w for w in words if w not in FILLERS]
-        count = len(words)
-        total_words += count
-        if speaker == "agent":
-            agent_words += count
-
-    if total_words == 0:
-        return 0.0
-    return agent_words / total_words
+    # for many transcripts, call extract_features once instead
+    return float(extract_features([transcript])["agent_talk_ratio"][0])
+
+
+def compute_insights_batch(
+    transcripts: list[str], line_times: Optional[list[Optional[list[float]]]] = None
+) -> list[tuple[list[float], float, dict]]:
+    """
+    (embedding, sentiment, features) for each transcript, where features holds
+    agent_talk_ratio and the FEATURE_COLUMNS of utils.features, ready to be
+    merged into a call_insights row. `line_times` (epoch seconds per transcript
+    line) enables the response-time features. Module-level so it can be
+    shipped to a process pool.
+    """
+    embeddings = compute_embeddings_batch(transcripts)
+    sentiments = compute_sentiment_batch(transcripts)
+    features = feature_rows(extract_features(transcripts, line_times))
+    return list(zip(embeddings, sentiments, features))
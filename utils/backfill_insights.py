@@ -1,33 +1,183 @@
+import argparse
 import asyncio
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+
+from app.bulk import copy_insert
+from app.cache import invalidate
+from app.conversations import read_raw_many, transcript_times
 from app.db import SessionLocal
-from app.models import Call, CallInsight
-from ai_utils import compute_embeddings, compute_sentiment_score, compute_agent_talk_ratio
+from app.models import INSIGHT_JOIN, Call, CallInsight
+from app.nudges import NudgeService
+from app.rollups import apply_rollups, rebuild_rollups
+from utils.ai_utils import compute_insights_batch, get_result_cache
+from utils.features import extract_features, feature_rows
+
+CHUNK_SIZE = int(os.getenv("BACKFILL_CHUNK_SIZE", "512"))
+WORKERS = int(os.getenv("BACKFILL_WORKERS", "0"))
+
+
+async def next_page(session: AsyncSession, after: str, limit: int) -> list[tuple[str, str, datetime]]:
+    """
+    Next `limit` calls without insights, keyset-paginated on call_id so each
+    page is an index range scan no matter how far into the table we are.
+    """
+    stmt = (
+        select(Call.call_id, Call.transcript, Call.start_time)
+        .outerjoin(CallInsight, INSIGHT_JOIN)
+        .where(CallInsight.call_id.is_(None), Call.call_id > after)
+        .order_by(Call.call_id)
+        .limit(limit)
+    )
+    return (await session.execute(stmt)).all()
+
+
+async def compute_page(
+    page: list[tuple[str, str, datetime]], executor: Executor | None, workers: int
+) -> list[dict]:
+    """
+    Split a page into one sub-batch per worker and run inference off the event
+    loop; each sub-batch is a single encoder/sentiment call.
+    """
+    loop = asyncio.get_running_loop()
+    step = max(1, -(-len(page) // max(workers, 1)))
+    batches = [page[i:i + step] for i in range(0, len(page), step)]
+    results = await asyncio.gather(*(
+        loop.run_in_executor(executor, compute_insights_batch, [t for _, t, _ in batch])
+        for batch in batches
+    ))
+    return [
+        {
+            "call_id": call_id,
+            "start_time": start_time,
+            "embedding": emb,
+            "customer_sentiment": sent,
+            **features,
+        }
+        for batch, insights in zip(batches, results)
+        for (call_id, _, start_time), (emb, sent, features) in zip(batch, insights)
+    ]
+
+
+async def next_feature_page(session: AsyncSession, after: str, limit: int) -> list[tuple[str, str, datetime]]:
+    """Next `limit` calls whose insights predate the conversation features."""
+    stmt = (
+        select(Call.call_id, Call.transcript, Call.start_time)
+        .join(CallInsight, INSIGHT_JOIN)
+        .where(CallInsight.agent_words.is_(None), Call.call_id > after)
+        .order_by(Call.call_id)
+        .limit(limit)
+    )
+    return (await session.execute(stmt)).all()
 
-async def backfill():
+
+def feature_updates(page: list[tuple[str, str, datetime]]) -> list[dict]:
+    """Feature columns for a page of calls, timed from their raw conversations where stored."""
+    convos = read_raw_many([call_id for call_id, _, _ in page])
+    times = [transcript_times(convos[call_id]) if call_id in convos else None for call_id, _, _ in page]
+    rows = feature_rows(extract_features([t for _, t, _ in page], times))
+    return [
+        {"call_id": call_id, "start_time": start_time, **row}
+        for (call_id, _, start_time), row in zip(page, rows)
+    ]
+
+
+async def backfill_features(chunk_size: int = CHUNK_SIZE, after: str = ""):
+    """
+    Fill the conversation feature columns of insights written before they
+    existed, a keyset-ordered chunk per transaction. agent_talk_ratio is
+    recomputed too (speaker labels and "you know" no longer count as words),
+    so agent_daily_stats is rebuilt at the end.
+    """
+    done, last, started = 0, after, time.perf_counter()
     async with SessionLocal() as session:
-        # Fetch calls without insights
-        result = await session.execute(
-            select(Call).outerjoin(CallInsight).where(CallInsight.call_id == None)
-        )
-        calls = result.scalars().all()
-
-        for call in calls:
-            emb   = compute_embeddings(call.transcript)
-            sent  = compute_sentiment_score(call.transcript)
-            ratio = compute_agent_talk_ratio(call.transcript)
-
-            insight = CallInsight(
-                call_id=call.call_id,
-                embedding=emb,
-                customer_sentiment=sent,
-                agent_talk_ratio=ratio
-            )
-            session.add(insight)
-
-        await session.commit()
-        print(f"Backfilled insights for {len(calls)} calls.")
+        while page := await next_feature_page(session, last, chunk_size):
+            last = page[-1][0]
+            rows = await asyncio.to_thread(feature_updates, page)
+            # bulk UPDATE by primary key: one executemany per chunk
+            await session.execute(update(CallInsight), rows)
+            await session.commit()
+            done += len(rows)
+            rate = done / (time.perf_counter() - started)
+            print(f"[INFO] Backfilled features for {done} calls ({rate:.1f} calls/sec), resume with --after {last}")
+        if done:
+            await rebuild_rollups(session)
+            await session.commit()
+            await invalidate("insights")
+    print(f"Backfilled conversation features for {done} calls.")
+
+
+async def backfill(
+    chunk_size: int = CHUNK_SIZE,
+    workers: int = WORKERS,
+    after: str = "",
+    nudges: bool = False,
+):
+    """
+    Stream calls without insights in keyset-ordered chunks, compute insights
+    for a whole chunk at once and commit it with a single
+    COPY + INSERT ... ON CONFLICT DO NOTHING. A crash loses at most the chunk in
+    flight, and re-running picks up wherever the anti-join says work remains.
+    With `nudges`, coaching nudges are generated and persisted for each chunk
+    too, so the recommendations endpoint can serve them from cache.
+    """
+    executor = None
+    if workers > 0:
+        executor = ProcessPoolExecutor(workers, mp_context=get_context("spawn"))
+
+    nudge_service = NudgeService() if nudges else None
+    done, last, started = 0, after, time.perf_counter()
+    try:
+        async with SessionLocal() as session:
+            page = await next_page(session, last, chunk_size)
+            while page:
+                last = page[-1][0]
+                # Prefetch the next page while this one is on the workers
+                current = page
+                rows, page = await asyncio.gather(
+                    compute_page(current, executor, workers),
+                    next_page(session, last, chunk_size),
+                )
+                result = await copy_insert(session, CallInsight, rows, returning="call_id")
+                await apply_rollups(session, result.keys)
+                await session.commit()
+                if result.inserted:
+                    await invalidate("insights")
+                if nudge_service is not None:
+                    await nudge_service.precompute([(call_id, t) for call_id, t, _ in current])
+
+                done += result.inserted
+                rate = done / (time.perf_counter() - started)
+                print(f"[INFO] Backfilled {done} calls ({rate:.1f} calls/sec), resume with --after {last}")
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        if nudge_service is not None:
+            await nudge_service.aclose()
+
+    print(f"Backfilled insights for {done} calls.")
+    cache = get_result_cache()
+    if cache is not None and workers == 0:
+        print(f"[INFO] Result cache: {cache.stats()}")
+
 
 if __name__ == "__main__":
-    asyncio.run(backfill())
+    parser = argparse.ArgumentParser(description="Compute insights for calls that have none.")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=WORKERS,
+                        help="inference processes; 0 runs inference on a thread in this process")
+    parser.add_argument("--after", default="", help="only consider call_ids greater than this")
+    parser.add_argument("--nudges", action="store_true", help="also precompute coaching nudges")
+    parser.add_argument("--features", action="store_true",
+                        help="instead fill the conversation feature columns of existing insights")
+    args = parser.parse_args()
+    if args.features:
+        asyncio.run(backfill_features(args.chunk_size, args.after))
+    else:
+        asyncio.run(backfill(args.chunk_size, args.workers, args.after, args.nudges))
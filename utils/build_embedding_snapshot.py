@@ -0,0 +1,50 @@
+import argparse
+import asyncio
+import time
+from pathlib import Path
+
+from app.db import SessionLocal
+from app.embedding_snapshot import EMBEDDING_SNAPSHOT_DIR, open_snapshot, write_snapshot
+from app.embedding_store import EmbeddingStore
+
+
+async def build(root: Path = Path(EMBEDDING_SNAPSHOT_DIR), full: bool = False) -> int:
+    """
+    Publish a new snapshot generation for the API workers to map. By default
+    it starts from the current generation and only reads insights created
+    since, leaving out months removed by partition retention; `full`
+    re-reads every embedding, which also drops calls deleted any other way.
+    """
+    started = time.perf_counter()
+    previous = None if full else open_snapshot(root)
+    store = EmbeddingStore(snapshot=previous)
+    async with SessionLocal() as session:
+        _, new = await store.refresh(session)
+    live = store.filter_mask()  # None unless retention has removed months
+    if previous is not None and not len(new) and (live is None or live.all()):
+        print(f"No changes since generation {previous.generation}.")
+        return previous.generation
+    ids, vectors, codes, times, agents = store.arrays()
+    generation = await asyncio.to_thread(write_snapshot, root, ids, vectors, codes, times, agents, store.cursor)
+    print(
+        f"Wrote embedding snapshot generation {generation}: {len(store)} rows ({len(new)} new) "
+        f"in {time.perf_counter() - started:.1f}s."
+    )
+    return generation
+
+
+async def main(root: Path, full: bool, every: float):
+    while True:
+        await build(root, full)
+        if not every:
+            return
+        await asyncio.sleep(every)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write the memory-mapped embedding snapshot the API workers share.")
+    parser.add_argument("--root", type=Path, default=Path(EMBEDDING_SNAPSHOT_DIR))
+    parser.add_argument("--full", action="store_true", help="re-read every embedding instead of extending the current generation")
+    parser.add_argument("--every", type=float, default=0, help="keep running, publishing a generation every N seconds")
+    args = parser.parse_args()
+    asyncio.run(main(args.root, args.full, args.every))
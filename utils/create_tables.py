@@ -1,10 +1,13 @@
 
 import asyncio
 from app.db import engine, Base
+from app.partitions import ensure_future_partitions
 
 async def create():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+    # calls_db and call_insights only accept rows for months with a partition
+    await ensure_future_partitions(engine=engine)
 
 if __name__ == "__main__":
     asyncio.run(create())
@@ -0,0 +1,252 @@
+import re
+from typing import Optional, Sequence
+
+import numpy as np
+
+FILLERS = ("um", "uh", "ah", "like", "hmm")
+FILLER_PHRASES = (("you", "know"),)
+SPEAKERS = ("Agent", "Customer")
+_WORD_CHAR = re.compile(r"\w")
+_ASCII_WORD = np.array([bool(_WORD_CHAR.match(chr(c))) for c in range(128)])
+
+FEATURE_COLUMNS = (
+    "agent_words",
+    "customer_words",
+    "agent_turns",
+    "customer_turns",
+    "agent_filler_rate",
+    "customer_filler_rate",
+    "first_response_seconds",
+    "avg_response_gap_seconds",
+)
+
+
+def _per_speaker(doc: np.ndarray, is_agent: np.ndarray, weights: np.ndarray, n_docs: int) -> np.ndarray:
+    """(n_docs, 2) sums of `weights` by document and speaker; column 1 is the agent."""
+    return np.bincount(doc * 2 + is_agent, weights=weights, minlength=2 * n_docs).reshape(n_docs, 2)
+
+
+def _is_word_char(cp: np.ndarray) -> np.ndarray:
+    """`\\w` per codepoint: a table for ASCII, the regex once per distinct other codepoint."""
+    ascii_ = cp < 128
+    out = _ASCII_WORD[np.where(ascii_, cp, 0)]
+    if not ascii_.all():
+        other, inverse = np.unique(cp[~ascii_], return_inverse=True)
+        out[~ascii_] = np.array([bool(_WORD_CHAR.match(chr(c))) for c in other])[inverse]
+    return out
+
+
+def _matches(cp: np.ndarray, at: np.ndarray, literal: str, fold: bool = False) -> np.ndarray:
+    """
+    Whether `literal` occurs at each position in `at`; `fold` compares ASCII
+    letters case-insensitively. `cp` must be padded by len(literal).
+    """
+    hit = np.ones(len(at), dtype=bool)
+    for k, ch in enumerate(literal):
+        hit &= (cp[at + k] | 32 if fold else cp[at + k]) == ord(ch)
+    return hit
+
+
+def _word_counts(
+    text: str, n_msgs: int, strip_speakers: bool = False
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Per newline-delimited message of `text`: words, words that aren't fillers,
+    filler occurrences ("you know" counts once) and whether the message
+    starts with "Agent" or with "Customer". The text is decoded to codepoints
+    once and words are found as runs of word characters; everything after
+    that is array arithmetic on word boundaries. With `strip_speakers`,
+    "Agent (...):"/"Customer (...):" prefixes are not counted as words.
+    """
+    pad = max(len(w) for w in (*FILLERS, *SPEAKERS, *(w for p in FILLER_PHRASES for w in p)))
+    cp = np.frombuffer(text.encode("utf-32-le") + bytes(4 * pad), dtype=np.uint32)
+    n = len(cp) - pad
+    newlines = np.flatnonzero(cp[:n] == 10)
+    line_start = np.concatenate(([0], newlines + 1))
+
+    word = _is_word_char(cp[:n])
+    edges = np.flatnonzero(np.diff(word.view(np.int8), prepend=0, append=0))
+    starts, ends = edges[::2], edges[1::2]
+    length = ends - starts
+    word_msg = np.searchsorted(newlines, starts)
+
+    is_agent = _matches(cp, line_start, "Agent")
+    is_customer = _matches(cp, line_start, "Customer")
+    if strip_speakers:
+        # drop the words up to the first colon of labelled lines
+        labelled = is_agent | is_customer
+        colons = np.append(np.flatnonzero(cp[:n] == ord(":")), n)
+        colon = colons[np.searchsorted(colons, line_start)]
+        line_end = np.append(newlines, n)
+        prefix_end = np.where(labelled & (colon < line_end), colon, -1)
+        keep = starts > prefix_end[word_msg]
+        starts, ends, length, word_msg = starts[keep], ends[keep], length[keep], word_msg[keep]
+
+    def is_(w: str, idx: np.ndarray) -> np.ndarray:
+        hit = length[idx] == len(w)
+        hit[hit] = _matches(cp, starts[idx[hit]], w, fold=True)
+        return hit
+
+    every = np.arange(len(starts))
+    single = np.zeros(len(starts), dtype=bool)
+    for w in FILLERS:
+        single |= is_(w, every)
+    in_phrase = np.zeros(len(starts), dtype=bool)
+    phrase_starts = np.zeros(len(starts), dtype=bool)
+    for phrase in FILLER_PHRASES:
+        first = np.arange(max(len(starts) - len(phrase) + 1, 0))
+        first = first[is_(phrase[0], first)]
+        for k in range(1, len(phrase)):
+            # next word of the phrase, separated only by spaces/tabs
+            first = first[is_(phrase[k], first + k)]
+            gap_from, gap_len = ends[first + k - 1], starts[first + k] - ends[first + k - 1]
+            blank = np.ones(len(first), dtype=bool)
+            for j in range(int(gap_len.max()) if len(first) else 0):
+                c = cp[np.minimum(gap_from + j, n)]
+                blank &= (j >= gap_len) | (c == 32) | (c == 9)
+            first = first[blank]
+        phrase_starts[first] = True
+        for k in range(len(phrase)):
+            in_phrase[first + k] = True
+    single &= ~in_phrase
+
+    raw = np.bincount(word_msg, minlength=n_msgs)
+    kept = np.bincount(word_msg[~(single | in_phrase)], minlength=n_msgs)
+    said = np.bincount(word_msg[single | phrase_starts], minlength=n_msgs)
+    return raw, kept, said, is_agent, is_customer
+
+
+def _features(
+    lengths: np.ndarray,
+    is_agent: np.ndarray,
+    raw: np.ndarray,
+    kept: np.ndarray,
+    said: np.ndarray,
+    times: Optional[np.ndarray],
+) -> dict[str, np.ndarray]:
+    n_docs, n_msgs = len(lengths), len(is_agent)
+    msg_doc = np.repeat(np.arange(n_docs), lengths)
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1])).astype(np.int64)
+    agent = is_agent.astype(np.int64)
+    raw_by = _per_speaker(msg_doc, agent, raw, n_docs)
+    kept_by = _per_speaker(msg_doc, agent, kept, n_docs)
+    said_by = _per_speaker(msg_doc, agent, said, n_docs)
+
+    # a turn is a run of consecutive (non-empty) messages from the same speaker
+    spoken = np.flatnonzero(raw > 0)
+    doc, who = msg_doc[spoken], agent[spoken]
+    new_turn = np.ones(len(spoken), dtype=bool)
+    new_turn[1:] = (who[1:] != who[:-1]) | (doc[1:] != doc[:-1])
+    turns_by = _per_speaker(doc, who, new_turn, n_docs)
+
+    total = kept_by.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        talk_ratio = np.where(total > 0, kept_by[:, 1] / total, 0.0)
+        filler_rate = np.where(raw_by > 0, said_by / raw_by, 0.0)
+
+    first_response = np.full(n_docs, np.nan)
+    avg_gap = np.full(n_docs, np.nan)
+    if times is not None and n_msgs:
+        # agent replies directly following a customer message in the same conversation
+        reply = np.zeros(n_msgs, dtype=bool)
+        reply[1:] = is_agent[1:] & ~is_agent[:-1] & (msg_doc[1:] == msg_doc[:-1])
+        at = np.flatnonzero(reply)
+        gaps = times[at] - times[at - 1]
+        valid = ~np.isnan(gaps)
+        count = np.bincount(msg_doc[at][valid], minlength=n_docs)
+        sums = np.bincount(msg_doc[at][valid], weights=gaps[valid], minlength=n_docs)
+        avg_gap = np.where(count > 0, sums / np.maximum(count, 1), np.nan)
+
+        # from the opening customer message to the first agent message
+        docs = np.flatnonzero(lengths > 0)
+        first_agent = np.minimum.reduceat(np.where(is_agent, np.arange(n_msgs), n_msgs), starts[docs])
+        opened = ~is_agent[starts[docs]] & (first_agent < n_msgs)
+        docs, first_agent = docs[opened], first_agent[opened]
+        first_response[docs] = times[first_agent] - times[starts[docs]]
+
+    return {
+        "agent_talk_ratio": talk_ratio,
+        "agent_words": kept_by[:, 1].astype(np.int64),
+        "customer_words": kept_by[:, 0].astype(np.int64),
+        "agent_turns": turns_by[:, 1].astype(np.int64),
+        "customer_turns": turns_by[:, 0].astype(np.int64),
+        "agent_filler_rate": filler_rate[:, 1],
+        "customer_filler_rate": filler_rate[:, 0],
+        "first_response_seconds": first_response,
+        "avg_response_gap_seconds": avg_gap,
+    }
+
+
+def message_features(
+    lengths: Sequence[int],
+    is_agent: Sequence[bool],
+    texts: Sequence[str],
+    times: Optional[Sequence[float]] = None,
+) -> dict[str, np.ndarray]:
+    """
+    Conversation features from columnar message arrays, e.g. a conversation
+    frame from ingest: conversation i is the next lengths[i] entries of
+    `is_agent`/`texts`/`times` (epoch seconds, NaN when unknown).
+
+    Returns one array per FEATURE_COLUMNS entry plus agent_talk_ratio. Word
+    counts and the talk ratio exclude fillers ("you know" included); filler
+    rates are fillers per word spoken. Response gaps run from a customer
+    message to the agent message answering it; without times they are NaN.
+    """
+    lengths = np.asarray(lengths, dtype=np.int64)
+    is_agent = np.asarray(is_agent, dtype=bool)
+    joined = "\n".join(texts)
+    if joined.count("\n") != max(len(texts) - 1, 0):
+        # newlines inside a message are just whitespace
+        joined = "\n".join(t.replace("\n", " ") for t in texts)
+    raw, kept, said, _, _ = _word_counts(joined, len(is_agent))
+    times = None if times is None else np.asarray(times, dtype=np.float64)
+    return _features(lengths, is_agent, raw, kept, said, times)
+
+
+def extract_features(
+    transcripts: Sequence[str],
+    line_times: Optional[Sequence[Optional[Sequence[float]]]] = None,
+) -> dict[str, np.ndarray]:
+    """
+    `message_features` for stored transcripts: each line is a message, spoken
+    by the agent if it starts with "Agent" and by the customer if it starts
+    with "Customer", and its speaker prefix is not counted as words.
+    Unlabelled lines continue the labelled line above them (build_call keeps
+    a message's own newlines); those before a transcript's first labelled
+    line, such as system notes, are ignored. `line_times[i]`, if given, has
+    one time per line of transcript i; conversations without them get NaN
+    timings.
+    """
+    lengths = np.fromiter((t.count("\n") + 1 for t in transcripts), np.int64, len(transcripts))
+    n_lines = int(lengths.sum())
+    raw, kept, said, is_agent, is_customer = _word_counts("\n".join(transcripts), n_lines, strip_speakers=True)
+
+    times = None
+    if line_times is not None and any(t is not None for t in line_times):
+        times = np.full(n_lines, np.nan)
+        at = 0
+        for n, t in zip(lengths, line_times):
+            if t is not None and len(t) == n:
+                times[at:at + n] = t
+            at += n
+
+    # the speaker of each line is that of the last labelled line of its transcript
+    line_doc = np.repeat(np.arange(len(lengths)), lengths)
+    last = np.maximum.accumulate(np.where(is_agent | is_customer, np.arange(n_lines), -1))
+    source = np.maximum(last, 0)
+    spoken = (last >= 0) & (line_doc[source] == line_doc)
+    if not spoken.all():
+        lengths = np.bincount(line_doc[spoken], minlength=len(lengths))
+        raw, kept, said, source = raw[spoken], kept[spoken], said[spoken], source[spoken]
+        times = None if times is None else times[spoken]
+    return _features(lengths, is_agent[source], raw, kept, said, times)
+
+
+def feature_rows(features: dict[str, np.ndarray]) -> list[dict]:
+    """Per-conversation dicts of plain Python values (NaN as None) for inserting."""
+    columns = {
+        name: [None if v != v else v for v in values.tolist()]
+        for name, values in features.items()
+    }
+    return [dict(zip(columns, values)) for values in zip(*columns.values())]
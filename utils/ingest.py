@@ -1,153 +1,294 @@
+import argparse
 import json
 import asyncio
-from datetime import datetime, timezone
+import os
 from pathlib import Path
+from typing import Iterator
 
+import numpy as np
 import pandas as pd
 from sqlalchemy.exc import SQLAlchemyError
 
+from app.bulk import BulkResult, copy_insert
+from app.cache import invalidate
+from app.conversations import build_call, transcript_times, write_raw_many
 from app.db import SessionLocal
-from app.models import Call
-from ai_utils import (
-    compute_embeddings,
-    compute_sentiment_score,
-    compute_agent_talk_ratio,
-)
-from app.models import Call as CallModel
+from app.models import Call, CallInsight
+from app.partitions import ensure_partitions, month_start, retention_floor
+from app.rollups import apply_rollups
+from utils.ai_utils import compute_insights_batch
 
 CSV_FILE = "dataset/sample.csv"
-RAW_DIR = Path("data/raw")
-RAW_DIR.mkdir(parents=True, exist_ok=True)
+CHECKPOINT_FILE = Path("data/ingest_checkpoint.json")
+CHUNK_ROWS = int(os.getenv("INGEST_CHUNK_ROWS", "100000"))
+BATCH_CALLS = int(os.getenv("INGEST_BATCH_CALLS", "1000"))
+MAX_PENDING_ROWS = int(os.getenv("INGEST_MAX_PENDING_ROWS", "200000"))
 
 
-def parse_datetime(ts: str) -> datetime:
-    try:
-        dt = datetime.strptime(ts, "%a %b %d %H:%M:%S %z %Y")
-        dt = dt.replace(tzinfo=None)
-    except ValueError:
-        dt = datetime.strptime(ts, "%a %b %d %H:%M:%S %Y")
-    return dt
-
-def normalize_conversations(df: pd.DataFrame):
-    tweet_map = {row["tweet_id"]: row for _, row in df.iterrows()}
+def build_threads(
+    df: pd.DataFrame, can_start: np.ndarray | None = None
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Reconstruct reply threads with integer-indexed NumPy arrays.
+
+    Each agent reply that answers something starts a thread running from its
+    root tweet down to the reply; a reply is skipped when an earlier reply
+    further down the same chain already covered it. Returns (order, offsets):
+    thread i is the row positions order[offsets[i]:offsets[i + 1]], root first,
+    in the order the starting replies appear in `df`. Rows where `can_start`
+    is False still serve as ancestors but never start a thread.
+    """
+    n = len(df)
+    pos = np.arange(n)
+    ids = pd.Index(df["tweet_id"].to_numpy())
+    if not ids.is_unique:
+        # Match dict semantics: a repeated tweet_id resolves to its last row
+        keep = ~ids.duplicated(keep="last")
+        lookup, lookup_pos = ids[keep], pos[keep]
+    else:
+        lookup, lookup_pos = ids, pos
+
+    reply_to = df["in_response_to_tweet_id"].to_numpy()
+    has_reply_to = pd.notnull(reply_to)
+    parent = np.full(n, -1, dtype=np.int64)
+    found = lookup.get_indexer(reply_to[has_reply_to])
+    parent[has_reply_to] = np.where(found >= 0, lookup_pos[found], -1)
+
+    # Pointer jumping: afterwards hop[i] is i's root and depth[i] its distance
+    hop = np.where(parent >= 0, parent, pos)
+    depth = (parent >= 0).astype(np.int64)
+    for _ in range(64):
+        nxt = hop[hop]
+        if np.array_equal(nxt, hop):
+            break
+        depth, hop = depth + depth[hop], nxt
+    else:
+        raise ValueError("in_response_to_tweet_id contains a reply cycle")
+
+    # A candidate start is skipped iff an earlier candidate sits below it, so
+    # push the smallest candidate position up the tree one level at a time.
+    is_start = ~df["inbound"].to_numpy(dtype=bool) & has_reply_to
+    if can_start is not None:
+        is_start &= can_start
+    own = np.where(is_start, pos, n)
+    below = np.full(n, n, dtype=np.int64)
+    by_depth = np.argsort(-depth, kind="stable")
+    bounds = np.flatnonzero(np.diff(depth[by_depth])) + 1
+    for level in np.split(by_depth, bounds):
+        level = level[parent[level] >= 0]
+        if len(level):
+            np.minimum.at(below, parent[level], np.minimum(own[level], below[level]))
+    starts = np.flatnonzero(is_start & (below > pos))
+
+    lengths = depth[starts] + 1
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    order = np.empty(offsets[-1], dtype=np.int64)
+    cur, last = starts.copy(), offsets[1:] - 1
+    for step in range(int(lengths.max()) if len(lengths) else 0):
+        live = lengths > step
+        order[last[live] - step] = cur[live]
+        cur[live] = parent[cur[live]]
+    return order, offsets
+
+
+def normalize_conversations(df: pd.DataFrame) -> list[list[dict]]:
+    order, offsets = build_threads(df)
+    records = df.iloc[order].to_dict("records")
+    return [records[a:b] for a, b in zip(offsets[:-1], offsets[1:])]
+
+def _split_window(
+    frame: pd.DataFrame, final: bool, max_pending: int
+) -> tuple[list[list[dict]], pd.DataFrame]:
+    """
+    Thread one window of rows and decide what can be emitted now.
+
+    A thread whose root still answers a tweet we haven't seen may get its
+    parent in a later chunk, so it stays pending unless this is the last
+    window or its start is about to fall out of the pending buffer. So does
+    any thread starting after the first such open start: the missing parent
+    may turn out to hang below it, and the earlier start would then replace
+    it, as in the whole-file threading. Rows of emitted threads are kept
+    (marked visited) as ancestor context for late replies. Returns the
+    finished conversations and the rows to carry over.
+    """
+    visited = frame["_visited"].to_numpy(dtype=bool, copy=True)
+    order, offsets = build_threads(frame, can_start=~visited)
+    roots, starts = order[offsets[:-1]], order[offsets[1:] - 1]
+
+    cutoff = 0 if final else max(0, len(frame) - max_pending)
+    if final:
+        emit = np.ones(len(roots), dtype=bool)
+    else:
+        root_open = frame["in_response_to_tweet_id"].notna().to_numpy()[roots]
+        forced = starts < cutoff
+        # the earliest open start is also the earliest open candidate anywhere
+        # in the window, since an open chain's first candidate always starts
+        first_open = starts[root_open & ~forced].min(initial=len(frame))
+        emit = (~root_open & (starts < first_open)) | forced
+
+    columns = [c for c in frame.columns if not c.startswith("_")]
     conversations = []
-    visited = set()
-
-    for _, row in df.iterrows():
-        tid = row["tweet_id"]
-        if tid in visited:
-            continue
-
-        # start only at an agent’s reply
-        if not row["inbound"] and pd.notnull(row["in_response_to_tweet_id"]):
-            thread = []
-            current = row
-            while True:
-                thread.append(current)
-                visited.add(current["tweet_id"])
-
-                parent = current["in_response_to_tweet_id"]
-                if pd.isna(parent) or parent not in tweet_map:
-                    break
-                current = tweet_map[parent]
-
-            conversations.append(list(reversed(thread)))
-
-    return conversations
-
-def build_call(convo: list[dict]):
-    start = parse_datetime(convo[0]["created_at"])
-    end   = parse_datetime(convo[-1]["created_at"])
-    duration = int((end - start).total_seconds())
-
-    # Identifing agent or customer
-    agent = next((m for m in convo if not m["inbound"]), None)
-    cust  = next((m for m in convo if     m["inbound"]), None)
-    if agent is None or cust is None:
-        return None
-
-    # Full transcript
-    lines = []
-    for m in convo:
-        speaker = "Agent" if not m["inbound"] else "Customer"
-        lines.append(f"{speaker} ({m['author_id']}): {m['text']}")
-    transcript = "\n".join(lines)
-
-    return {
-        "call_id":           str(agent["tweet_id"]),
-        "agent_id":          agent["author_id"],
-        "customer_id":       cust["author_id"],
-        "language":          "en",
-        "start_time":        start,
-        "duration_seconds":  duration,
-        "transcript":        transcript,
-    }
-
-async def insert_call_with_insights(call_dict: dict, convo: list[dict]):
-    call_id = call_dict["call_id"]
-    print(f"[DEBUG] Preparing to insert call {call_id}")
-    
-    raw_path = RAW_DIR / f"{call_id}.json"
-    with open(raw_path, "w", encoding="utf-8") as f:
-        json.dump([{
-            "tweet_id": m["tweet_id"],
-            "author_id": m["author_id"],
-            "inbound": m["inbound"],
-            "created_at": m["created_at"],
-            "text": m["text"]
-        } for m in convo], f, ensure_ascii=False, indent=2)
-
-    embedding = compute_embeddings(call_dict["transcript"])
-    sentiment = compute_sentiment_score(call_dict["transcript"])
-    talk_ratio = compute_agent_talk_ratio(call_dict["transcript"])
-
-    call_row = CallModel(
-        call_id             = call_id,
-        agent_id            = call_dict["agent_id"],
-        customer_id         = call_dict["customer_id"],
-        language            = call_dict["language"],
-        start_time          = call_dict["start_time"],
-        duration_seconds    = call_dict["duration_seconds"],
-        transcript          = call_dict["transcript"],
-        embedding           = embedding,
-        customer_sentiment  = sentiment,
-        agent_talk_ratio    = talk_ratio,
+    for i in np.flatnonzero(emit):
+        rows = order[offsets[i]:offsets[i + 1]]
+        conversations.append(frame.iloc[rows][columns].to_dict("records"))
+        visited[rows] = True
+
+    carry = frame.iloc[cutoff:].copy()
+    carry["_visited"] = visited[cutoff:]
+    return conversations, carry
+
+
+def iter_conversation_chunks(
+    csv_path: str,
+    chunk_rows: int = CHUNK_ROWS,
+    max_pending: int = MAX_PENDING_ROWS,
+    skip_rows: int = 0,
+) -> Iterator[tuple[list[list[dict]], int]]:
+    """
+    Stream conversations out of a CSV without loading it whole.
+
+    Rows are read `chunk_rows` at a time; threads that cross a chunk boundary
+    wait in a pending buffer of at most `max_pending` rows. Yields
+    (conversations, resume_row) per chunk, where every row before resume_row
+    has been fully emitted, so a later run can restart from there.
+    """
+    reader = pd.read_csv(
+        csv_path, header=0, chunksize=chunk_rows,
+        skiprows=range(1, skip_rows + 1),
     )
+    carry, next_row = None, skip_rows
+    chunk = next(reader, None)
+    while chunk is not None:
+        upcoming = next(reader, None)
+        chunk = chunk.assign(
+            _row=np.arange(next_row, next_row + len(chunk)), _visited=False
+        )
+        next_row += len(chunk)
+        frame = chunk if carry is None else pd.concat([carry, chunk], ignore_index=True)
+        conversations, carry = _split_window(frame, upcoming is None, max_pending)
+
+        pending = carry.loc[~carry["_visited"], "_row"]
+        if upcoming is None or not len(pending):
+            yield conversations, next_row
+        else:
+            yield conversations, int(pending.min())
+        chunk = upcoming
+
+
+async def insert_calls_with_insights(
+    batch: list[tuple[dict, list[dict]]]
+) -> tuple[BulkResult, BulkResult]:
+    """
+    Write raw conversations, compute insights for the whole batch at once and
+    bulk-insert calls and insights in one transaction.
+    """
+    calls = [call_dict for call_dict, _ in batch]
+    write_raw_many([(call_dict["call_id"], convo) for call_dict, convo in batch])
 
+    insights = await asyncio.to_thread(
+        compute_insights_batch,
+        [c["transcript"] for c in calls],
+        [transcript_times(convo) for _, convo in batch],
+    )
+    insight_rows = [
+        {
+            "call_id": call_dict["call_id"],
+            "start_time": call_dict["start_time"],
+            "embedding": emb,
+            "customer_sentiment": sent,
+            **features,
+        }
+        for call_dict, (emb, sent, features) in zip(calls, insights)
+    ]
+
+    await ensure_partitions(c["start_time"] for c in calls)
     async with SessionLocal() as session:
         try:
-            session.add(call_row)
-            print(f"[DEBUG] Added call {call_id} to session")
-            await session.flush()
-            print(f"[DEBUG] Flushed call {call_id}")
-            await session.commit()
-            print(f"[INFO] Inserted call {call_id}")
+            async with session.begin():
+                call_result = await copy_insert(session, Call, calls)
+                insight_result = await copy_insert(session, CallInsight, insight_rows, returning="call_id")
+                await apply_rollups(session, insight_result.keys)
         except SQLAlchemyError as e:
-            await session.rollback()
-            print(f"[ERROR] Inserting call {call_id}: {e}")
+            print(f"[ERROR] Inserting batch starting at call {calls[0]['call_id']}: {e}")
             raise
+    if insight_result.inserted:
+        await invalidate("insights")
+    return call_result, insight_result
+
+
+def load_checkpoint(csv_path: str) -> int:
+    try:
+        state = json.loads(CHECKPOINT_FILE.read_text())
+    except (FileNotFoundError, ValueError):
+        return 0
+    return state["resume_row"] if state.get("csv") == csv_path else 0
+
+
+def save_checkpoint(csv_path: str, resume_row: int):
+    tmp = CHECKPOINT_FILE.with_suffix(".tmp")
+    tmp.write_text(json.dumps({"csv": csv_path, "resume_row": resume_row}))
+    tmp.replace(CHECKPOINT_FILE)
 
-async def main():
-    df = pd.read_csv(CSV_FILE, header=0)
-    conversations = normalize_conversations(df)
-    print(f"[DEBUG] {len(conversations)} threads found")
 
+async def flush_calls(batch: list[tuple[dict, list[dict]]], with_insights: bool = False) -> BulkResult:
+    """Insert one batch of calls in its own transaction, skipping known call_ids."""
+    floor = retention_floor()
+    if floor is not None:
+        kept = [item for item in batch if month_start(item[0]["start_time"]) >= floor]
+        if len(kept) < len(batch):
+            print(f"[WARN] Skipping {len(batch) - len(kept)} calls from before the retention window ({floor})")
+        if not kept:
+            return BulkResult(skipped=len(batch))
+        batch = kept
+    if with_insights:
+        result, _ = await insert_calls_with_insights(batch)
+        return result
+    await ensure_partitions(call_dict["start_time"] for call_dict, _ in batch)
     async with SessionLocal() as session:
         async with session.begin():
-            inserted = 0
-            for convo in conversations:
-                call_dict = build_call(convo)
-                if not call_dict:
-                    continue
-                # Check for existing call_id
-                exists = await session.get(Call, call_dict["call_id"])
-                if exists:
-                    print(f"[INFO] Skipping duplicate call_id {call_dict['call_id']}")
-                    continue
-                call_row = Call(**call_dict)
-                session.add(call_row)
-                inserted += 1
-        print(f"[DEBUG] Committed {inserted} calls")
+            return await copy_insert(session, Call, [call_dict for call_dict, _ in batch])
+
+
+async def main(
+    csv_path: str = CSV_FILE,
+    chunk_rows: int = CHUNK_ROWS,
+    batch_calls: int = BATCH_CALLS,
+    resume: bool = True,
+    with_insights: bool = False,
+):
+    skip_rows = load_checkpoint(csv_path) if resume else 0
+    if skip_rows:
+        print(f"[INFO] Resuming {csv_path} from row {skip_rows}")
+
+    totals, batch = BulkResult(), []
+    for conversations, resume_row in iter_conversation_chunks(csv_path, chunk_rows, skip_rows=skip_rows):
+        for convo in conversations:
+            call_dict = build_call(convo)
+            if not call_dict:
+                continue
+            batch.append((call_dict, convo))
+            if len(batch) >= batch_calls:
+                totals += await flush_calls(batch, with_insights)
+                batch = []
+        if batch:
+            totals += await flush_calls(batch, with_insights)
+            batch = []
+        save_checkpoint(csv_path, resume_row)
+        print(
+            f"[DEBUG] Committed {totals.inserted} calls ({totals.skipped} duplicates skipped), "
+            f"checkpoint at row {resume_row}"
+        )
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Stream a support-tweet CSV into calls_db.")
+    parser.add_argument("csv", nargs="?", default=CSV_FILE)
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--batch-calls", type=int, default=BATCH_CALLS)
+    parser.add_argument("--no-resume", action="store_true", help="ignore any saved checkpoint")
+    parser.add_argument("--with-insights", action="store_true",
+                        help="compute insights and save raw JSON while ingesting")
+    args = parser.parse_args()
+    asyncio.run(main(
+        args.csv, args.chunk_rows, args.batch_calls,
+        resume=not args.no_resume, with_insights=args.with_insights,
+    ))
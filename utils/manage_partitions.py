@@ -0,0 +1,68 @@
+import argparse
+import asyncio
+
+from app.cache import invalidate
+from app.db import dispose_engines, engine
+from app.partitions import (
+    PARTITION_MONTHS_AHEAD,
+    PARTITION_RETENTION_MONTHS,
+    PARTITIONED_TABLES,
+    apply_retention,
+    ensure_future_partitions,
+    list_partitions,
+)
+
+
+async def show():
+    async with engine.connect() as conn:
+        for table in PARTITIONED_TABLES:
+            for p in await list_partitions(conn, table):
+                print(f"{p.name}\t{p.start} .. {p.end}")
+
+
+async def ensure(months_ahead: int):
+    created = await ensure_future_partitions(months_ahead)
+    print(f"Created {len(created)} partitions." if created else "All partitions already exist.")
+
+
+async def retention(keep_months: int, drop: bool, dry_run: bool):
+    """
+    Detach or drop the partitions of months older than the `keep_months`
+    most recent ones. agent_daily_stats keeps those months, so analytics over
+    them still work; calls, insights and recommendations for them don't.
+    """
+    partitions = await apply_retention(keep_months, drop=drop, dry_run=dry_run)
+    action = "Would remove" if dry_run else "Dropped" if drop else "Detached"
+    for p in partitions:
+        print(f"{action} {p.name} ({p.start} .. {p.end})")
+    if partitions and not dry_run:
+        await invalidate("insights")
+    print(f"{action} {len(partitions)} partitions.")
+
+
+async def main(args):
+    try:
+        if args.command == "list":
+            await show()
+        elif args.command == "ensure":
+            await ensure(args.months_ahead)
+        else:
+            await retention(args.keep_months, args.drop, args.dry_run)
+    finally:
+        await dispose_engines()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the monthly partitions of calls_db and call_insights.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="print every partition and its range")
+    ensure_cmd = sub.add_parser("ensure", help="create partitions for this month and the next ones")
+    ensure_cmd.add_argument("--months-ahead", type=int, default=PARTITION_MONTHS_AHEAD)
+    retention_cmd = sub.add_parser("retention", help="detach (or drop) partitions past the retention window")
+    retention_cmd.add_argument("--keep-months", type=int, required=not PARTITION_RETENTION_MONTHS,
+                               default=PARTITION_RETENTION_MONTHS or None,
+                               help="months to keep, the current one included (default PARTITION_RETENTION_MONTHS)")
+    retention_cmd.add_argument("--drop", action="store_true",
+                               help="drop expired partitions instead of detaching them as <name>_detached")
+    retention_cmd.add_argument("--dry-run", action="store_true", help="only list what would be removed")
+    asyncio.run(main(parser.parse_args()))
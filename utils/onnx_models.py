@@ -0,0 +1,198 @@
+import argparse
+import json
+import os
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+ONNX_MODEL_DIR = Path(os.getenv("ONNX_MODEL_DIR", "models/onnx"))
+ONNX_QUANTIZE = os.getenv("ONNX_QUANTIZE", "int8").lower()  # int8 | none
+ONNX_INTRA_OP_THREADS = int(os.getenv("ONNX_INTRA_OP_THREADS", "0"))  # 0: one per core
+ONNX_INTER_OP_THREADS = int(os.getenv("ONNX_INTER_OP_THREADS", "1"))
+ONNX_OPSET = 14
+
+
+def model_dir(model_id: str, root: Path = ONNX_MODEL_DIR) -> Path:
+    return root / model_id.replace("/", "--")
+
+
+def _export_graph(model, names: list[str], output: str, sample: dict, path: Path):
+    """torch.onnx export of `model(*inputs).<output>` with dynamic batch and sequence axes."""
+    import torch
+
+    class Output(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.model = model
+
+        def forward(self, *inputs):
+            return getattr(self.model(**dict(zip(names, inputs))), output)
+
+    axes = {name: {0: "batch", 1: "sequence"} for name in names}
+    axes[output] = {0: "batch", 1: "sequence"} if output == "last_hidden_state" else {0: "batch"}
+    with torch.no_grad():
+        torch.onnx.export(
+            Output().eval(), tuple(sample[n] for n in names), str(path),
+            input_names=names, output_names=[output], dynamic_axes=axes, opset_version=ONNX_OPSET,
+        )
+
+
+def _quantize(directory: Path):
+    """int8 dynamic quantisation: weights stored as int8, activations quantised per batch at run time."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(directory / "model.onnx", directory / "model.int8.onnx", weight_type=QuantType.QInt8)
+
+
+def export_embedder(model_name: str, root: Path = ONNX_MODEL_DIR, quantize: bool = True) -> Path:
+    """
+    Export a mean-pooling sentence-transformers model: the transformer goes to
+    ONNX, pooling and normalisation are redone in numpy by OnnxEmbedder.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    st = SentenceTransformer(model_name, device="cpu")
+    pooling = next((m for m in st if type(m).__name__ == "Pooling"), None)
+    if pooling is None or pooling.get_pooling_mode_str() != "mean":
+        raise ValueError(f"{model_name}: only mean-pooling models can be exported")
+
+    directory = model_dir(model_name, root)
+    directory.mkdir(parents=True, exist_ok=True)
+    names = list(st.tokenizer.model_input_names)
+    sample = st.tokenizer(["export sample"], return_tensors="pt")
+    _export_graph(st[0].auto_model, names, "last_hidden_state", sample, directory / "model.onnx")
+    st.tokenizer.save_pretrained(directory)
+    meta = {
+        "source": model_name,
+        "max_length": st.max_seq_length,
+        "normalize": any(type(m).__name__ == "Normalize" for m in st),
+    }
+    (directory / "meta.json").write_text(json.dumps(meta))
+    if quantize:
+        _quantize(directory)
+    return directory
+
+
+def export_classifier(model_id: str, root: Path = ONNX_MODEL_DIR, quantize: bool = True) -> Path:
+    """Export a Hugging Face sequence-classification model (logits) with its tokenizer and labels."""
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(model_id)
+    model = AutoModelForSequenceClassification.from_pretrained(model_id).eval()
+
+    directory = model_dir(model_id, root)
+    directory.mkdir(parents=True, exist_ok=True)
+    names = list(tokenizer.model_input_names)
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    _export_graph(model, names, "logits", sample, directory / "model.onnx")
+    tokenizer.save_pretrained(directory)
+    meta = {
+        "source": model_id,
+        "max_length": min(tokenizer.model_max_length, 512),
+        "id2label": {int(k): v for k, v in model.config.id2label.items()},
+    }
+    (directory / "meta.json").write_text(json.dumps(meta))
+    if quantize:
+        _quantize(directory)
+    return directory
+
+
+class OnnxModel:
+    """
+    An exported model directory run with ONNX Runtime on CPU. Inputs are
+    sorted by length and batched so each batch is padded to its own longest
+    text, not the longest overall.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        quantized: bool = ONNX_QUANTIZE == "int8",
+        intra_op_threads: int = ONNX_INTRA_OP_THREADS,
+        inter_op_threads: int = ONNX_INTER_OP_THREADS,
+    ):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        path = directory / ("model.int8.onnx" if quantized else "model.onnx")
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(str(path), options, providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+        self.tokenizer = AutoTokenizer.from_pretrained(directory)
+        self.meta = json.loads((directory / "meta.json").read_text())
+        self.path = path
+
+    def _run(self, texts: list[str], batch_size: int, postprocess) -> list:
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        out: list = [None] * len(texts)
+        for i in range(0, len(texts), batch_size):
+            idx = order[i:i + batch_size]
+            enc = self.tokenizer(
+                [texts[j] for j in idx], padding=True, truncation=True,
+                max_length=self.meta["max_length"], return_tensors="np",
+            )
+            feeds = {name: enc[name].astype(np.int64) for name in self.input_names}
+            (result,) = self.session.run(None, feeds)
+            for j, value in zip(idx, postprocess(result, enc["attention_mask"])):
+                out[j] = value
+        return out
+
+
+class OnnxEmbedder(OnnxModel):
+    """Drop-in for SentenceTransformer.encode on an export_embedder directory."""
+
+    def encode(self, sentences: list[str], batch_size: int = 32, **_) -> np.ndarray:
+        def pool(hidden: np.ndarray, mask: np.ndarray):
+            mask = mask[:, :, None].astype(np.float32)
+            mean = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            if self.meta["normalize"]:
+                mean /= np.maximum(np.linalg.norm(mean, axis=1, keepdims=True), 1e-12)
+            return mean
+
+        return np.vstack(self._run(list(sentences), batch_size, pool)).astype(np.float32)
+
+
+class OnnxClassifier(OnnxModel):
+    """Drop-in for a transformers text-classification pipeline: [{"label", "score"}] per text."""
+
+    def __call__(self, texts: list[str], batch_size: int = 32) -> list[dict]:
+        labels = {int(k): v for k, v in self.meta["id2label"].items()}
+
+        def top(logits: np.ndarray, _):
+            exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+            probs = exp / exp.sum(axis=1, keepdims=True)
+            best = probs.argmax(axis=1)
+            return [{"label": labels[int(b)], "score": float(p[b])} for b, p in zip(best, probs)]
+
+        return self._run(list(texts), batch_size, top)
+
+
+def load(kind: str, model_id: str, root: Path = ONNX_MODEL_DIR, quantized: Optional[bool] = None):
+    """
+    OnnxEmbedder ("embed") or OnnxClassifier ("sentiment") for `model_id`,
+    exporting it first (which needs torch) if `root` doesn't have it yet.
+    """
+    quantized = ONNX_QUANTIZE == "int8" if quantized is None else quantized
+    directory = model_dir(model_id, root)
+    if not (directory / ("model.int8.onnx" if quantized else "model.onnx")).exists():
+        print(f"[INFO] Exporting {model_id} to ONNX in {directory}")
+        export = export_embedder if kind == "embed" else export_classifier
+        export(model_id, root, quantize=quantized)
+    model_class = OnnxEmbedder if kind == "embed" else OnnxClassifier
+    return model_class(directory, quantized)
+
+
+if __name__ == "__main__":
+    from utils.ai_utils import EMBED_MODEL_NAME, SENT_MODEL_ID
+
+    parser = argparse.ArgumentParser(description="Export the embedding and sentiment models to ONNX.")
+    parser.add_argument("--output", type=Path, default=ONNX_MODEL_DIR)
+    parser.add_argument("--no-quantize", action="store_true", help="skip the int8 copies")
+    args = parser.parse_args()
+    for export, model_id in ((export_embedder, EMBED_MODEL_NAME), (export_classifier, SENT_MODEL_ID)):
+        directory = export(model_id, args.output, quantize=not args.no_quantize)
+        print(f"[INFO] Exported {model_id} to {directory}")
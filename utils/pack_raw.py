@@ -0,0 +1,63 @@
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+
+from app.conversations import RAW_DIR
+from app.raw_archive import get_raw_archive
+
+
+def pack(source: Path = RAW_DIR, batch: int = 1000, delete: bool = False) -> int:
+    """
+    Move `source/{call_id}.json` files into the raw archive, `batch` files per
+    append. Files already archived are skipped, so an interrupted run can
+    simply be restarted; with `delete`, files are removed once their batch is
+    indexed.
+    """
+    archive = get_raw_archive()
+    packed = skipped = 0
+    started = time.perf_counter()
+
+    def flush(paths: list[Path]):
+        nonlocal packed, skipped
+        ids = [p.stem for p in paths]
+        known = archive.contains_many(ids)
+        items = []
+        for call_id, path in zip(ids, paths):
+            if call_id not in known:
+                items.append((call_id, json.loads(path.read_text(encoding="utf-8"))))
+        archive.append_many(items)
+        packed += len(items)
+        skipped += len(known)
+        if delete:
+            for path in paths:
+                path.unlink()
+
+    pending = []
+    with os.scandir(source) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.endswith(".json"):
+                pending.append(Path(entry.path))
+                if len(pending) >= batch:
+                    flush(pending)
+                    pending = []
+                    rate = packed / (time.perf_counter() - started)
+                    print(f"[INFO] Packed {packed} conversations ({rate:.0f}/sec), {skipped} already archived")
+    if pending:
+        flush(pending)
+    print(f"Packed {packed} conversations into {archive.root} ({skipped} were already there): {archive.stats()}")
+    return packed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pack data/raw/{call_id}.json files into the raw conversation archive.")
+    parser.add_argument("--source", type=Path, default=RAW_DIR)
+    parser.add_argument("--batch", type=int, default=1000, help="files per archive append")
+    parser.add_argument("--delete", action="store_true", help="remove each file once it is archived")
+    parser.add_argument("--rebuild-index", action="store_true", help="only recreate the index from the segments")
+    args = parser.parse_args()
+    if args.rebuild_index:
+        print(f"Indexed {get_raw_archive().rebuild_index()} conversations.")
+    else:
+        pack(args.source, args.batch, args.delete)
@@ -0,0 +1,29 @@
+import argparse
+import asyncio
+from datetime import date
+from typing import Optional
+
+from app.cache import invalidate
+from app.db import SessionLocal
+from app.rollups import rebuild_rollups
+
+
+async def main(from_day: Optional[date] = None, to_day: Optional[date] = None):
+    """
+    Recompute agent_daily_stats from calls_db and call_insights, e.g. after
+    deleting calls or editing insights by hand. Writers keep it current
+    otherwise. With a window, only those days (and partitions) are touched.
+    """
+    async with SessionLocal() as session:
+        async with session.begin():
+            rows = await rebuild_rollups(session, from_day, to_day)
+    await invalidate("insights")
+    print(f"Rebuilt agent_daily_stats: {rows} agent-days.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute the per-agent daily rollups.")
+    parser.add_argument("--from-date", type=date.fromisoformat, help="first day to rebuild (inclusive)")
+    parser.add_argument("--to-date", type=date.fromisoformat, help="last day to rebuild (inclusive)")
+    args = parser.parse_args()
+    asyncio.run(main(args.from_date, args.to_date))
@@ -0,0 +1,137 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+
+class ResultCache:
+    """
+    Content-addressed cache for model outputs.
+
+    Keys are SHA-1 digests of (model name, input text), values are opaque
+    bytes. Lookups go through an in-memory LRU of `memory_items` entries and
+    then an SQLite file that survives restarts; the file is trimmed back to
+    90% of `disk_bytes` by least-recent access whenever it grows past it.
+    Safe to share between threads; separate processes can share the file.
+    """
+
+    def __init__(self, path: str | Path, memory_items: int = 50_000, disk_bytes: int = 1 << 30):
+        self.path = Path(path)
+        self.memory_items = memory_items
+        self.disk_bytes = disk_bytes
+        self._memory: OrderedDict[bytes, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = self.disk_hits = self.misses = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key BLOB PRIMARY KEY, value BLOB NOT NULL,"
+            " size INTEGER NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS ix_results_accessed ON results (accessed)")
+        self._disk_size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    @staticmethod
+    def key(model: str, text: str) -> bytes:
+        return hashlib.sha1(f"{model}\0{text}".encode("utf-8")).digest()
+
+    def get_many(self, model: str, texts: list[str]) -> list[Optional[bytes]]:
+        keys = [self.key(model, t) for t in texts]
+        found: list[Optional[bytes]] = [None] * len(keys)
+        missing = []
+        with self._lock:
+            for i, k in enumerate(keys):
+                value = self._memory.get(k)
+                if value is None:
+                    missing.append(i)
+                else:
+                    self._memory.move_to_end(k)
+                    found[i] = value
+            self.memory_hits += len(keys) - len(missing)
+
+            if missing:
+                on_disk = {}
+                wanted = list({keys[i] for i in missing})
+                for start in range(0, len(wanted), 500):
+                    part = wanted[start:start + 500]
+                    marks = ",".join("?" * len(part))
+                    on_disk.update(self._db.execute(
+                        f"SELECT key, value FROM results WHERE key IN ({marks})", part
+                    ).fetchall())
+                if on_disk:
+                    now = time.time()
+                    self._db.executemany(
+                        "UPDATE results SET accessed = ? WHERE key = ?",
+                        [(now, k) for k in on_disk],
+                    )
+                for i in missing:
+                    value = on_disk.get(keys[i])
+                    if value is None:
+                        self.misses += 1
+                    else:
+                        self.disk_hits += 1
+                        found[i] = value
+                        self._remember(keys[i], value)
+        return found
+
+    def put_many(self, model: str, items: dict[str, bytes]):
+        if not items:
+            return
+        now = time.time()
+        rows = [(self.key(model, text), value, len(value), now) for text, value in items.items()]
+        with self._lock:
+            for k, value, _, _ in rows:
+                self._remember(k, value)
+            self._db.execute("BEGIN")
+            for row in rows:
+                # rows another process (or an earlier batch) stored are skipped, so only count inserts
+                if self._db.execute("INSERT OR IGNORE INTO results VALUES (?, ?, ?, ?)", row).rowcount:
+                    self._disk_size += row[2]
+            self._db.execute("COMMIT")
+            if self._disk_size > self.disk_bytes:
+                self._evict()
+
+    def _remember(self, key: bytes, value: bytes):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _evict(self):
+        target = int(self.disk_bytes * 0.9)
+        self._db.execute(
+            "DELETE FROM results WHERE key IN ("
+            " SELECT key FROM (SELECT key, SUM(size) OVER (ORDER BY accessed DESC) AS kept FROM results)"
+            " WHERE kept > ?)",
+            (target,),
+        )
+        self._disk_size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_items": len(self._memory),
+            "disk_bytes": self._disk_size,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
+
+
+def open_cache() -> Optional[ResultCache]:
+    if os.getenv("INSIGHT_CACHE", "on").lower() in ("off", "0", "false"):
+        return None
+    return ResultCache(
+        os.getenv("INSIGHT_CACHE_PATH", "data/cache/insights.sqlite"),
+        memory_items=int(os.getenv("INSIGHT_CACHE_MEMORY_ITEMS", "50000")),
+        disk_bytes=int(os.getenv("INSIGHT_CACHE_DISK_BYTES", str(1 << 30))),
+    )